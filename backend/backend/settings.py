@@ -38,6 +38,8 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'corsheaders',
     'rest_framework',
+    # Blacklists the refresh token of a device that logs out (stapp.tokens.revoke_session)
+    'rest_framework_simplejwt.token_blacklist',
     'stapp',
 ]
 
@@ -80,23 +82,60 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 
+# SQLite performance mode (see SQLITE_PRAGMAS). Set SQLITE_PERFORMANCE_MODE=0 to keep SQLite's defaults.
+SQLITE_PERFORMANCE_MODE = os.environ.get('SQLITE_PERFORMANCE_MODE', '1') == '1'
+
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock at BEGIN: concurrent writers then queue on the busy
+        # timeout instead of failing with "database is locked" when a transaction
+        # that started reading tries to write
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if SQLITE_PERFORMANCE_MODE else {},
+        # On disk rather than in memory, so threaded tests get WAL and the busy timeout
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# Pragmas of the SQLite performance mode, applied to every new connection (stapp.signals)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',         # readers don't block the writer and vice versa
+    'synchronous': 'NORMAL',       # fsync at checkpoints only; safe with WAL
+    'busy_timeout': 20000,         # ms to wait for the write lock
+    'mmap_size': 256 * 1024 ** 2,  # read pages through a memory map
+    'cache_size': -64000,          # 64 MB page cache
+    'temp_store': 'MEMORY',
+} if SQLITE_PERFORMANCE_MODE else {}
+
+# Local memory (per process) by default. Point CACHE_BACKEND / CACHE_LOCATION at a
+# shared cache, e.g. django.core.cache.backends.redis.RedisCache and redis://host:6379/1,
+# so cache invalidations reach every worker process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'stapp'),
     }
 }
+if CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    # Room for a cached wallet and profile per active user (the default is 300 entries)
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 20000))}
 
 
 AUTH_USER_MODEL = 'stapp.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'stapp.tokens.ClaimsJWTAuthentication',
     ),
 }
 
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'stapp.tokens.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'stapp.tokens.VersionedTokenRefreshSerializer',
+}
+
 
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -137,8 +176,21 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# One backend, one query: mobile or username
 AUTHENTICATION_BACKENDS = [
-    'stapp.backends.MobileBackend',
-    'django.contrib.auth.backends.ModelBackend',
     'stapp.authentication.UsernameOrMobileBackend',
+]
+
+# PBKDF2 cost per password check: Django's own count unless the environment
+# explicitly sets another (a lower one trades hash strength for login CPU).
+# Stored hashes with another count are rewritten on the user's next successful login.
+if os.environ.get('PASSWORD_PBKDF2_ITERATIONS'):
+    PASSWORD_PBKDF2_ITERATIONS = int(os.environ['PASSWORD_PBKDF2_ITERATIONS'])
+
+PASSWORD_HASHERS = [
+    'stapp.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
 ]
\ No newline at end of file
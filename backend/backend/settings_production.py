@@ -0,0 +1,44 @@
+"""
+Production profile: PostgreSQL from DATABASE_URL, served over ASGI.
+
+Selected with DJANGO_SETTINGS_MODULE=backend.settings_production, which the
+Procfile sets for both of its processes; the web process runs backend.asgi
+under uvicorn workers.
+"""
+import os
+from importlib.util import find_spec
+
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == '1'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '*').split(',')
+
+if not os.environ.get('DATABASE_URL'):
+    raise ImproperlyConfigured('DATABASE_URL must be set for the production profile')
+
+# Under ASGI each request runs its sync code in its own thread, so connections
+# kept open by CONN_MAX_AGE would pile up per thread. With psycopg 3 and
+# psycopg_pool installed the workers share a pool instead; otherwise fall back
+# to persistent, health-checked connections (fine for WSGI workers).
+DATABASE_POOL = find_spec('psycopg_pool') is not None and os.environ.get('DATABASE_POOL', '1') == '1'
+
+if DATABASE_POOL:
+    DATABASES = {'default': dj_database_url.config(conn_max_age=0)}
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DATABASE_POOL_MIN', 2)),
+        'max_size': int(os.environ.get('DATABASE_POOL_MAX', 10)),
+        'timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+    }
+else:
+    DATABASES = {'default': dj_database_url.config(
+        conn_max_age=int(os.environ.get('CONN_MAX_AGE', 600)),
+        conn_health_checks=True,
+    )}
+
+# Several worker processes: SSE results must go through the shared cache
+if 'locmem' not in CACHES['default']['BACKEND']:
+    EVENTS_FANOUT = 'stapp.events.CacheFanout'
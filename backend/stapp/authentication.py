@@ -1,30 +1,49 @@
-
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.db.models import Case, IntegerField, Q, Value, When
 
 UserModel = get_user_model()
 
+
+def login_candidates(identifier):
+    """
+    Users whose mobile or username is `identifier`, mobile matches first, in
+    one query. Usually one row; two when someone's username is another
+    user's mobile number.
+    """
+    return list(
+        UserModel.objects.filter(Q(mobile=identifier) | Q(username=identifier))
+        .annotate(by_mobile=Case(
+            When(mobile=identifier, then=Value(0)), default=Value(1), output_field=IntegerField(),
+        ))
+        .order_by('by_mobile', 'pk')[:2]
+    )
+
+
 class UsernameOrMobileBackend(ModelBackend):
+    """
+    The project's only authentication backend: log in with mobile number or
+    username. user.check_password() rehashes the stored password when the
+    hasher policy changed (see stapp.hashers).
+
+    Like Django's AllowAllUsersModelBackend it returns blocked (inactive)
+    users too, so login_user can tell a blocked account from a wrong
+    password. simplejwt's token views and the admin login refuse them.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        if username is None or password is None:
+        identifier = username or kwargs.get('mobile') or kwargs.get(UserModel.USERNAME_FIELD)
+        if identifier is None or password is None:
             return None
-            
-        # First try to authenticate with mobile number
-        try:
-            user = UserModel.objects.get(mobile=username)
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
-        except UserModel.DoesNotExist:
-            pass
 
-        # Then try with username
-        try:
-            user = UserModel.objects.get(username=username)
-            if user.check_password(password) and self.user_can_authenticate(user):
+        candidates = login_candidates(identifier)
+        if not candidates:
+            # Hash anyway so a missing user takes as long as a wrong password
+            UserModel().set_password(password)
+            return None
+        for user in candidates:
+            if user.check_password(password):
                 return user
-        except UserModel.DoesNotExist:
-            pass
-
         return None
 
     def get_user(self, user_id):
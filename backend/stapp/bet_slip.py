@@ -0,0 +1,106 @@
+"""
+Bet slips: many legs placed in one request.
+
+A leg is either explicit or a pattern expanded here:
+
+    {"bet_type": "number", "number": 42, "amount": 10}
+    {"bet_type": "andar", "numbers": [1, 4, 7], "amount": 10}
+    {"pattern": "jodi", "digits": [3, 5, 7], "amount": 10}          # 33, 35, 37, 53, ... 77
+    {"pattern": "jodi", "digits": [3, 5, 7], "doubles": false, ...}  # without 33, 55, 77
+    {"pattern": "range", "bet_type": "andar", "from": 0, "to": 9, "amount": 10}
+
+The whole slip is validated before anything is written.
+"""
+from decimal import Decimal, InvalidOperation
+
+MIN_STAKE = Decimal('10')
+MAX_STAKE = Decimal('10000')
+# Bets a slip may expand to
+MAX_LEGS = 200
+
+NUMBER_RANGES = {
+    'number': range(100),
+    'andar': range(10),
+    'bahar': range(10),
+}
+
+
+class SlipError(ValueError):
+    pass
+
+
+def _int(value, what):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise SlipError(f'Invalid {what}: {value!r}')
+
+
+def _amount(leg):
+    try:
+        amount = Decimal(str(leg.get('amount', 0)))
+    except InvalidOperation:
+        raise SlipError(f"Invalid amount: {leg.get('amount')!r}")
+    if amount < MIN_STAKE:
+        raise SlipError('Minimum bet amount is ₹10.')
+    if amount > MAX_STAKE:
+        raise SlipError('Maximum bet amount is ₹10,000.')
+    return amount
+
+
+def _numbers(leg):
+    """The (bet_type, [numbers]) a leg stakes on."""
+    pattern = leg.get('pattern')
+    if pattern == 'jodi':
+        digits = sorted({_int(d, 'digit') for d in leg.get('digits') or []})
+        if not digits or not all(0 <= d <= 9 for d in digits):
+            raise SlipError('A jodi pattern needs digits between 0 and 9')
+        doubles = leg.get('doubles', True)
+        return 'number', [a * 10 + b for a in digits for b in digits if doubles or a != b]
+
+    bet_type = leg.get('bet_type', 'number')
+    if bet_type not in NUMBER_RANGES:
+        raise SlipError(f'Invalid bet type: {bet_type!r}')
+    if pattern == 'range':
+        start, end = _int(leg.get('from'), 'range start'), _int(leg.get('to'), 'range end')
+        if start > end:
+            raise SlipError('A range must go from low to high')
+        numbers = list(range(start, end + 1))
+    elif pattern is None:
+        numbers = leg['numbers'] if 'numbers' in leg else [leg.get('number')]
+        if not isinstance(numbers, list):
+            raise SlipError(f'numbers must be a list, not {numbers!r}')
+        numbers = [_int(n, 'number') for n in numbers]
+    else:
+        raise SlipError(f'Unknown pattern: {pattern!r}')
+
+    allowed = NUMBER_RANGES[bet_type]
+    for number in numbers:
+        if number not in allowed:
+            raise SlipError(f'{bet_type.title()} number must be between {allowed[0]} and {allowed[-1]}')
+    return bet_type, numbers
+
+
+def validate_bet(data):
+    """(bet_type, number, amount) of a single bet ({bet_type, number, amount}). Raises SlipError."""
+    amount = _amount(data)
+    bet_type, [number] = _numbers({'bet_type': data.get('bet_type', 'number'), 'number': data.get('number')})
+    return bet_type, number, amount
+
+
+def expand_slip(legs):
+    """[(bet_type, number, amount)] for every bet in the slip. Raises SlipError."""
+    if not isinstance(legs, list) or not legs:
+        raise SlipError('A slip needs at least one leg')
+    bets = []
+    for leg in legs:
+        if not isinstance(leg, dict):
+            raise SlipError('Each leg must be an object')
+        amount = _amount(leg)
+        bet_type, numbers = _numbers(leg)
+        bets.extend((bet_type, number, amount) for number in numbers)
+        if len(bets) > MAX_LEGS:
+            raise SlipError(f'A slip can hold at most {MAX_LEGS} bets')
+    if not bets:
+        raise SlipError('The slip expands to no bets')
+    return bets
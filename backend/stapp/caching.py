@@ -0,0 +1,231 @@
+"""
+Read-through caching of the polled game endpoints on Django's cache framework.
+
+Entries are namespaced by version counters kept in the cache itself: a
+global one (Game edits), one per game (result declared / undone) and one per
+user (bet placed). Bumping a counter orphans every entry built under the old
+value, so writers never have to know which keys exist. Schedule-derived
+entries additionally carry the next session boundary in their key and expire
+at it, so they can't outlive a lock/open transition.
+
+Per-user records (wallet, profile) are versioned the same way, except that
+their version is a random token seeded on first read and invalidation simply
+deletes it: a settlement touching thousands of wallets is one delete_many,
+and an evicted version can never bring back an entry built under an old one.
+
+With the default local-memory backend every process has its own cache and
+invalidations only reach the process that made them; configure a shared
+backend (CACHE_BACKEND / CACHE_LOCATION) when running several workers.
+"""
+import hashlib
+import json
+import math
+import threading
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+KEY_PREFIX = 'stapp'
+# Cap for entries of games without an upcoming boundary (inactive / empty schedule)
+MAX_TIMEOUT = 300
+# Per-user records are invalidated explicitly; the timeout only reclaims idle users
+RECORD_TIMEOUT = 3600
+
+_MISSING = object()
+
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_stats_lock = threading.Lock()
+
+
+def _count(namespace, outcome):
+    with _stats_lock:
+        _stats[namespace][outcome] += 1
+
+
+def cache_stats():
+    """Hit/miss counters of this process, per namespace."""
+    with _stats_lock:
+        return {
+            namespace: dict(counts, hit_rate=round(counts['hits'] / max(counts['hits'] + counts['misses'], 1), 4))
+            for namespace, counts in _stats.items()
+        }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:ver:{scope}'
+
+
+def _game_key(game_name):
+    # Memcached rejects spaces in keys
+    return game_name.upper().replace(' ', '_')
+
+
+def _game_scope(game_name):
+    return f'game:{_game_key(game_name)}'
+
+
+def _versions(scopes):
+    found = cache.get_many([_version_key(scope) for scope in scopes])
+    return [found.get(_version_key(scope), 0) for scope in scopes]
+
+
+def _bump(scope):
+    key = _version_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Never bumped (or evicted): any fresh value differs from the implicit 0
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def _bump_on_commit(scope):
+    # Readers must not rebuild an entry from rows the writer hasn't committed yet
+    transaction.on_commit(lambda: _bump(scope))
+
+
+def invalidate_game(game_name):
+    _bump_on_commit(_game_scope(game_name))
+
+
+def invalidate_user(user_id):
+    _bump_on_commit(f'user:{user_id}')
+
+
+def invalidate_all():
+    _bump_on_commit('global')
+
+
+def _record_scope(kind, user_id):
+    return f'{kind}:{user_id}'
+
+
+def invalidate_records(kind, user_ids):
+    """Drop the cached `kind` record ('wallet', 'profile') of every user in user_ids once the transaction commits."""
+    keys = [_version_key(_record_scope(kind, user_id)) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _record_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        # None only if the backend dropped it straight away; then don't cache
+        version = cache.get(key)
+    return version
+
+
+def user_record(kind, user_id, compute):
+    """
+    (payload, etag) of a per-user record built by compute(), cached until
+    invalidate_records(kind, ...) names the user.
+    """
+    version = _record_version(_record_scope(kind, user_id))
+
+    def build():
+        payload = compute()
+        return payload, etag(payload)
+
+    return memoize(kind, f'{user_id}:{version}', RECORD_TIMEOUT if version else None, build)
+
+
+def memoize(namespace, key, timeout, compute):
+    """Cached compute() under `key`, counting the hit or miss under `namespace`."""
+    if timeout is None:
+        _count(namespace, 'misses')
+        return compute()
+    full_key = f'{KEY_PREFIX}:{namespace}:{key}'
+    value = cache.get(full_key, _MISSING)
+    if value is not _MISSING:
+        _count(namespace, 'hits')
+        return value
+    _count(namespace, 'misses')
+    value = compute()
+    cache.set(full_key, value, timeout)
+    return value
+
+
+def _until(boundary, now):
+    """
+    Cache timeout from `now` to the boundary timestamp. None (don't cache) when
+    `now` is exactly on the boundary: state there may already differ from the
+    state just before it, which other entries under the same key describe.
+    """
+    if boundary is None:
+        return MAX_TIMEOUT
+    remaining = boundary - now.timestamp()
+    if remaining <= 0:
+        return None
+    return max(math.ceil(remaining), 1)
+
+
+def _game_status(timing_manager, game_name, now, versions):
+    boundary = timing_manager.calendar.next_boundary(game_name, now)
+    return memoize(
+        'game_status',
+        f"{_game_key(game_name)}:{'.'.join(map(str, versions))}:{boundary}",
+        _until(boundary, now),
+        lambda: timing_manager.get_game_status(game_name, now),
+    )
+
+
+def game_status(timing_manager, game_name, now=None):
+    """GameTimingManager.get_game_status, cached until the game's next session boundary."""
+    now = now or timezone.now()
+    return _game_status(timing_manager, game_name, now, _versions(['global', _game_scope(game_name)]))
+
+
+def all_games_status(timing_manager, now=None):
+    now = now or timezone.now()
+    games = [game_name.lower() for game_name in timing_manager.games]
+    versions = _versions(['global'] + [_game_scope(game_name) for game_name in games])
+    return [
+        _game_status(timing_manager, game_name, now, (versions[0], game_version))
+        for game_name, game_version in zip(games, versions[1:])
+    ]
+
+
+def user_session_view(namespace, user_id, timing_manager, now, compute):
+    """
+    A per-user view of the current sessions of every game (e.g. the bets placed
+    in them), cached until the user bets again, a result is declared or undone,
+    or the earliest session boundary of any game passes.
+    """
+    games = sorted(timing_manager.games)
+    boundaries = [timing_manager.calendar.next_boundary(game_name, now) for game_name in games]
+    upcoming = [boundary for boundary in boundaries if boundary is not None]
+    boundary = min(upcoming) if upcoming else None
+    versions = _versions(['global', f'user:{user_id}'] + [_game_scope(game_name) for game_name in games])
+    return memoize(
+        namespace,
+        f"{user_id}:{'.'.join(map(str, versions))}:{boundary}",
+        _until(boundary, now),
+        compute,
+    )
+
+
+def games_view(namespace, game_names, compute):
+    """
+    A view over every game that only changes with results (e.g. the latest
+    declared numbers), cached until a game is edited or a result is declared
+    or undone.
+    """
+    versions = _versions(['global'] + [_game_scope(game_name) for game_name in sorted(game_names)])
+    return memoize(namespace, '.'.join(map(str, versions)), MAX_TIMEOUT, compute)
+
+
+def etag(payload):
+    """Strong ETag of a JSON-serialisable payload, for If-None-Match checks."""
+    raw = json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
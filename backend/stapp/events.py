@@ -0,0 +1,238 @@
+"""
+Server-sent game events: lock/open transitions and declared/undone results.
+
+Each ASGI worker process keeps one Broadcaster. Subscribers are plain
+asyncio queues, so an idle subscriber costs a suspended coroutine and no CPU.
+The process runs three background tasks shared by all of its subscribers:
+
+- a schedule watcher that sleeps until the next session boundary of any game
+  and announces the games whose lock state changed;
+- a heartbeat that keeps idle connections open through proxies;
+- the fan-out backend's listener, for events published in other processes.
+
+Results are published by settlement (see publish()). With LocalFanout only
+subscribers of the publishing process hear them. CacheFanout relays them
+through the shared cache so every web process hears them, including results
+declared by the result worker. It needs a shared CACHES backend.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import caching
+from .game_timing import get_timing_manager
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+# Re-check the schedule at least this often so Game edits are picked up
+MAX_SCHEDULE_SLEEP = 60
+# Wake a little after a boundary: close instants are still inside the window
+BOUNDARY_GRACE = 0.05
+
+
+class Event:
+    def __init__(self, name, data, event_id=None):
+        self.name = name
+        self.data = data
+        self.id = event_id
+
+    def encode(self):
+        lines = []
+        if self.id is not None:
+            lines.append(f'id: {self.id}')
+        lines.append(f'event: {self.name}')
+        lines.append(f'data: {json.dumps(self.data, separators=(",", ":"), default=str)}')
+        return ('\n'.join(lines) + '\n\n').encode()
+
+
+HEARTBEAT = b': keep-alive\n\n'
+
+
+class LocalFanout:
+    """Publishes straight to this process's subscribers."""
+
+    def publish(self, name, data):
+        broadcaster.deliver_threadsafe(Event(name, data))
+
+    async def listen(self, deliver):
+        return
+
+
+class CacheFanout:
+    """
+    Relays events through the shared cache: publishers append under a sequence
+    counter and every process polls the counter once per POLL_SECONDS.
+
+    A publisher takes its sequence number before it writes the event, so a
+    poll can see the number before the event. Listeners only move past
+    events they have read; a missing one is waited for up to GAP_SECONDS
+    (its publisher died, or it expired) and then skipped.
+    """
+    POLL_SECONDS = 1
+    GAP_SECONDS = 5
+    EVENT_TTL = 300
+    SEQ_KEY = 'stapp:events:seq'
+
+    def _event_key(self, seq):
+        return f'stapp:events:{seq}'
+
+    def publish(self, name, data):
+        try:
+            seq = cache.incr(self.SEQ_KEY)
+        except ValueError:
+            seq = 1 if cache.add(self.SEQ_KEY, 1, timeout=None) else cache.incr(self.SEQ_KEY)
+        cache.set(self._event_key(seq), {'name': name, 'data': data}, self.EVENT_TTL)
+
+    async def listen(self, deliver):
+        loop = asyncio.get_running_loop()
+        seen = await cache.aget(self.SEQ_KEY, 0)
+        gap_since = None
+        while True:
+            await asyncio.sleep(self.POLL_SECONDS)
+            latest = await cache.aget(self.SEQ_KEY, 0)
+            if latest < seen:
+                # The counter was lost (cache restart) and started over
+                seen = 0
+            if latest <= seen:
+                continue
+            seqs = range(seen + 1, latest + 1)
+            found = await cache.aget_many([self._event_key(seq) for seq in seqs])
+            for seq in seqs:
+                event = found.get(self._event_key(seq))
+                if event is None:
+                    if gap_since is None:
+                        gap_since = loop.time()
+                    if loop.time() - gap_since < self.GAP_SECONDS:
+                        break
+                else:
+                    deliver(Event(event['name'], event['data']))
+                seen = seq
+                gap_since = None
+
+
+class Broadcaster:
+    def __init__(self):
+        self.subscribers = set()
+        self.loop = None
+        self.tasks = []
+        # Latest status of every game, as computed by the schedule watcher
+        self.statuses = None
+        self.ready = None
+        self._ids = itertools.count(1)
+        self._fanout = None
+        self._lock = threading.Lock()
+
+    @property
+    def fanout(self):
+        if self._fanout is None:
+            self._fanout = import_string(getattr(settings, 'EVENTS_FANOUT', 'stapp.events.LocalFanout'))()
+        return self._fanout
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+        with self._lock:
+            self.loop = loop
+            self.statuses = None
+            self.ready = asyncio.Event()
+            self.tasks = [
+                loop.create_task(self._watch_schedule()),
+                loop.create_task(self._heartbeat()),
+                loop.create_task(self.fanout.listen(self.deliver)),
+            ]
+
+    def subscribe(self):
+        self._start()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def _put(self, queue, item):
+        if queue.full():
+            # Slow client: drop its oldest pending event rather than grow without bound
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def deliver(self, event):
+        """Queue an event for every subscriber of this process. Call on the event loop."""
+        event.id = next(self._ids)
+        payload = event.encode()
+        for queue in self.subscribers:
+            self._put(queue, payload)
+
+    def deliver_threadsafe(self, event):
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return  # nobody has subscribed in this process
+        loop.call_soon_threadsafe(self.deliver, event)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            for queue in self.subscribers:
+                self._put(queue, HEARTBEAT)
+
+    async def snapshot(self):
+        await self.ready.wait()
+        return self.statuses
+
+    async def _watch_schedule(self):
+        previous = {}
+        while True:
+            now = timezone.now()
+            try:
+                timing_manager = await sync_to_async(get_timing_manager)()
+                statuses = await sync_to_async(caching.all_games_status)(timing_manager, now)
+            except Exception:
+                logger.exception('Schedule check failed; retrying in %s s', MAX_SCHEDULE_SLEEP)
+                await asyncio.sleep(MAX_SCHEDULE_SLEEP)
+                continue
+            for status in statuses:
+                before = previous.get(status['game'])
+                if before is not None and before['status'] != status['status']:
+                    self.deliver(Event('open' if status['status'] == 'open' else 'lock', status))
+                previous[status['game']] = status
+            self.statuses = statuses
+            self.ready.set()
+
+            wait = MAX_SCHEDULE_SLEEP
+            for game_name in timing_manager.games:
+                boundary = timing_manager.calendar.next_boundary(game_name, now)
+                if boundary is not None:
+                    wait = min(wait, boundary - now.timestamp())
+            await asyncio.sleep(max(wait, 0) + BOUNDARY_GRACE)
+
+
+broadcaster = Broadcaster()
+
+
+def publish(name, data):
+    """Publish an event once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(lambda: broadcaster.fanout.publish(name, data))
+
+
+async def stream():
+    """SSE byte stream for one subscriber, starting with a snapshot of every game's status."""
+    # Subscribe before taking the snapshot so no transition falls between the two
+    queue = broadcaster.subscribe()
+    try:
+        yield Event('status', {'games': await broadcaster.snapshot()}).encode()
+        while True:
+            yield await queue.get()
+    finally:
+        broadcaster.unsubscribe(queue)
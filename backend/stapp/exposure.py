@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+
+from .models import Bet, SessionExposure
+from .settlement import DIGIT_PAYOUT, NUMBER_PAYOUT
+
+# Results the book tracks, 00-99
+NUMBERS = range(100)
+
+
+def _affected_numbers(bet_type, number):
+    """Winning numbers a bet pays out on."""
+    if bet_type == 'number':
+        return [number] if number in NUMBERS else []
+    if not 0 <= number <= 9:
+        return []
+    if bet_type == 'andar':
+        return [number * 10 + d for d in range(10)]
+    if bet_type == 'bahar':
+        return [d * 10 + number for d in range(10)]
+    return []
+
+
+def _payout(bet_type, amount):
+    return amount * (NUMBER_PAYOUT if bet_type == 'number' else DIGIT_PAYOUT)
+
+
+def create_exposure_book(session_id):
+    """Zeroed book (one row per number) for a new session."""
+    SessionExposure.objects.bulk_create(
+        [SessionExposure(session_id=session_id, number=n) for n in NUMBERS],
+        ignore_conflicts=True,
+    )
+
+
+def record_bet_exposure(session_id, bet_type, number, amount):
+    """
+    Add a bet's payout to the numbers it wins on: one UPDATE touching 1 row
+    (number) or 10 rows (andar/bahar). Call it in the bet's transaction.
+    """
+    numbers = _affected_numbers(bet_type, int(number))
+    if numbers:
+        SessionExposure.objects.filter(session_id=session_id, number__in=numbers).update(
+            liability=F('liability') + _payout(bet_type, amount)
+        )
+
+
+def record_stakes_exposure(session_id, stakes):
+    """
+    Add many bets (summed into stake arrays) to the book with one UPDATE,
+    each touched number getting its own increment through a CASE.
+    """
+    deltas = {n: amount for n, amount in enumerate(liability_vector(stakes)) if amount}
+    if deltas:
+        SessionExposure.objects.filter(session_id=session_id, number__in=deltas).update(
+            liability=F('liability') + Case(
+                *(When(number=n, then=Value(amount)) for n, amount in deltas.items()),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            )
+        )
+
+
+def empty_stakes():
+    """(number stakes[100], andar stakes[10], bahar stakes[10]), all zero."""
+    return [Decimal('0.00')] * 100, [Decimal('0.00')] * 10, [Decimal('0.00')] * 10
+
+
+def add_stake(stakes, bet_type, number, amount):
+    """Add one (possibly aggregated) bet to the three stake arrays."""
+    number_stakes, andar_stakes, bahar_stakes = stakes
+    number = int(number)
+    if bet_type == 'number' and number in NUMBERS:
+        number_stakes[number] += amount
+    elif bet_type == 'andar' and 0 <= number <= 9:
+        andar_stakes[number] += amount
+    elif bet_type == 'bahar' and 0 <= number <= 9:
+        bahar_stakes[number] += amount
+
+
+def aggregate_stakes(bets):
+    """Stake arrays for a Bet queryset, summed in the database by (bet_type, number)."""
+    stakes = empty_stakes()
+    rows = bets.values_list('bet_type', 'number').annotate(total=Sum('amount')).order_by()
+    for bet_type, number, total in rows:
+        add_stake(stakes, bet_type, number, total)
+    return stakes
+
+
+def liability_vector(stakes):
+    """
+    Exact payout for each winning number 00-99:
+    90 x number[n] + 9 x (andar[n // 10] + bahar[n % 10]).
+    Cost is fixed at 100 cells however many bets went into the stakes.
+    """
+    number_stakes, andar_stakes, bahar_stakes = stakes
+    return [
+        number_stakes[tens * 10 + units] * NUMBER_PAYOUT
+        + (andar_stakes[tens] + bahar_stakes[units]) * DIGIT_PAYOUT
+        for tens in range(10)
+        for units in range(10)
+    ]
+
+
+def rebuild_exposure(session_id):
+    """Recompute a session's book from its bets."""
+    liabilities = liability_vector(aggregate_stakes(Bet.objects.filter(session_id=session_id)))
+    with transaction.atomic():
+        SessionExposure.objects.filter(session_id=session_id).delete()
+        SessionExposure.objects.bulk_create([
+            SessionExposure(session_id=session_id, number=n, liability=liabilities[n])
+            for n in NUMBERS
+        ])
+    return liabilities
+
+
+def drop_exposure(session_ids):
+    """Forget books whose bets were deleted; they are rebuilt on next read."""
+    SessionExposure.objects.filter(session_id__in=session_ids).delete()
+
+
+def exposure_book(session_id):
+    """Liability per winning number 00-99 as a list, rebuilding the book if it is missing."""
+    rows = list(
+        SessionExposure.objects.filter(session_id=session_id)
+        .order_by('number')
+        .values_list('liability', flat=True)
+    )
+    if len(rows) != len(NUMBERS):
+        return rebuild_exposure(session_id)
+    return rows
+
+
+def min_liability_numbers(liabilities):
+    """Numbers (as "00"-"99" strings) whose declaration costs the house least."""
+    lowest = min(liabilities)
+    return [str(n).zfill(2) for n, amount in enumerate(liabilities) if amount == lowest]
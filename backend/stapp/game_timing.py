@@ -1,155 +1,263 @@
+import threading
+import time as monotonic_time
+from datetime import datetime, timedelta
 
-from datetime import datetime, time
 import pytz
+from django.db import DatabaseError
+
+from .session_calendar import SessionCalendar
+
+
+def generate_diamond_king_sessions():
+    """
+    Diamond King session times:
+    - Session 1: 06:00 - 07:50 (Result: 08:00)
+    - Session 2: 08:10 - 09:50 (Result: 10:00)
+    - Session 3: 10:10 - 11:50 (Result: 12:00)
+    - Session 4: 12:10 - 13:50 (Result: 14:00)
+    - Session 5: 14:10 - 15:50 (Result: 16:00)
+    - Session 6: 16:10 - 17:50 (Result: 18:00)
+    - Session 7: 18:10 - 19:50 (Result: 20:00)
+    - Session 8: 20:10 - 21:50 (Result: 22:00)
+    - Session 9: 22:10 - 23:50 (Result: 23:59)
+    """
+    sessions = []
+    # Session times as per your frontend
+    session_times = [
+        ("06:00", "07:50", "08:00"),
+        ("08:10", "09:50", "10:00"),
+        ("10:10", "11:50", "12:00"),
+        ("12:10", "13:50", "14:00"),
+        ("14:10", "15:50", "16:00"),
+        ("16:10", "17:50", "18:00"),
+        ("18:10", "19:50", "20:00"),
+        ("20:10", "21:50", "22:00"),
+        ("22:10", "23:50", "23:59"),
+    ]
+    for idx, (open_time, close_time, result_time) in enumerate(session_times):
+        sessions.append({
+            "session_no": idx + 1,
+            "open": open_time,
+            "close": close_time,
+            "result": result_time,
+            "open_time": open_time,      # <-- Add these keys for compatibility
+            "close_time": close_time,
+            "result_time": result_time,
+        })
+    return sessions
+
+
+# Default timings, used for any game that has no row in the Game table.
+# Single-session games open at "open", stop taking bets at "close" (next day
+# when close < open) and get their result at "result".
+#
+# "open"/"close" are the old views.GAME_TIMINGS session window. "result" is
+# where the old GameTimingManager ended each game's lock window (its
+# "open_time": Jaipur King 17:00, Faridabad 19:00, Ghaziabad 21:30, Gali
+# 23:59, Disawer 07:00), i.e. when the game reopened with the result out.
+# Disawer's lock ran 02:30-07:00, so its result lands on the next session's
+# open. Only Diamond King is auto-declared (auto_result.AUTO_DECLARE_GAMES);
+# its result times come from generate_diamond_king_sessions() unchanged.
+GAME_TIMINGS = {
+    "JAIPUR KING": {"open": "21:00", "close": "16:50", "result": "17:00"},
+    "FARIDABAD": {"open": "22:00", "close": "17:40", "result": "19:00"},
+    "GHAZIABAD": {"open": "23:00", "close": "19:50", "result": "21:30"},
+    "GALI": {"open": "04:00", "close": "22:30", "result": "23:59"},
+    "DISAWER": {"open": "07:00", "close": "02:30", "result": "07:00"},
+    "DIAMOND KING": generate_diamond_king_sessions()
+}
+
+# Other worker processes don't see Game post_save, so they rebuild at least this often
+SCHEDULE_TTL_SECONDS = 300
+
 
 class GameTimingManager:
-    def __init__(self):
+    """
+    Single schedule engine for all games: lock state, next opening time,
+    session window and result time all come from the same compiled calendar,
+    so the lock decision and the session a bet lands in always agree.
+    """
+
+    def __init__(self, timings=None, inactive=()):
         self.ist = pytz.timezone('Asia/Kolkata')
-        
-        # Game configurations with lock and open times
-        self.games = {
-            'jaipur king': {
-                'lock_time': time(16, 20),  # 4:20 PM
-                'open_time': time(17, 0),   # 5:00 PM
-                'is_continuous': False
-            },
-            'faridabad': {
-                'lock_time': time(17, 50),  # 5:50 PM
-                'open_time': time(19, 0),   # 7:00 PM
-                'is_continuous': False
-            },
-            'ghaziabad': {
-                'lock_time': time(20, 30),  # 8:30 PM
-                'open_time': time(21, 30),  # 9:30 PM
-                'is_continuous': False
-            },
-            'gali': {
-                'lock_time': time(23, 0),   # 11:00 PM
-                'open_time': time(23, 59),  # 11:59 PM
-                'is_continuous': False
-            },
-            'disawer': {
-                'lock_time': time(2, 30),   # 2:30 AM
-                'open_time': time(7, 0),    # 7:00 AM
-                'is_continuous': False
-            },
-            'diamond king': {
-                'open_time': time(10, 0),   # 10:00 AM
-                'close_time': time(23, 59), # 11:59 PM
-                'is_continuous': True,
-                'interval_hours': 3,        # Every 3 hours
-                'lock_before_minutes': 10,  # Lock 10 min before
-                'open_after_minutes': 5     # Open 5 min after
+        self.timings = timings if timings is not None else GAME_TIMINGS
+        self.inactive = {name.upper() for name in inactive}
+        self.calendar = SessionCalendar(self.timings)
+        self.games = self.calendar.games()
+
+    @classmethod
+    def from_database(cls):
+        """Defaults overridden by Game rows (times, is_active); rows for new games are added."""
+        from .models import Game
+
+        timings = dict(GAME_TIMINGS)
+        inactive = []
+        for game in Game.objects.all():
+            name = game.name.strip().upper()
+            if not game.is_active:
+                inactive.append(name)
+            # Multi-session games keep their session table, only is_active comes from the row
+            if isinstance(timings.get(name), list):
+                continue
+            game_timings = {
+                "open": game.open_time.strftime('%H:%M'),
+                "close": game.close_time.strftime('%H:%M'),
             }
-        }
-    
+            if game.result_time:
+                game_timings["result"] = game.result_time.strftime('%H:%M')
+            timings[name] = game_timings
+        return cls(timings, inactive)
+
     def get_current_time(self):
         """Get current IST time"""
         return datetime.now(self.ist).time()
-    
-    def is_game_locked(self, game_name):
-        """Check if game is currently locked"""
-        game_name = game_name.lower()
-        if game_name not in self.games:
-            return True
-        
-        current_time = self.get_current_time()
-        game_config = self.games[game_name]
-        
-        if game_name == 'diamond king':
-            return self._is_diamond_king_locked(current_time)
-        else:
-            return self._is_regular_game_locked(game_name, current_time)
-    
-    def _is_regular_game_locked(self, game_name, current_time):
-        """Check if regular game is locked"""
-        game_config = self.games[game_name]
-        lock_time = game_config['lock_time']
-        open_time = game_config['open_time']
-        
-        # Handle overnight games (like disawer)
-        if game_name == 'disawer':
-            # If current time is between 2:30 AM and 7:00 AM, game is locked
-            if time(2, 30) <= current_time <= time(7, 0):
-                return True
-            # If current time is after 7:00 AM, check if before next lock time
-            return False
-        
-        # For other games, check if current time is between lock and open
-        if lock_time <= current_time <= open_time:
-            return True
-        
-        return False
-    
-    def _is_diamond_king_locked(self, current_time):
-        """Check if diamond king is locked (every 3 hours with 10 min lock, 5 min delay)"""
-        # Diamond King runs every 3 hours from 10:00 AM to 11:59 PM
-        start_hour = 10  # 10:00 AM
-        end_hour = 23    # 11:59 PM
-        
-        current_hour = current_time.hour
-        current_minute = current_time.minute
-        
-        # Check if we're in operating hours
-        if current_hour < start_hour or current_hour > end_hour:
-            return True
-        
-        # Calculate the current 3-hour cycle
-        cycle_start_hour = start_hour + ((current_hour - start_hour) // 3) * 3
-        
-        # Check if we're in lock period (10 minutes before the hour)
-        if current_hour == cycle_start_hour and current_minute >= 50:
+
+    def get_current_session(self, game_name, now=None):
+        """Calendar Session (session_no, open, close, result) bets are taken for right now, or None."""
+        return self.calendar.current_session(game_name, now or datetime.now(self.ist))
+
+    def get_session_window(self, game_name, now=None):
+        """(open_dt, close_dt, result_dt) of the current session, or (None, None, None)."""
+        session = self.get_current_session(game_name, now)
+        if session is None:
+            return None, None, None
+        return session.open, session.close, session.result
+
+    def is_game_locked(self, game_name, now=None):
+        """Locked outside the current session's open..close window, or when the game is inactive"""
+        game_name = game_name.upper()
+        if game_name not in self.games or game_name in self.inactive:
             return True
-        
-        # Check if we're in delay period (5 minutes after the hour)
-        next_cycle_hour = cycle_start_hour + 3
-        if current_hour == next_cycle_hour and current_minute <= 5:
+        now = now or datetime.now(self.ist)
+        open_dt, close_dt, _ = self.get_session_window(game_name, now)
+        if open_dt is None:
             return True
-        
-        return False
-    
-    def get_next_open_time(self, game_name):
-        """Get next opening time for a game"""
-        game_name = game_name.lower()
+        return not (open_dt <= now <= close_dt)
+
+    def get_next_open(self, game_name, now=None):
+        """Open instant of the next session that hasn't started yet"""
+        game_name = game_name.upper()
         if game_name not in self.games:
             return None
-        
-        game_config = self.games[game_name]
-        
-        if game_name == 'diamond king':
-            return self._get_diamond_king_next_open()
-        else:
-            return game_config['open_time'].strftime('%I:%M %p')
-    
-    def _get_diamond_king_next_open(self):
-        """Get next diamond king opening time"""
-        current_time = self.get_current_time()
-        current_hour = current_time.hour
-        
-        # Find next 3-hour cycle
-        start_hour = 10
-        next_cycle = start_hour + ((current_hour - start_hour) // 3 + 1) * 3
-        
-        if next_cycle > 23:
-            next_cycle = 10  # Next day
-        
-        return time(next_cycle, 5).strftime('%I:%M %p')  # 5 minutes after the hour
-    
-    def get_game_status(self, game_name):
+        now = now or datetime.now(self.ist)
+        today = now.astimezone(self.ist).date()
+        for day in (today, today + timedelta(days=1)):
+            for session in self.calendar.sessions_on(game_name, day):
+                if session.open > now:
+                    return session.open
+        return None
+
+    def get_next_result(self, game_name, now=None):
+        """Result instant of the next session whose result is still ahead"""
+        game_name = game_name.upper()
+        if game_name not in self.games:
+            return None
+        now = now or datetime.now(self.ist)
+        today = now.astimezone(self.ist).date()
+        for day in (today - timedelta(days=1), today, today + timedelta(days=1)):
+            for session in self.calendar.sessions_on(game_name, day):
+                if session.result and session.result > now:
+                    return session.result
+        return None
+
+    def get_next_open_time(self, game_name, now=None):
+        """Get next opening time for a game"""
+        next_open = self.get_next_open(game_name, now)
+        return next_open.strftime('%I:%M %p') if next_open else None
+
+    def get_game_status(self, game_name, now=None):
         """Get complete game status"""
-        is_locked = self.is_game_locked(game_name)
-        next_open = self.get_next_open_time(game_name)
-        
+        now = now or datetime.now(self.ist)
+        is_locked = self.is_game_locked(game_name, now)
+        _, close_dt, result_dt = self.get_session_window(game_name, now)
+
         return {
             'game': game_name,
             'is_locked': is_locked,
             'status': 'locked' if is_locked else 'open',
-            'next_open_time': next_open
+            'next_open_time': self.get_next_open_time(game_name, now),
+            'close_time': close_dt.strftime('%I:%M %p') if close_dt else None,
+            'result_time': result_dt.strftime('%I:%M %p') if result_dt else None,
         }
-    
-    def get_all_games_status(self):
+
+    def get_all_games_status(self, now=None):
         """Get status of all games"""
-        status_list = []
-        for game_name in self.games.keys():
-            status_list.append(self.get_game_status(game_name))
-        return status_list
+        now = now or datetime.now(self.ist)
+        return [self.get_game_status(game_name.lower(), now) for game_name in self.games]
+
+
+_manager = None
+_manager_built_at = 0.0
+_manager_lock = threading.Lock()
+
+
+def get_timing_manager():
+    """Process-wide GameTimingManager, rebuilt after a Game change or SCHEDULE_TTL_SECONDS."""
+    global _manager, _manager_built_at
+    manager = _manager
+    if manager is not None and monotonic_time.monotonic() - _manager_built_at < SCHEDULE_TTL_SECONDS:
+        return manager
+    with _manager_lock:
+        if _manager is manager:
+            try:
+                _manager = GameTimingManager.from_database()
+            except DatabaseError:
+                # Game table not migrated yet
+                _manager = GameTimingManager()
+            _manager_built_at = monotonic_time.monotonic()
+        return _manager
+
+
+def invalidate_timing_manager():
+    global _manager
+    with _manager_lock:
+        _manager = None
+
+
+# (game_name, open instant) -> GameSession id, so placing a bet doesn't look the session up again
+_session_ids = {}
+SESSION_ID_CACHE_SIZE = 256
+
+
+def get_game_session(game_name, session):
+    """GameSession row for a calendar Session, created the first time it is needed."""
+    from .exposure import create_exposure_book
+    from .models import GameSession, normalize_game_name
+
+    game_session, created = GameSession.objects.get_or_create(
+        game_name=normalize_game_name(game_name),
+        open_at=session.open,
+        defaults={
+            'date': session.open.date(),
+            'session_no': session.session_no,
+            'close_at': session.close,
+            'result_at': session.result,
+        },
+    )
+    if created:
+        create_exposure_book(game_session.pk)
+    elif game_session.result_at is None and session.result is not None:
+        # Rows backfilled from old bets may predate result times
+        GameSession.objects.filter(pk=game_session.pk, result_at__isnull=True).update(result_at=session.result)
+        game_session.result_at = session.result
+    return game_session
+
+
+def get_game_session_id(game_name, session):
+    key = (game_name.upper(), session.open)
+    session_id = _session_ids.get(key)
+    if session_id is None:
+        session_id = get_game_session(game_name, session).pk
+        if len(_session_ids) >= SESSION_ID_CACHE_SIZE:
+            _session_ids.clear()
+        _session_ids[key] = session_id
+    return session_id
+
+
+def find_game_session(game_name, session):
+    """Existing GameSession for a calendar Session, or None (no bets were placed in it)."""
+    from .models import GameSession, normalize_game_name
+
+    return GameSession.objects.filter(
+        game_name=normalize_game_name(game_name), open_at=session.open
+    ).first()
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from settings
+    (PASSWORD_PBKDF2_ITERATIONS, Django's own count when unset). The algorithm name is unchanged, so existing
+    hashes still verify; must_update() flags hashes made with a different
+    count and user.check_password() rewrites them on the next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import WorkerLease
+
+
+def acquire_lease(name, owner, ttl_seconds):
+    """
+    Take or renew the lease `name` for `owner` for `ttl_seconds`.
+
+    Succeeds when the lease is free, expired or already held by `owner`; the
+    check and the takeover are one conditional UPDATE, so two workers can't
+    both win. Returns True if `owner` holds the lease afterwards.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    taken = WorkerLease.objects.filter(
+        Q(owner=owner) | Q(expires_at__lt=now), name=name
+    ).update(owner=owner, expires_at=expires_at)
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            WorkerLease.objects.create(name=name, owner=owner, expires_at=expires_at)
+    except IntegrityError:
+        # Someone else holds it
+        return False
+    return True
+
+
+def release_lease(name, owner):
+    """Let another worker take over right away instead of waiting for expiry."""
+    WorkerLease.objects.filter(name=name, owner=owner).update(expires_at=timezone.now())
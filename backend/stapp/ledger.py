@@ -0,0 +1,125 @@
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import GreaterThanOrEqual
+
+from .caching import invalidate_records
+from .models import Wallet
+
+# Users per UPDATE statement. Each user costs ~3 bound parameters, so this
+# stays well under SQLite's 999 parameter limit.
+CREDIT_BATCH_SIZE = 250
+
+MONEY_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+# Bets are paid from balance first, then winnings, then bonus
+BET_DEBIT_ORDER = ('balance', 'winnings', 'bonus')
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def ensure_wallets(user_ids):
+    """
+    Create wallets for users who don't have one yet (bulk version of get_user_wallet).
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    existing = set()
+    for batch in _batches(list(user_ids), CREDIT_BATCH_SIZE):
+        existing.update(
+            Wallet.objects.filter(user_id__in=batch).values_list('user_id', flat=True)
+        )
+    missing = user_ids - existing
+    if missing:
+        Wallet.objects.bulk_create([Wallet(user_id=uid) for uid in missing])
+        invalidate_records('wallet', missing)
+
+
+def credit_wallets(field, amounts):
+    """
+    Add per-user amounts to one wallet field (balance / bonus / winnings).
+
+    amounts: {user_id: Decimal}. Runs one `field = field + CASE user_id ...`
+    UPDATE per batch of users instead of a get/save per user.
+    """
+    amounts = {uid: amt for uid, amt in amounts.items() if amt}
+    if not amounts:
+        return
+    ensure_wallets(amounts)
+    for batch in _batches(list(amounts.items()), CREDIT_BATCH_SIZE):
+        delta = Case(
+            *[When(user_id=uid, then=Value(amt)) for uid, amt in batch],
+            default=Value(0),
+            output_field=MONEY_FIELD,
+        )
+        Wallet.objects.filter(user_id__in=[uid for uid, _ in batch]).update(
+            **{field: F(field) + delta}
+        )
+    # Queryset updates send no signals, so the cached wallets are dropped here
+    invalidate_records('wallet', amounts)
+
+
+def drain_expressions(fields, amount):
+    """
+    Update kwargs that take `amount` out of `fields` in order.
+
+    Every field gives up what it has (negative values count as zero) before the
+    next one is touched; the last field absorbs whatever is left. All CASE
+    branches read the pre-update values, so this is safe inside a single UPDATE.
+    `amount` may be a Decimal or an expression.
+    """
+    if not hasattr(amount, 'resolve_expression'):
+        amount = Value(amount, output_field=MONEY_FIELD)
+    updates = {}
+    covered = Value(0, output_field=MONEY_FIELD)
+    for i, field in enumerate(fields):
+        remaining = amount - covered
+        available = Greatest(F(field), Value(0), output_field=MONEY_FIELD)
+        if i == len(fields) - 1:
+            updates[field] = Case(
+                When(GreaterThanOrEqual(Value(0), remaining), then=F(field)),
+                default=F(field) - remaining,
+                output_field=MONEY_FIELD,
+            )
+        else:
+            updates[field] = Case(
+                When(GreaterThanOrEqual(Value(0), remaining), then=F(field)),
+                When(GreaterThanOrEqual(available, remaining), then=F(field) - remaining),
+                default=F(field) - available,
+                output_field=MONEY_FIELD,
+            )
+        covered = covered + available
+    return updates
+
+
+def debit_wallet(user, amount, fields=BET_DEBIT_ORDER):
+    """
+    Atomically take `amount` from the user's wallet and return the updated wallet.
+
+    The funds check and the deduction are one conditional UPDATE
+    (`... WHERE balance + winnings + bonus >= amount`), so concurrent debits
+    can't both pass the check and lose an update. Call it inside the same
+    transaction.atomic() block that writes the bet/withdraw record.
+
+    Raises Wallet.DoesNotExist or InsufficientBalance.
+    """
+    total = F(fields[0])
+    for field in fields[1:]:
+        total = total + F(field)
+    updated = Wallet.objects.filter(
+        GreaterThanOrEqual(total, Value(amount, output_field=MONEY_FIELD)),
+        user=user,
+    ).update(**drain_expressions(fields, amount))
+    if not updated:
+        if not Wallet.objects.filter(user=user).exists():
+            raise Wallet.DoesNotExist
+        raise InsufficientBalance
+    invalidate_records('wallet', [user.pk])
+    return Wallet.objects.get(user=user)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from stapp.auto_result import declare_due_sessions
+
+
+class Command(BaseCommand):
+    help = 'Declare Diamond King results for every session whose result time has passed (one pass).'
+
+    def handle(self, *args, **kwargs):
+        declared = declare_due_sessions()
+        if not declared:
+            self.stdout.write(self.style.WARNING("No Diamond King session due for a result."))
+        for game_session, winning_number in declared:
+            self.stdout.write(self.style.SUCCESS(
+                f"Auto result declared for {game_session}: Winning number {winning_number}"
+            ))
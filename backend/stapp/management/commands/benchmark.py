@@ -0,0 +1,483 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+import pytz
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from stapp.events import Event, broadcaster
+from stapp.exposure import aggregate_stakes, exposure_book, liability_vector, rebuild_exposure
+from stapp import caching
+from stapp.authentication import login_candidates
+from stapp.hashers import TunedPBKDF2PasswordHasher
+from stapp.game_timing import GAME_TIMINGS, GameTimingManager, get_timing_manager
+from stapp.models import Bet, GameSession, ReferralCommission, User, Wallet
+from stapp.settlement import COMMISSION_GAMES, DIGIT_PAYOUT, NUMBER_PAYOUT, settle_session
+from stapp.tokens import ClaimsRefreshToken
+from stapp.views import place_bet
+
+BENCH_PASSWORD = 'bench-password'
+# events: how long subscribers sit idle while CPU is measured, and events fanned out
+IDLE_SECONDS = 5
+FANOUT_ROUNDS = 5
+# Bets per simulated player when seeding
+BETS_PER_USER = 20
+SEED_BATCH_SIZE = 2000
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    """Counts the queries run on the default connection without keeping them."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed_session(game_name, bets, referred_share=0.5):
+    """An open GameSession with `bets` random pending bets from bets / BETS_PER_USER players."""
+    now = timezone.now()
+    session = GameSession.objects.create(
+        game_name=game_name, date=timezone.localdate(), session_no=99,
+        open_at=now - timedelta(hours=1), close_at=now, result_at=now,
+    )
+    players = max(bets // BETS_PER_USER, 1)
+    referrer = User.objects.create(username='benchref', mobile='0999999999', referral_code='BENCHREF')
+    Wallet.objects.create(user=referrer)
+    User.objects.bulk_create([
+        User(username=f'bench-{i}', mobile=f'0{i:09d}', referral_code=f'BENCH{i}',
+             referred_by='BENCHREF' if i < players * referred_share else None)
+        for i in range(players)
+    ], batch_size=SEED_BATCH_SIZE)
+    user_ids = list(User.objects.filter(username__startswith='bench-').values_list('id', flat=True))
+    Wallet.objects.bulk_create([Wallet(user_id=uid) for uid in user_ids], batch_size=SEED_BATCH_SIZE)
+
+    rng = random.Random(bets)
+    rows = []
+    for i in range(bets):
+        bet_type = rng.choice(('number', 'number', 'andar', 'bahar'))
+        rows.append(Bet(
+            user_id=user_ids[i % len(user_ids)], game_name=game_name, bet_type=bet_type,
+            number=rng.randrange(100 if bet_type == 'number' else 10), amount=Decimal(rng.choice((10, 20, 50))),
+            session=session, session_start=session.open_at, session_end=session.close_at,
+        ))
+    Bet.objects.bulk_create(rows, batch_size=SEED_BATCH_SIZE)
+    return session
+
+
+def settle_per_bet(game_session, winning_number):
+    """The per-bet settlement loop declare_result used before stapp.settlement, kept as the baseline."""
+    andar_digit, bahar_digit = int(winning_number[0]), int(winning_number[-1])
+    for bet in Bet.objects.filter(session=game_session, status='pending'):
+        payout, is_win = Decimal('0.00'), False
+        if bet.bet_type == 'number' and str(bet.number).zfill(2) == winning_number:
+            payout, is_win = bet.amount * 90, True
+        elif bet.bet_type == 'andar' and bet.number == andar_digit:
+            payout, is_win = bet.amount * 9, True
+        elif bet.bet_type == 'bahar' and bet.number == bahar_digit:
+            payout, is_win = bet.amount * 9, True
+
+        wallet, _ = Wallet.objects.get_or_create(user=bet.user)
+        if is_win:
+            wallet.winnings += payout
+        bet.status = 'won' if is_win else 'lost'
+        if game_session.game_name in COMMISSION_GAMES and bet.bet_type == 'number' and bet.user.referred_by:
+            try:
+                referrer = User.objects.get(referral_code=bet.user.referred_by)
+                commission = bet.amount * Decimal('0.10')
+                referrer_wallet = Wallet.objects.get(user=referrer)
+                referrer_wallet.bonus += commission
+                referrer_wallet.save()
+                ReferralCommission.objects.create(
+                    referrer=referrer, referred_user=bet.user, commission=commission,
+                    commission_type='bet_commission', bet=bet,
+                )
+            except User.DoesNotExist:
+                pass
+        wallet.save()
+        bet.is_win, bet.payout = is_win, payout
+        bet.save()
+
+
+def liability_per_bet(bets):
+    """
+    Payout per winning number from a Python pass over every bet, the shape of
+    the calculate_diamond_king_payouts loop before stapp.exposure (with andar
+    and bahar credited to the ten results they win on), kept as the baseline.
+    """
+    payouts = [Decimal('0.00')] * 100
+    for bet in bets.iterator(chunk_size=SEED_BATCH_SIZE):
+        if bet.bet_type == 'number':
+            payouts[bet.number] += bet.amount * NUMBER_PAYOUT
+        elif bet.bet_type == 'andar':
+            for units in range(10):
+                payouts[bet.number * 10 + units] += bet.amount * DIGIT_PAYOUT
+        elif bet.bet_type == 'bahar':
+            for tens in range(10):
+                payouts[tens * 10 + bet.number] += bet.amount * DIGIT_PAYOUT
+    return payouts
+
+
+def strptime_window(game_name, now):
+    """The strptime/localize get_game_time_window views.py used before the session calendar, kept as the baseline."""
+    ist = pytz.timezone('Asia/Kolkata')
+    now = now.astimezone(ist)
+    timings = GAME_TIMINGS.get(game_name.upper())
+    if not timings:
+        return None, None, None
+    today = now.date()
+    if isinstance(timings, list):
+        for session in timings:
+            open_time = datetime.strptime(session["open"], "%H:%M").time()
+            close_time = datetime.strptime(session["close"], "%H:%M").time()
+            result_time = datetime.strptime(session["result"], "%H:%M").time()
+            open_dt = ist.localize(datetime.combine(today, open_time))
+            close_dt = ist.localize(datetime.combine(today, close_time))
+            result_dt = ist.localize(datetime.combine(today, result_time))
+            if close_time < open_time:
+                close_dt += timedelta(days=1)
+                result_dt += timedelta(days=1)
+            if open_dt <= now <= result_dt:
+                return open_dt, close_dt, result_dt
+        return None, None, None
+    open_time = datetime.strptime(timings["open"], "%H:%M").time()
+    close_time = datetime.strptime(timings["close"], "%H:%M").time()
+    open_dt = ist.localize(datetime.combine(today, open_time))
+    close_dt = ist.localize(datetime.combine(today, close_time))
+    if close_time <= open_time:
+        if now.time() >= open_time:
+            close_dt += timedelta(days=1)
+        else:
+            open_dt -= timedelta(days=1)
+    return open_dt, close_dt, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Time hot paths on seeded data. Seeding happens inside a transaction that is '
+        'rolled back afterwards, but run it against a scratch database all the same.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(self.scenarios()))
+        parser.add_argument('--size', type=int, nargs='+',
+                            help='Problem sizes to time (rows, calls or writers; see each scenario).')
+        parser.add_argument('--baseline', action='store_true',
+                            help='Also time the implementation the optimized path replaced.')
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='http: base URL of the running server to load.')
+        parser.add_argument('--path', default='/api/game-status/', help='http: endpoint to GET.')
+        parser.add_argument('--token', help='http: JWT access token, for authenticated endpoints.')
+        parser.add_argument('--requests', type=int,
+                            help='http: requests per client (default 200); writers: bets per writer (default 40).')
+
+    @classmethod
+    def scenarios(cls):
+        return {name[len('bench_'):]: name for name in dir(cls) if name.startswith('bench_')}
+
+    def handle(self, *args, **options):
+        getattr(self, self.scenarios()[options['scenario']])(options)
+
+    def report(self, label, size, unit, seconds, queries=None):
+        line = f'{label:<12} {unit}={size:<8} {seconds:9.3f} s  {seconds / max(size, 1) * 1e6:10.2f} us/{unit.rstrip("s")}'
+        if queries is not None:
+            line += f'  queries={queries}'
+        self.stdout.write(line)
+
+    def timed_in_rollback(self, seed, *runs):
+        """
+        [(seconds, queries)] of each run(seed()) in turn on the same seeded
+        data, with everything rolled back afterwards.
+        """
+        timings = []
+        try:
+            with transaction.atomic():
+                seeded = seed()
+                for run in runs:
+                    counter = QueryCounter()
+                    started = time.perf_counter()
+                    with connection.execute_wrapper(counter):
+                        run(seeded)
+                    timings.append((time.perf_counter() - started, counter.count))
+                raise Rollback
+        except Rollback:
+            pass
+        return timings
+
+    def bench_settlement(self, options):
+        """Declare a result on a session of N bets: settle_session vs the per-bet loop."""
+        for bets in options['size'] or [1000, 10000, 100000]:
+            if bets < 1:
+                raise CommandError('--size must be positive')
+            [(seconds, queries)] = self.timed_in_rollback(
+                lambda: seed_session('GALI', bets), lambda session: settle_session(session, '07'),
+            )
+            self.report('set-based', bets, 'bets', seconds, queries)
+            if options['baseline']:
+                [(seconds, queries)] = self.timed_in_rollback(
+                    lambda: seed_session('GALI', bets), lambda session: settle_per_bet(session, '07'),
+                )
+                self.report('per-bet', bets, 'bets', seconds, queries)
+
+    def bench_liability(self, options):
+        """
+        Payout for all 100 results of a Diamond King session of N bets: reading
+        the exposure book kept at bet time, recomputing it from stakes summed
+        in the database, and the per-bet Python loop.
+        """
+        def seed(bets):
+            session = seed_session('DIAMOND KING', bets)
+            rebuild_exposure(session.id)
+            return session
+
+        paths = [
+            ('book', lambda session: exposure_book(session.id)),
+            ('aggregated', lambda session: liability_vector(aggregate_stakes(Bet.objects.filter(session=session)))),
+        ]
+        if options['baseline']:
+            paths.append(('per-bet', lambda session: liability_per_bet(Bet.objects.filter(session=session))))
+        for bets in options['size'] or [10000, 100000, 1000000]:
+            if bets < 1:
+                raise CommandError('--size must be positive')
+            timings = self.timed_in_rollback(lambda: seed(bets), *(run for _, run in paths))
+            for (label, _), (seconds, queries) in zip(paths, timings):
+                self.report(label, bets, 'bets', seconds, queries)
+
+    def bench_calendar(self, options):
+        """
+        N session lookups spread over a day, every game: the calendar's bisect
+        alone, the full get_session_window call, and the old strptime path.
+        """
+        manager = GameTimingManager()
+        start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        for calls in options['size'] or [100000]:
+            # Warm the calendar's day cache, as a running process has
+            manager.get_session_window(manager.games[0], start)
+            instants = [start + timedelta(seconds=i * 86400 // calls) for i in range(calls)]
+            games = [manager.games[i % len(manager.games)] for i in range(calls)]
+            paths = [('bisect', manager.calendar.current_session), ('calendar', manager.get_session_window)]
+            if options['baseline']:
+                paths.append(('strptime', strptime_window))
+            for label, window in paths:
+                started = time.perf_counter()
+                for game_name, now in zip(games, instants):
+                    window(game_name, now)
+                self.report(label, calls, 'calls', time.perf_counter() - started)
+
+    def bench_login(self, options):
+        """
+        N logins taken apart, as login_user does them: the user lookup, the
+        first check of a password stored at an outdated PBKDF2 cost (which
+        verifies, rehashes and saves it), the check of the now current hash,
+        and minting the token pair. logins/s counts lookup, check and tokens.
+        """
+        hasher = TunedPBKDF2PasswordHasher()
+        outdated = hasher.encode(BENCH_PASSWORD, hasher.salt(), iterations=hasher.iterations // 2)
+
+        def seed(logins):
+            User.objects.bulk_create([
+                User(username=f'bench-login-{i}', mobile=f'07{i:08d}', referral_code=f'BENCHL{i}', password=outdated)
+                for i in range(logins)
+            ], batch_size=SEED_BATCH_SIZE)
+            return {}
+
+        def lookup(found):
+            for i in range(logins):
+                [found[i]] = login_candidates(f'07{i:08d}')
+
+        def check(found):
+            for user in found.values():
+                if not user.check_password(BENCH_PASSWORD):
+                    raise CommandError(f'Password check failed for {user.username}')
+
+        def tokens(found):
+            for user in found.values():
+                refresh = ClaimsRefreshToken.for_user(user)
+                str(refresh.access_token), str(refresh)
+
+        stages = [('lookup', lookup), ('rehash', check), ('check', check), ('tokens', tokens)]
+        self.stdout.write(f'PBKDF2 iterations={hasher.iterations} (outdated hashes at {hasher.iterations // 2})')
+        for logins in options['size'] or [10]:
+            if logins < 1:
+                raise CommandError('--size must be positive')
+            timings = self.timed_in_rollback(lambda: seed(logins), *(run for _, run in stages))
+            for (label, _), (seconds, queries) in zip(stages, timings):
+                self.report(label, logins, 'logins', seconds, queries)
+            total = sum(seconds for (label, _), (seconds, _) in zip(stages, timings) if label != 'rehash')
+            self.stdout.write(f'{"login":<12} logins={logins:<8} {total:9.3f} s  {logins / total:10.1f} logins/s')
+
+    def bench_events(self, options):
+        """
+        N server-sent-event subscribers on this process's Broadcaster, each
+        with a task waiting on its queue as stream() does: the time to attach
+        them, the CPU the process uses while they sit idle, and the time from
+        deliver() until every one of them has received an event.
+        """
+        async def run(subscribers):
+            loop = asyncio.get_running_loop()
+            received = []
+            all_received = asyncio.Event()
+
+            async def consume(queue):
+                while True:
+                    payload = await queue.get()
+                    if b'event: bench' in payload:
+                        received.append(loop.time())
+                        if len(received) == subscribers:
+                            all_received.set()
+
+            started = time.perf_counter()
+            queues = [broadcaster.subscribe() for _ in range(subscribers)]
+            consumers = [loop.create_task(consume(queue)) for queue in queues]
+            await asyncio.sleep(0)
+            attached = time.perf_counter() - started
+            try:
+                # Let the schedule watcher's first database check finish before measuring idle
+                await broadcaster.snapshot()
+                cpu, wall = time.process_time(), time.perf_counter()
+                await asyncio.sleep(IDLE_SECONDS)
+                cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+                fanouts = []
+                for i in range(FANOUT_ROUNDS):
+                    received.clear()
+                    all_received.clear()
+                    sent = loop.time()
+                    broadcaster.deliver(Event('bench', {'round': i}))
+                    await all_received.wait()
+                    fanouts.append(max(received) - sent)
+            finally:
+                for queue, consumer in zip(queues, consumers):
+                    consumer.cancel()
+                    broadcaster.unsubscribe(queue)
+            return attached, cpu / wall, sorted(fanouts)[len(fanouts) // 2]
+
+        for subscribers in options['size'] or [1000, 10000]:
+            if subscribers < 1:
+                raise CommandError('--size must be positive')
+            attached, idle_cpu, fanout = asyncio.run(run(subscribers))
+            self.report('attach', subscribers, 'subscribers', attached)
+            self.stdout.write(f'{"idle":<12} subscribers={subscribers:<8} cpu={idle_cpu:7.2%} of one core'
+                              f' over {IDLE_SECONDS} s')
+            self.report('fan-out', subscribers, 'subscribers', fanout)
+
+    def bench_http(self, options):
+        """
+        Requests/s of GET --path on a running server with N concurrent clients.
+        Nothing is seeded: start each deployment profile in turn and point --url
+        at it, e.g. `python manage.py runserver 8000` for the SQLite/WSGI default
+        and, against a local PostgreSQL (`docker run -e POSTGRES_PASSWORD=pg
+        -p 5432:5432 postgres`), `DJANGO_SETTINGS_MODULE=backend.settings_production
+        DATABASE_URL=postgres://postgres:pg@localhost/postgres gunicorn
+        backend.asgi:application -k uvicorn.workers.UvicornWorker -b :8001`.
+        """
+        url = options['url'].rstrip('/') + options['path']
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else {}
+        per_client = options['requests'] or 200
+
+        def client(_):
+            failures = 0
+            for _ in range(per_client):
+                try:
+                    with urlopen(Request(url, headers=headers), timeout=30) as response:
+                        response.read()
+                except (URLError, OSError):
+                    failures += 1
+            return failures
+
+        for clients in options['size'] or [1, 8, 32]:
+            if clients < 1:
+                raise CommandError('--size must be positive')
+            started = time.perf_counter()
+            with ThreadPoolExecutor(clients) as pool:
+                failures = sum(pool.map(client, range(clients)))
+            seconds = time.perf_counter() - started
+            total = clients * per_client
+            self.stdout.write(
+                f'clients={clients:<4} requests={total:<7} {seconds:9.3f} s  {total / seconds:9.1f} req/s'
+                f'  failures={failures}'
+            )
+
+    def bench_writers(self, options):
+        """
+        Bets/s with N threads placing bets through place_bet at once, each as
+        its own player on its own connection, in whichever game is open now.
+        The bets have to be committed for the writers to contend, so they are
+        deleted (and the session's exposure book rebuilt) afterwards. To compare
+        SQLite modes, run it on a fresh database file with and without
+        SQLITE_PERFORMANCE_MODE=0.
+        """
+        manager = get_timing_manager()
+        now = timezone.localtime()
+        game_name = next((game for game in manager.games if not manager.is_game_locked(game, now)), None)
+        if game_name is None:
+            raise CommandError('No game is taking bets right now')
+        per_writer = options['requests'] or 40
+        factory = APIRequestFactory()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+            self.stdout.write(f"sqlite journal_mode={journal_mode} "
+                              f"transaction_mode={connection.transaction_mode or 'DEFERRED'}")
+
+        def writer(user):
+            errors = []
+            try:
+                for i in range(per_writer):
+                    request = factory.post('/api/place-bet/', {
+                        'game_name': game_name, 'bet_type': 'number', 'number': i % 100, 'amount': 10,
+                    }, format='json')
+                    force_authenticate(request, user)
+                    response = place_bet(request)
+                    if response.status_code != 200:
+                        errors.append(response.data.get('error'))
+            finally:
+                connections.close_all()
+            return errors
+
+        for writers in options['size'] or [1, 8, 32]:
+            if writers < 1:
+                raise CommandError('--size must be positive')
+            users = [
+                User.objects.create(username=f'bench-writer-{i}', mobile=f'08{i:08d}', referral_code=f'BENCHW{i}')
+                for i in range(writers)
+            ]
+            Wallet.objects.bulk_create([Wallet(user=user, balance=Decimal(10 * per_writer)) for user in users])
+            try:
+                # place_bet prints a debug line per bet
+                with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(writers) as pool:
+                        errors = [error for errors in pool.map(writer, users) for error in errors]
+                    seconds = time.perf_counter() - started
+                bets = Bet.objects.filter(user__in=users)
+                placed = bets.count()
+                session_ids = set(bets.values_list('session_id', flat=True))
+            finally:
+                User.objects.filter(username__startswith='bench-writer-').delete()
+            for session_id in session_ids:
+                rebuild_exposure(session_id)
+            caching.invalidate_game(game_name)
+            self.stdout.write(
+                f'writers={writers:<4} bets={placed:<7} {seconds:9.3f} s  {placed / seconds:9.1f} bets/s'
+                f'  errors={len(errors)}'
+            )
+            for error in sorted(set(errors)):
+                self.stdout.write(f'  {errors.count(error)} x {error}')
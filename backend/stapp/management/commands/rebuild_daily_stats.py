@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stapp.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyStats / MonthlyBettor dashboard rollups from bets, deposits, withdrawals and users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only rebuild the last N days (default: all history).')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'])
+        written = rebuild_daily_stats(since)
+        scope = f"since {since}" if since else "for all history"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily stats rows {scope}."))
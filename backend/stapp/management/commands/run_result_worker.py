@@ -0,0 +1,60 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from stapp.auto_result import AUTO_DECLARE_GAMES, declare_due_sessions
+from stapp.game_timing import get_timing_manager
+from stapp.leases import acquire_lease, release_lease
+
+LEASE_NAME = 'auto-declare'
+
+
+class Command(BaseCommand):
+    help = (
+        'Long-running worker that declares auto-declared game results at each '
+        "session's result time. Only the worker holding the DB lease declares; "
+        'sessions missed while it was down are declared on start-up.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lease-seconds', type=int, default=60,
+                            help='Lease lifetime; the worker renews it every third of this.')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single pass and exit.')
+
+    def handle(self, *args, **options):
+        lease_seconds = options['lease_seconds']
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Result worker {owner} started")
+        try:
+            while True:
+                close_old_connections()
+                if acquire_lease(LEASE_NAME, owner, lease_seconds):
+                    for game_session, winning_number in declare_due_sessions():
+                        self.stdout.write(self.style.SUCCESS(
+                            f"Declared {game_session}: winning number {winning_number}"
+                        ))
+                if options['once']:
+                    break
+                time.sleep(self.seconds_until_next_result(lease_seconds / 3))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            release_lease(LEASE_NAME, owner)
+            self.stdout.write(f"Result worker {owner} stopped")
+
+    def seconds_until_next_result(self, max_sleep):
+        """Sleep until the next result instant, waking at least every `max_sleep` to renew the lease."""
+        now = timezone.now()
+        timing_manager = get_timing_manager()
+        wait = max_sleep
+        for game_name in AUTO_DECLARE_GAMES:
+            next_result = timing_manager.get_next_result(game_name, now)
+            if next_result is not None:
+                wait = min(wait, (next_result - now).total_seconds())
+        # A hair past the instant so result_at <= now holds on wake-up
+        return max(wait, 0) + 0.05
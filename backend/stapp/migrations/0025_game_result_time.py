@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:07
+
+import datetime
+
+from django.db import migrations, models
+
+# (open, close, result) defaults, as in stapp.game_timing.GAME_TIMINGS (see there for
+# where each result time comes from)
+DEFAULT_GAMES = {
+    'JAIPUR KING': ('21:00', '16:50', '17:00'),
+    'FARIDABAD': ('22:00', '17:40', '19:00'),
+    'GHAZIABAD': ('23:00', '19:50', '21:30'),
+    'GALI': ('04:00', '22:30', '23:59'),
+    'DISAWER': ('07:00', '02:30', '07:00'),
+    'DIAMOND KING': ('06:00', '23:50', None),
+}
+
+
+def _time(value):
+    return datetime.time(*map(int, value.split(':'))) if value else None
+
+
+def seed_games(apps, schema_editor):
+    Game = apps.get_model('stapp', 'Game')
+    for name, (open_time, close_time, result_time) in DEFAULT_GAMES.items():
+        game = Game.objects.filter(name__iexact=name).first()
+        if game is None:
+            Game.objects.create(
+                name=name,
+                open_time=_time(open_time),
+                close_time=_time(close_time),
+                result_time=_time(result_time),
+            )
+        elif game.result_time is None and result_time:
+            game.result_time = _time(result_time)
+            game.save(update_fields=['result_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0024_declaredresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='result_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(seed_games, migrations.RunPython.noop),
+    ]
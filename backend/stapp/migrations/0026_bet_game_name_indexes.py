@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:07
+
+from django.db import migrations, models
+from django.db.models.functions import Trim, Upper
+
+
+def normalize_game_names(apps, schema_editor):
+    Bet = apps.get_model('stapp', 'Bet')
+    Bet.objects.update(game_name=Upper(Trim('game_name')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0025_game_result_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_game_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bet',
+            name='game_name',
+            field=models.CharField(choices=[('GALI', 'Gali'), ('FARIDABAD', 'Faridabad'), ('DISAWER', 'Disawer'), ('GHAZIABAD', 'Ghaziabad'), ('JAIPUR KING', 'Jaipur King'), ('DIAMOND KING', 'Diamond King')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['game_name', 'status', 'created_at'], name='bet_game_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['user', 'created_at'], name='bet_user_created_idx'),
+        ),
+    ]
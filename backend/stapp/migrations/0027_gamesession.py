@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0026_bet_game_name_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_name', models.CharField(max_length=20)),
+                ('date', models.DateField()),
+                ('session_no', models.PositiveSmallIntegerField(default=1)),
+                ('open_at', models.DateTimeField()),
+                ('close_at', models.DateTimeField()),
+                ('result_at', models.DateTimeField(blank=True, null=True)),
+                ('winning_number', models.CharField(blank=True, max_length=3, null=True)),
+                ('state', models.CharField(choices=[('open', 'Open'), ('declared', 'Declared')], default='open', max_length=10)),
+                ('declared_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('game_name', 'open_at'), name='unique_game_session_open')],
+            },
+        ),
+        migrations.AddField(
+            model_name='bet',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bets', to='stapp.gamesession'),
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['session', 'status'], name='bet_session_status_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+import pytz
+from django.db import migrations
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Diamond King session open times, in session_no order (stapp.game_timing)
+DIAMOND_KING_OPENS = ['06:00', '08:10', '10:10', '12:10', '14:10', '16:10', '18:10', '20:10', '22:10']
+
+
+def backfill_sessions(apps, schema_editor):
+    """
+    Create one GameSession per distinct (game_name, session_start, session_end)
+    already stored on bets and point those bets at it, one UPDATE per session.
+    Bets placed before session_start/session_end existed are left without one.
+    """
+    Bet = apps.get_model('stapp', 'Bet')
+    GameSession = apps.get_model('stapp', 'GameSession')
+
+    windows = list(
+        Bet.objects.filter(session__isnull=True, session_start__isnull=False, session_end__isnull=False)
+        .values_list('game_name', 'session_start', 'session_end')
+        .distinct()
+        .order_by('game_name', 'session_start')
+    )
+    for game_name, open_at, close_at in windows:
+        local_open = open_at.astimezone(IST)
+        open_hhmm = local_open.strftime('%H:%M')
+        session_no = 1
+        if game_name == 'DIAMOND KING' and open_hhmm in DIAMOND_KING_OPENS:
+            session_no = DIAMOND_KING_OPENS.index(open_hhmm) + 1
+        bets = Bet.objects.filter(
+            game_name=game_name, session_start=open_at, session_end=close_at, session__isnull=True
+        )
+        declared = not bets.filter(status='pending').exists()
+        session, _ = GameSession.objects.get_or_create(
+            game_name=game_name,
+            open_at=open_at,
+            defaults={
+                'date': local_open.date(),
+                'session_no': session_no,
+                'close_at': close_at,
+                'state': 'declared' if declared else 'open',
+            },
+        )
+        bets.update(session=session)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0027_gamesession'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sessions, migrations.RunPython.noop),
+    ]
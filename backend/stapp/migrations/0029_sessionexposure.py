@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0028_backfill_bet_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionExposure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('liability', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exposure', to='stapp.gamesession')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('session', 'number'), name='unique_session_exposure_number')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('stapp', '0032_feed_created_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('game_name', models.CharField(blank=True, default='', max_length=20)),
+                ('stake', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payout', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('commission', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bettors', models.PositiveIntegerField(default=0)),
+                ('deposits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('withdrawals', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('new_users', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyBettor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['status', 'created_at'], name='bet_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='referralcommission',
+            index=models.Index(fields=['commission_type', 'created_at'], name='commission_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystats',
+            constraint=models.UniqueConstraint(fields=('day', 'game_name'), name='unique_daily_stats_day_game'),
+        ),
+        migrations.AddField(
+            model_name='monthlybettor',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlybettor',
+            constraint=models.UniqueConstraint(fields=('month', 'user'), name='unique_monthly_bettor'),
+        ),
+    ]
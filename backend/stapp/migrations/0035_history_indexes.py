@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0034_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bet',
+            name='bet_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='bet_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='transaction_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:02
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+SYNCED_MODELS = ('Bet', 'Transaction', 'DepositRequest', 'WithdrawRequest')
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing rows last changed no later than they were created, as far as anyone can tell
+    for name in SYNCED_MODELS:
+        apps.get_model('stapp', name).objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0035_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bet',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='depositrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='withdrawrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='bet_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='depositrequest',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='deposit_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='transaction_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawrequest',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='withdraw_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+MONEY_FIELDS = ('balance', 'bonus', 'winnings')
+
+
+def merge_duplicate_wallets(apps, schema_editor):
+    # get_or_create races left some users with several wallets; fold them into the oldest
+    Wallet = apps.get_model('stapp', 'Wallet')
+    duplicated = (
+        Wallet.objects.values('user_id').annotate(wallets=Count('id')).filter(wallets__gt=1)
+        .values_list('user_id', flat=True)
+    )
+    for user_id in list(duplicated):
+        keep, *extra = Wallet.objects.filter(user_id=user_id).order_by('pk')
+        for wallet in extra:
+            for field in MONEY_FIELDS:
+                setattr(keep, field, getattr(keep, field) + getattr(wallet, field))
+        keep.save(update_fields=MONEY_FIELDS)
+        Wallet.objects.filter(pk__in=[wallet.pk for wallet in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0036_sync_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_wallets, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='wallet',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from datetime import datetime, time, timedelta
+
+import pytz
+from django.db import migrations
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Result times when the Game table has none (stapp.game_timing.GAME_TIMINGS at the time of writing)
+DEFAULT_RESULT_TIMES = {
+    'JAIPUR KING': ['17:00'],
+    'FARIDABAD': ['19:00'],
+    'GHAZIABAD': ['21:30'],
+    'GALI': ['23:59'],
+    'DISAWER': ['07:00'],
+    'DIAMOND KING': ['08:00', '10:00', '12:00', '14:00', '16:00', '18:00', '20:00', '22:00', '23:59'],
+}
+
+
+def parse_hhmm(value):
+    hour, minute = value.split(':')
+    return time(int(hour), int(minute))
+
+
+def result_after(close_at, result_times):
+    """The first of the game's result times at or after the session's close, as the calendar does."""
+    local_close = close_at.astimezone(IST)
+    candidates = []
+    for result_time in result_times:
+        result_dt = IST.localize(datetime.combine(local_close.date(), result_time))
+        if result_dt < local_close:
+            result_dt += timedelta(days=1)
+        candidates.append(result_dt)
+    return min(candidates)
+
+
+def backfill_result_at(apps, schema_editor):
+    """
+    0028 created GameSession rows for existing bets without a result_at, so
+    the result worker (which selects on result_at) never saw them. Give every
+    such session its result time; games with no known timing get their
+    close time, making them due as soon as betting closed.
+    """
+    Game = apps.get_model('stapp', 'Game')
+    GameSession = apps.get_model('stapp', 'GameSession')
+
+    result_times = {
+        game: [parse_hhmm(value) for value in values] for game, values in DEFAULT_RESULT_TIMES.items()
+    }
+    for game in Game.objects.exclude(result_time__isnull=True):
+        # The Game row overrides the default, except for Diamond King's per-session table
+        name = game.name.strip().upper()
+        if name != 'DIAMOND KING':
+            result_times[name] = [game.result_time]
+
+    sessions = GameSession.objects.filter(result_at__isnull=True).only('pk', 'game_name', 'close_at')
+    for session in sessions.iterator():
+        times = result_times.get(session.game_name.upper())
+        result_at = result_after(session.close_at, times) if times else session.close_at
+        GameSession.objects.filter(pk=session.pk).update(result_at=result_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0037_wallet_one_per_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_result_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+
+# stapp.rollups at the time of writing
+PLATFORM = ''
+SETTLED = ('won', 'lost')
+INSERT_BATCH_SIZE = 1000
+ZERO = Decimal('0.00')
+
+
+def seed_rollups(apps, schema_editor):
+    """
+    The dashboard reads only DailyStats / MonthlyBettor; fill them from the
+    history so far, one grouped query per source table. Commissions count on
+    the day of their bet.
+    """
+    Bet = apps.get_model('stapp', 'Bet')
+    DailyStats = apps.get_model('stapp', 'DailyStats')
+    DepositRequest = apps.get_model('stapp', 'DepositRequest')
+    MonthlyBettor = apps.get_model('stapp', 'MonthlyBettor')
+    ReferralCommission = apps.get_model('stapp', 'ReferralCommission')
+    User = apps.get_model('stapp', 'User')
+    WithdrawRequest = apps.get_model('stapp', 'WithdrawRequest')
+
+    def dated(queryset, field='created_at'):
+        return queryset.annotate(day=TruncDate(field)).order_by()
+
+    rows = defaultdict(dict)
+    settled = Bet.objects.filter(status__in=SETTLED)
+    for row in dated(settled).values('day', 'game_name').annotate(
+        stake=Sum('amount'),
+        payout=Sum('payout', filter=Q(status='won')),
+        bettors=Count('user', distinct=True),
+    ):
+        rows[row['day'], row['game_name']].update(
+            stake=row['stake'], payout=row['payout'] or ZERO, bettors=row['bettors']
+        )
+    commissions = ReferralCommission.objects.filter(commission_type='bet_commission', bet__isnull=False)
+    for row in dated(commissions, 'bet__created_at').values('day', 'bet__game_name').annotate(total=Sum('commission')):
+        rows[row['day'], row['bet__game_name']]['commission'] = row['total']
+    for row in dated(DepositRequest.objects.filter(status='approved')).values('day').annotate(total=Sum('amount')):
+        rows[row['day'], PLATFORM]['deposits'] = row['total']
+    for row in dated(WithdrawRequest.objects.filter(is_approved=True)).values('day').annotate(total=Sum('amount')):
+        rows[row['day'], PLATFORM]['withdrawals'] = row['total']
+    for row in dated(User.objects.all(), 'date_joined').values('day').annotate(total=Count('id')):
+        rows[row['day'], PLATFORM]['new_users'] = row['total']
+
+    DailyStats.objects.all().delete()
+    DailyStats.objects.bulk_create(
+        [DailyStats(day=day, game_name=game_name, **values) for (day, game_name), values in rows.items()],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    monthly = settled.annotate(month=TruncMonth('created_at', output_field=DateField())).order_by() \
+        .values_list('month', 'user_id').distinct()
+    MonthlyBettor.objects.bulk_create(
+        (MonthlyBettor(month=month, user_id=user_id) for month, user_id in monthly.iterator()),
+        batch_size=INSERT_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stapp', '0038_backfill_session_result_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_rollups, migrations.RunPython.noop),
+    ]
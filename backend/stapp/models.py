@@ -16,10 +16,17 @@ class User(AbstractUser):
     email = models.EmailField(blank=True, null=True)
     referral_code = models.CharField(max_length=10, unique=True, blank=True, null=True)
     referred_by = models.CharField(max_length=20, blank=True, null=True)  # stores referral_code
+    # Bumped to revoke every JWT issued so far (see stapp.tokens)
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'mobile'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.referral_code:
             base = (self.mobile or self.username or "USR")[:3].upper()
@@ -32,6 +39,14 @@ class User(AbstractUser):
                 self.referral_code = uuid.uuid4().hex[:7].upper()
         super().save(*args, **kwargs)
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # A user built from JWT claims (stapp.tokens) has every other field deferred;
+        # load them all on the first read instead of one query per field
+        if fields is not None and getattr(self, 'loaded_from_claims', False):
+            fields = set(fields) | self.get_deferred_fields()
+            self.loaded_from_claims = False
+        super().refresh_from_db(using, fields, from_queryset)
+
     def get_referrer(self):
         if self.referred_by:
             try:
@@ -41,7 +56,7 @@ class User(AbstractUser):
         return None
 
 class Wallet(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     bonus = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     winnings = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -63,6 +78,13 @@ class DepositRequest(models.Model):
     payment_method = models.CharField(max_length=20) 
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     approved_at = models.DateTimeField(null=True, blank=True)  # ✅ Add this if you need timestamp
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='deposit_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='deposit_user_updated_idx'),
+        ]
 
     def is_approved(self):
         return self.status == "approved"
@@ -84,6 +106,13 @@ class WithdrawRequest(models.Model):
     is_rejected = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     approved_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='withdraw_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='withdraw_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} Withdraw ₹{self.amount}"
@@ -99,6 +128,16 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     note = models.CharField(max_length=255, null=True, blank=True)
     related_deposit = models.ForeignKey('DepositRequest', null=True, blank=True, on_delete=models.SET_NULL)  # <-- Add this line
+    # Set on every write (queryset .update() calls must pass it explicitly); drives /api/sync/
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='transaction_created_idx'),
+            # A user's history, newest first
+            models.Index(fields=['user', 'created_at', 'id'], name='transaction_user_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='transaction_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - {self.amount} - {self.status}"
@@ -110,14 +149,20 @@ from decimal import Decimal
 
 User = get_user_model()
 
+
+def normalize_game_name(game_name):
+    """Canonical (upper case) game name, so game_name lookups can be exact and index-backed."""
+    return (game_name or '').strip().upper()
+
+
 class Bet(models.Model):
     GAME_CHOICES = [
-        ('gali', 'Gali'),
-        ('faridabad', 'Faridabad'),
-        ('disawer', 'Disawer'),
-        ('ghaziabad', 'Ghaziabad'),
-        ('jaipur king', 'Jaipur King'),
-        ('diamond king', 'Diamond King'),
+        ('GALI', 'Gali'),
+        ('FARIDABAD', 'Faridabad'),
+        ('DISAWER', 'Disawer'),
+        ('GHAZIABAD', 'Ghaziabad'),
+        ('JAIPUR KING', 'Jaipur King'),
+        ('DIAMOND KING', 'Diamond King'),
     ]
     BET_TYPE_CHOICES = [
         ('number', 'Number'),
@@ -135,12 +180,28 @@ class Bet(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     session_start = models.DateTimeField(null=True, blank=True) 
     session_end = models.DateTimeField(null=True, blank=True) 
+    session = models.ForeignKey('GameSession', on_delete=models.PROTECT, null=True, blank=True, related_name='bets')
     status = models.CharField(
         max_length=10,
         choices=[('pending', 'Pending'), ('won', 'Won'), ('lost', 'Lost')],
         default='pending'
     )
-    
+    # Set on every write (queryset .update() calls must pass it explicitly); drives /api/sync/
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Session-window lookups: game_name=..., status=..., created_at range
+            models.Index(fields=['game_name', 'status', 'created_at'], name='bet_game_status_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='bet_user_created_idx'),
+            models.Index(fields=['session', 'status'], name='bet_session_status_idx'),
+            models.Index(fields=['status', 'created_at'], name='bet_status_created_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='bet_user_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.game_name = normalize_game_name(self.game_name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.game_name} - {self.bet_type} - {self.number}"
@@ -150,12 +211,73 @@ class Game(models.Model):
     name = models.CharField(max_length=50, unique=True)
     open_time = models.TimeField()
     close_time = models.TimeField()
+    result_time = models.TimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
 
     def __str__(self):
         return self.name
 
 
+class GameSession(models.Model):
+    """One sitting of a game: the window bets are taken in and the result declared for it."""
+    STATE_CHOICES = [
+        ('open', 'Open'),
+        ('declared', 'Declared'),
+    ]
+
+    game_name = models.CharField(max_length=20)
+    date = models.DateField()  # IST date the session opens on
+    session_no = models.PositiveSmallIntegerField(default=1)
+    open_at = models.DateTimeField()
+    close_at = models.DateTimeField()
+    result_at = models.DateTimeField(null=True, blank=True)
+    winning_number = models.CharField(max_length=3, null=True, blank=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='open')
+    declared_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game_name', 'open_at'], name='unique_game_session_open'),
+        ]
+
+    def __str__(self):
+        return f"{self.game_name} #{self.session_no} {self.date} ({self.state})"
+
+
+class Settlement(models.Model):
+    """
+    Journal of one result declaration, enough to reverse it exactly:
+    credits = {"winnings": {"<user_id>": "<amount>"}, "bonus": {...}} and the
+    ReferralCommission rows it created.
+    """
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name='settlements')
+    winning_number = models.CharField(max_length=3)
+    credits = models.JSONField(default=dict)
+    commission_ids = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    undone_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.session} -> {self.winning_number}{' (undone)' if self.undone_at else ''}"
+
+
+class SessionExposure(models.Model):
+    """
+    Payout the house owes if `number` (00-99) is declared for a session,
+    summed over the session's bets. Kept up to date by place_bet.
+    """
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name='exposure')
+    number = models.PositiveSmallIntegerField()
+    liability = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'number'], name='unique_session_exposure_number'),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id} {self.number:02d}: {self.liability}"
+
 
 class ReferralCommission(models.Model):
     COMMISSION_TYPE_CHOICES = [
@@ -171,6 +293,11 @@ class ReferralCommission(models.Model):
     commission_type = models.CharField(max_length=20, choices=COMMISSION_TYPE_CHOICES)  # <-- Add this line
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['commission_type', 'created_at'], name='commission_type_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.referrer} earned ₹{self.commission} from {self.referred_user}"
     
@@ -212,3 +339,49 @@ class DeclaredResult(models.Model):
 
     def __str__(self):
         return f"{self.game_name} - {self.winning_number} - {self.declared_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class WorkerLease(models.Model):
+    """Named lease so only one background worker process does a job at a time."""
+    name = models.CharField(max_length=50, unique=True)
+    owner = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.owner} until {self.expires_at}"
+
+
+class DailyStats(models.Model):
+    """
+    Per game per day P&L rollup behind the admin dashboard (stapp.rollups).
+    Rows with game_name='' carry the platform figures: deposits, withdrawals
+    and new users. Stake/payout/commission count settled bets only.
+    """
+    day = models.DateField()
+    game_name = models.CharField(max_length=20, blank=True, default='')
+    stake = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payout = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    commission = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bettors = models.PositiveIntegerField(default=0)
+    deposits = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    withdrawals = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_users = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'game_name'], name='unique_daily_stats_day_game'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.game_name or 'ALL'}"
+
+
+class MonthlyBettor(models.Model):
+    """A user who had a bet settled in a month; counted for monthly active users."""
+    month = models.DateField()  # first day of the month
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'user'], name='unique_monthly_bettor'),
+        ]
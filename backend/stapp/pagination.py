@@ -1,8 +1,76 @@
 # your_app/pagination.py
 
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
 from rest_framework.pagination import PageNumberPagination
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10  # default items per page
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder drops microseconds past milliseconds; a cursor must round-trip exactly
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+    if not isinstance(values, list):
+        raise InvalidCursor('cursor must encode a list')
+    return values
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=50):
+    """
+    One page of `queryset` ordered by `ordering` (e.g. ['-total_deposit', '-pk'];
+    the last field must be unique). Rows after `cursor` are selected with a
+    WHERE on the ordering values instead of OFFSET, so every page costs the
+    same however deep it is.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Raises InvalidCursor for a cursor that doesn't match `ordering`.
+    """
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise InvalidCursor('cursor does not match ordering')
+        # (a, b) after (x, y)  <=>  a > x OR (a = x AND b > y), flipped for descending fields
+        after = Q(pk__in=[])
+        for i, (name, descending) in enumerate(fields):
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+            for j in range(i):
+                step &= Q(**{fields[j][0]: values[j]})
+            after |= step
+        queryset = queryset.filter(after)
+
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, encode_cursor(last[name] for name, _ in fields)
+    return rows, encode_cursor(getattr(last, name) for name, _ in fields)
@@ -0,0 +1,40 @@
+"""
+Cached wallet and profile of a user, the two records every client polls.
+
+Both are kept in the cache under a per-user version (see
+caching.user_record) that is dropped on every write: Wallet/User saves and
+deletes through signals, the ledger's set-based debits and credits
+explicitly. A poll of an unchanged record costs two cache reads and no query.
+"""
+from decimal import Decimal
+
+from .caching import user_record
+from .models import User, Wallet
+
+WALLET_FIELDS = ('balance', 'bonus', 'winnings')
+
+
+def money(value):
+    """Amount as a 2-decimal string; SQLite returns sums and subqueries unquantized."""
+    return str((value or Decimal('0')).quantize(Decimal('0.01')))
+
+
+def wallet(user_id):
+    """({balance, bonus, winnings}, etag); zeros for a user without a wallet."""
+    def compute():
+        row = Wallet.objects.filter(user_id=user_id).values(*WALLET_FIELDS).first() or {}
+        return {field: money(row.get(field)) for field in WALLET_FIELDS}
+
+    return user_record('wallet', user_id, compute)
+
+
+def profile(user_id):
+    """(the api/profile/ payload, etag)."""
+    def compute():
+        row = User.objects.filter(pk=user_id).values(
+            'id', 'username', 'mobile', 'email', 'referral_code', 'date_joined', 'is_active'
+        ).get()
+        row['status'] = 'active' if row.pop('is_active') else 'blocked'
+        return row
+
+    return user_record('profile', user_id, compute)
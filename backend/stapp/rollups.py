@@ -0,0 +1,191 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    Bet, DailyStats, DepositRequest, MonthlyBettor, ReferralCommission, User, WithdrawRequest,
+)
+
+# game_name of the platform-wide row (deposits, withdrawals, new users)
+PLATFORM = ''
+SETTLED = ('won', 'lost')
+INSERT_BATCH_SIZE = 1000
+
+ZERO = Decimal('0.00')
+
+
+def _day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def local_day(dt):
+    return timezone.localtime(dt).date()
+
+
+def refresh_game_day(game_name, day):
+    """Recompute stake/payout/commission/bettors of one (game, day) row from its settled bets."""
+    start, end = _day_range(day)
+    totals = Bet.objects.filter(
+        game_name=game_name, status__in=SETTLED, created_at__gte=start, created_at__lt=end
+    ).aggregate(
+        stake=Sum('amount'),
+        payout=Sum('payout', filter=Q(status='won')),
+        bettors=Count('user', distinct=True),
+    )
+    # Commissions count on the day of their bet, like its stake and payout
+    commission = ReferralCommission.objects.filter(
+        commission_type='bet_commission', bet__game_name=game_name,
+        bet__created_at__gte=start, bet__created_at__lt=end,
+    ).aggregate(total=Sum('commission'))['total']
+    DailyStats.objects.update_or_create(day=day, game_name=game_name, defaults={
+        'stake': totals['stake'] or ZERO,
+        'payout': totals['payout'] or ZERO,
+        'commission': commission or ZERO,
+        'bettors': totals['bettors'],
+    })
+
+
+def refresh_platform_day(day):
+    """Recompute approved deposits/withdrawals and sign-ups of one day."""
+    start, end = _day_range(day)
+    in_day = {'created_at__gte': start, 'created_at__lt': end}
+    DailyStats.objects.update_or_create(day=day, game_name=PLATFORM, defaults={
+        'deposits': DepositRequest.objects.filter(status='approved', **in_day)
+        .aggregate(total=Sum('amount'))['total'] or ZERO,
+        'withdrawals': WithdrawRequest.objects.filter(is_approved=True, **in_day)
+        .aggregate(total=Sum('amount'))['total'] or ZERO,
+        'new_users': User.objects.filter(date_joined__gte=start, date_joined__lt=end).count(),
+    })
+
+
+def record_session_rollups(game_session):
+    """
+    Bring the rollups up to date after a session was settled or undone: the
+    days its bets were placed on and the monthly bettor set.
+    """
+    bets = Bet.objects.filter(session=game_session)
+    days = set(
+        bets.annotate(day=TruncDate('created_at')).order_by()
+        .values_list('day', flat=True).distinct()
+    )
+    for day in sorted(days):
+        refresh_game_day(game_session.game_name, day)
+
+    monthly = (
+        bets.annotate(month=TruncMonth('created_at', output_field=DateField())).order_by()
+        .values_list('month', 'user_id').distinct()
+    )
+    MonthlyBettor.objects.bulk_create(
+        [MonthlyBettor(month=month, user_id=user_id) for month, user_id in monthly],
+        batch_size=INSERT_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def _month_range(month):
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    return start, timezone.make_aware(datetime.combine((month + timedelta(days=31)).replace(day=1), time.min))
+
+
+def bet_months(bets):
+    """First days of the months a Bet queryset's rows were placed in."""
+    return set(
+        bets.annotate(month=TruncMonth('created_at', output_field=DateField())).order_by()
+        .values_list('month', flat=True).distinct()
+    )
+
+
+def refresh_monthly_bettors(months):
+    """Recompute the bettor set of each month from the settled bets left in it, after bets were deleted."""
+    for month in sorted(months):
+        start, end = _month_range(month)
+        with transaction.atomic():
+            MonthlyBettor.objects.filter(month=month).delete()
+            user_ids = (
+                Bet.objects.filter(status__in=SETTLED, created_at__gte=start, created_at__lt=end)
+                .order_by().values_list('user_id', flat=True).distinct()
+            )
+            MonthlyBettor.objects.bulk_create(
+                (MonthlyBettor(month=month, user_id=user_id) for user_id in user_ids.iterator()),
+                batch_size=INSERT_BATCH_SIZE,
+            )
+
+
+def user_rollup_keys(user):
+    """((game, day) pairs, platform days) a user's bets, deposits and withdrawals count towards."""
+    game_days = set(
+        Bet.objects.filter(user=user).annotate(day=TruncDate('created_at')).order_by()
+        .values_list('game_name', 'day').distinct()
+    )
+    platform_days = {local_day(user.date_joined)}
+    for model in (DepositRequest, WithdrawRequest):
+        platform_days.update(
+            model.objects.filter(user=user).annotate(day=TruncDate('created_at')).order_by()
+            .values_list('day', flat=True).distinct()
+        )
+    return game_days, platform_days
+
+
+def refresh_rollup_keys(keys):
+    game_days, platform_days = keys
+    for game_name, day in sorted(game_days):
+        refresh_game_day(game_name, day)
+    for day in sorted(platform_days):
+        refresh_platform_day(day)
+
+
+def rebuild_daily_stats(since=None):
+    """
+    Recompute every rollup row from day `since` on (all history when None)
+    with one grouped query per source table. Returns the number of
+    DailyStats rows written.
+    """
+    rows = defaultdict(dict)
+
+    def dated(queryset, field='created_at'):
+        if since is not None:
+            queryset = queryset.filter(**{f'{field}__gte': _day_range(since)[0]})
+        return queryset.annotate(day=TruncDate(field)).order_by()
+
+    for row in dated(Bet.objects.filter(status__in=SETTLED)).values('day', 'game_name').annotate(
+        stake=Sum('amount'),
+        payout=Sum('payout', filter=Q(status='won')),
+        bettors=Count('user', distinct=True),
+    ):
+        rows[row['day'], row['game_name']].update(
+            stake=row['stake'], payout=row['payout'] or ZERO, bettors=row['bettors']
+        )
+    # Commissions are dated by their bet, as in refresh_game_day
+    commissions = ReferralCommission.objects.filter(commission_type='bet_commission', bet__isnull=False)
+    for row in dated(commissions, 'bet__created_at').values('day', 'bet__game_name').annotate(total=Sum('commission')):
+        rows[row['day'], row['bet__game_name']]['commission'] = row['total']
+    for row in dated(DepositRequest.objects.filter(status='approved')).values('day').annotate(total=Sum('amount')):
+        rows[row['day'], PLATFORM]['deposits'] = row['total']
+    for row in dated(WithdrawRequest.objects.filter(is_approved=True)).values('day').annotate(total=Sum('amount')):
+        rows[row['day'], PLATFORM]['withdrawals'] = row['total']
+    for row in dated(User.objects.all(), 'date_joined').values('day').annotate(total=Count('id')):
+        rows[row['day'], PLATFORM]['new_users'] = row['total']
+
+    with transaction.atomic():
+        stale = DailyStats.objects.all()
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        DailyStats.objects.bulk_create(
+            [DailyStats(day=day, game_name=game_name, **values) for (day, game_name), values in rows.items()],
+            batch_size=INSERT_BATCH_SIZE,
+        )
+
+        monthly = dated(Bet.objects.filter(status__in=SETTLED)).annotate(
+            month=TruncMonth('created_at', output_field=DateField())
+        ).values_list('month', 'user_id').distinct()
+        MonthlyBettor.objects.bulk_create(
+            (MonthlyBettor(month=month, user_id=user_id) for month, user_id in monthly.iterator()),
+            batch_size=INSERT_BATCH_SIZE, ignore_conflicts=True,
+        )
+    return len(rows)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .tokens import ClaimsTokenObtainPairSerializer
 from django.contrib.auth import get_user_model
 from .models import Wallet, DepositRequest, Bet, WithdrawRequest, ReferralCommission
 import random
@@ -69,7 +69,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 # Custom Login with Mobile
-class MobileTokenObtainPairSerializer(TokenObtainPairSerializer):
+class MobileTokenObtainPairSerializer(ClaimsTokenObtainPairSerializer):
     username_field = 'mobile'
 
 # User Profile Serializer
@@ -79,7 +79,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'mobile', 'email', 'referral_code']
 
 # Admin login serializer (login via username, only staff allowed)
-class AdminTokenSerializer(TokenObtainPairSerializer):
+class AdminTokenSerializer(ClaimsTokenObtainPairSerializer):
     username_field = 'username'
 
     def validate(self, attrs):
@@ -184,7 +184,7 @@ class DepositActionSerializer(serializers.Serializer):
 # Referral Commission Serializer
 class ReferralCommissionSerializer(serializers.ModelSerializer):
     referred_user = serializers.CharField(source='referred_user.username')
-    bet_game = serializers.CharField(source='bet.game')
+    bet_game = serializers.CharField(source='bet.game_name', default=None)
     date = serializers.DateTimeField(source='created_at', format="%Y-%m-%d %H:%M")
 
     class Meta:
@@ -0,0 +1,171 @@
+import bisect
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, time, timedelta
+
+import pytz
+
+IST = pytz.timezone('Asia/Kolkata')
+# IST has no DST, so an instant's IST day is plain arithmetic on its timestamp
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+EPOCH = date(1970, 1, 1)
+
+Session = namedtuple('Session', ['session_no', 'open', 'close', 'result'])
+
+
+def parse_hhmm(value):
+    hour, minute = value.split(':')
+    return time(int(hour), int(minute))
+
+
+class SessionCalendar:
+    """
+    Session open/close/result instants per game per day, compiled from GAME_TIMINGS.
+
+    "HH:MM" strings are parsed once here; each IST day is localized once, the
+    first time it is needed, and kept in a small cache so the calendar rolls
+    forward on its own. Looking up the current session is a bisect over that
+    day's sorted open timestamps, with no timezone conversion on the hot path.
+    """
+
+    def __init__(self, timings, cached_days=4):
+        self.cached_days = cached_days
+        self._templates = {}
+        for game, game_timings in timings.items():
+            if game_timings is None:
+                continue
+            if isinstance(game_timings, list):
+                sessions = game_timings
+                multi = True
+            else:
+                sessions = [dict(game_timings, session_no=1)]
+                multi = False
+            self._templates[game.upper()] = (multi, [
+                (
+                    session['session_no'],
+                    parse_hhmm(session['open']),
+                    parse_hhmm(session['close']),
+                    parse_hhmm(session['result']) if session.get('result') else None,
+                )
+                for session in sessions
+            ])
+        self._days = OrderedDict()
+        self._lock = threading.Lock()
+
+    def games(self):
+        return list(self._templates)
+
+    def _result_after(self, close_dt, result_time):
+        # The result is declared at the first `result_time` at or after the close
+        result_dt = IST.localize(datetime.combine(close_dt.date(), result_time))
+        if result_dt < close_dt:
+            result_dt += timedelta(days=1)
+        return result_dt
+
+    def _sessions_for(self, game, day):
+        multi, templates = self._templates[game]
+        sessions = []
+        for session_no, open_time, close_time, result_time in templates:
+            close_dt = IST.localize(datetime.combine(day, close_time))
+            # A single daily session that closes at/before its open time runs overnight
+            if close_time < open_time or (not multi and close_time == open_time):
+                close_dt += timedelta(days=1)
+            sessions.append(Session(
+                session_no,
+                IST.localize(datetime.combine(day, open_time)),
+                close_dt,
+                self._result_after(close_dt, result_time) if result_time else None,
+            ))
+        return sessions
+
+    def _compile_day(self, day):
+        compiled = {}
+        for game, (multi, _) in self._templates.items():
+            sessions = self._sessions_for(game, day)
+            if not multi and sessions[0].close.date() > day:
+                # Overnight game: before today's open the session that opened yesterday is current
+                sessions = self._sessions_for(game, day - timedelta(days=1)) + sessions
+            compiled[game] = (
+                multi,
+                [s.open.timestamp() for s in sessions],
+                [s.result.timestamp() if s.result else None for s in sessions],
+                sessions,
+                # Every instant the game's lock state or current session can change
+                sorted({
+                    dt.timestamp()
+                    for s in sessions
+                    for dt in (s.open, s.close, s.result)
+                    if dt is not None
+                }),
+            )
+        return compiled
+
+    def _day(self, day_number):
+        compiled = self._days.get(day_number)
+        if compiled is None:
+            compiled = self._compile_day(EPOCH + timedelta(days=day_number))
+            with self._lock:
+                self._days[day_number] = compiled
+                while len(self._days) > self.cached_days:
+                    self._days.popitem(last=False)
+        return compiled
+
+    def _entry(self, game_name, ts):
+        return self._day(int((ts + IST_OFFSET_SECONDS) // 86400)).get(game_name.upper())
+
+    def sessions_on(self, game_name, day):
+        """All sessions of a game that open on the given IST date."""
+        game_name = game_name.upper()
+        if game_name not in self._templates:
+            return []
+        sessions = self._day((day - EPOCH).days)[game_name][3]
+        return [s for s in sessions if s.open.date() == day]
+
+    def current_session(self, game_name, now):
+        """
+        Session a bet placed at `now` belongs to, or None.
+
+        Multi-session games (Diamond King) only match between a session's open
+        and its result time. Single-session games always return the session that
+        opened most recently, even after it closed.
+        """
+        ts = now.timestamp()
+        entry = self._entry(game_name, ts)
+        if entry is None:
+            return None
+        multi, opens, results, sessions, _ = entry
+        idx = bisect.bisect_right(opens, ts) - 1
+        if multi:
+            if idx >= 0 and ts <= results[idx]:
+                return sessions[idx]
+            return None
+        return sessions[max(idx, 0)]
+
+    def latest_session_index(self, game_name, now):
+        """
+        For multi-session games: index into today's sessions_on() of the last
+        session opened so far, 0 before the first one opens.
+        """
+        ts = now.timestamp()
+        entry = self._entry(game_name, ts)
+        if entry is None:
+            return 0
+        return max(bisect.bisect_right(entry[1], ts) - 1, 0)
+
+    def next_boundary(self, game_name, now):
+        """
+        POSIX timestamp of the first open/close/result instant of a game at or
+        after `now`, or None. The game's schedule state is constant strictly
+        before it.
+        """
+        ts = now.timestamp()
+        day_number = int((ts + IST_OFFSET_SECONDS) // 86400)
+        for number in (day_number, day_number + 1):
+            entry = self._day(number).get(game_name.upper())
+            if entry is None:
+                return None
+            boundaries = entry[4]
+            idx = bisect.bisect_left(boundaries, ts)
+            if idx < len(boundaries):
+                return boundaries[idx]
+        return None
@@ -0,0 +1,254 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, Sum, When
+from django.utils import timezone
+
+from .caching import invalidate_game
+from .events import publish
+from .ledger import MONEY_FIELD, credit_wallets
+from .models import Bet, DeclaredResult, GameSession, ReferralCommission, Settlement, User
+from .rollups import record_session_rollups
+
+NUMBER_PAYOUT = 90
+DIGIT_PAYOUT = 9
+COMMISSION_RATE = Decimal('0.10')
+COMMISSION_GAMES = ['FARIDABAD', 'GALI', 'DISAWER', 'GHAZIABAD']
+
+# Referral codes per lookup query (SQLite bound parameter limit)
+LOOKUP_BATCH_SIZE = 500
+
+
+class SessionAlreadyDeclared(Exception):
+    pass
+
+
+class SessionNotDeclared(Exception):
+    pass
+
+
+class SessionClosed(Exception):
+    """The session's result is already declared; it takes no more bets."""
+
+
+def lock_open_session(session_id):
+    """
+    Call in a bet's transaction before debiting: locks the session row and
+    raises SessionClosed unless it is still open. settle_session's
+    open -> declared UPDATE then waits for the bet to commit and settles it
+    with the rest, instead of the bet landing in a declared session and
+    staying pending.
+    """
+    if not list(GameSession.objects.select_for_update().filter(pk=session_id, state='open').values_list('pk')):
+        raise SessionClosed
+
+
+def winning_bets_q(winning_number):
+    """Q matching bets that win for a 2-digit (or "100") winning number string."""
+    return (
+        Q(bet_type='number', number=int(winning_number))
+        | Q(bet_type='andar', number=int(winning_number[0]))
+        | Q(bet_type='bahar', number=int(winning_number[-1]))
+    )
+
+
+def payout_expression():
+    """Payout of a winning bet: number pays 90x, andar/bahar pay 9x."""
+    return Case(
+        When(bet_type='number', then=F('amount') * NUMBER_PAYOUT),
+        default=F('amount') * DIGIT_PAYOUT,
+        output_field=MONEY_FIELD,
+    )
+
+
+def _referrers_by_code(codes):
+    referrers = {}
+    codes = list(codes)
+    for i in range(0, len(codes), LOOKUP_BATCH_SIZE):
+        referrers.update(
+            User.objects.filter(referral_code__in=codes[i:i + LOOKUP_BATCH_SIZE])
+            .values_list('referral_code', 'id')
+        )
+    return referrers
+
+
+def _journal_amounts(amounts):
+    return {str(uid): str(amount) for uid, amount in amounts.items() if amount}
+
+
+def _commission_ids_for_bets(bet_ids):
+    ids = []
+    for i in range(0, len(bet_ids), LOOKUP_BATCH_SIZE):
+        ids.extend(
+            ReferralCommission.objects.filter(
+                bet_id__in=bet_ids[i:i + LOOKUP_BATCH_SIZE], commission_type='bet_commission'
+            ).values_list('id', flat=True)
+        )
+    return ids
+
+
+def pending_bets(game_session):
+    """The bets a declaration settles (bet_session_status_idx)."""
+    return Bet.objects.filter(session=game_session, status='pending')
+
+
+def settle_session(game_session, winning_number):
+    """
+    Declare `winning_number` for a GameSession and settle its pending bets.
+
+    The session is flipped from open to declared with a conditional UPDATE
+    first, so two callers racing on the same session can't both settle it;
+    the loser gets SessionAlreadyDeclared.
+
+    Winners and losers are marked with set-based UPDATEs, winnings are credited
+    with one aggregated update per batch of users and referral commissions are
+    written with bulk_create. Everything runs in a single transaction, so the
+    query count depends on the number of users paid, not on the number of bets.
+    """
+    game_name = game_session.game_name
+    bets = pending_bets(game_session)
+    win_q = winning_bets_q(winning_number)
+    payout = payout_expression()
+
+    with transaction.atomic():
+        now = timezone.now()
+        claimed = GameSession.objects.filter(pk=game_session.pk, state='open').update(
+            state='declared', winning_number=winning_number, declared_at=now
+        )
+        if not claimed:
+            raise SessionAlreadyDeclared
+        DeclaredResult.objects.create(game_name=game_name, winning_number=winning_number)
+
+        winnings = {
+            row['user_id']: row['total']
+            for row in bets.filter(win_q).values('user_id').annotate(total=Sum(payout))
+        }
+
+        # Commission: 10% of every "number" bet for commission games, win or lose
+        commission_bets = []
+        if game_name in COMMISSION_GAMES:
+            commission_bets = list(
+                bets.filter(bet_type='number', user__referred_by__isnull=False)
+                .exclude(user__referred_by='')
+                .values_list('id', 'user_id', 'amount', 'user__referred_by')
+            )
+
+        # .update() skips auto_now, and /api/sync/ finds changed bets by updated_at
+        won_count = bets.filter(win_q).update(status='won', is_win=True, payout=payout, updated_at=now)
+        lost_count = bets.update(status='lost', is_win=False, payout=Decimal('0.00'), updated_at=now)
+
+        credit_wallets('winnings', winnings)
+
+        commissions = []
+        bonus = defaultdict(Decimal)
+        referrers = _referrers_by_code({row[3] for row in commission_bets})
+        for bet_id, user_id, amount, code in commission_bets:
+            referrer_id = referrers.get(code)
+            if referrer_id is None:
+                continue
+            commission = amount * COMMISSION_RATE
+            bonus[referrer_id] += commission
+            commissions.append(ReferralCommission(
+                referrer_id=referrer_id,
+                referred_user_id=user_id,
+                commission=commission,
+                commission_type='bet_commission',
+                bet_id=bet_id,
+            ))
+        ReferralCommission.objects.bulk_create(commissions, batch_size=LOOKUP_BATCH_SIZE)
+        credit_wallets('bonus', bonus)
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            commission_ids = [c.pk for c in commissions]
+        else:
+            commission_ids = _commission_ids_for_bets([c.bet_id for c in commissions])
+        Settlement.objects.create(
+            session_id=game_session.pk,
+            winning_number=winning_number,
+            credits={'winnings': _journal_amounts(winnings), 'bonus': _journal_amounts(bonus)},
+            commission_ids=commission_ids,
+        )
+        record_session_rollups(game_session)
+        invalidate_game(game_session.game_name)
+        publish('result', {
+            'game': game_session.game_name,
+            'session_no': game_session.session_no,
+            'open_at': game_session.open_at,
+            'winning_number': winning_number,
+        })
+
+    return {
+        'won': won_count,
+        'lost': lost_count,
+        'winners': len(winnings),
+        'commissions': len(commissions),
+    }
+
+
+def _journal_from_bets(game_session):
+    """Credits/commissions of a session settled before settlements were journaled."""
+    winnings = {
+        str(row['user_id']): str(row['total'])
+        for row in Bet.objects.filter(session=game_session, status='won')
+        .values('user_id').annotate(total=Sum('payout')).order_by()
+    }
+    commissions = ReferralCommission.objects.filter(
+        bet__session=game_session, commission_type='bet_commission'
+    )
+    bonus = {
+        str(row['referrer_id']): str(row['total'])
+        for row in commissions.values('referrer_id').annotate(total=Sum('commission')).order_by()
+    }
+    return {'winnings': winnings, 'bonus': bonus}, list(commissions.values_list('id', flat=True))
+
+
+def undo_session(game_session):
+    """
+    Reverse the declared result of a GameSession from its settlement journal.
+
+    Every credited user is debited exactly what they were credited (a winner
+    who already spent the winnings is left with negative winnings rather than
+    being clamped to zero), the commission rows are deleted by id and all bets
+    go back to pending with one UPDATE. Raises SessionNotDeclared.
+    """
+    with transaction.atomic():
+        # declared_at stays set, so the auto-declare worker leaves an undone session to the admin
+        claimed = GameSession.objects.filter(pk=game_session.pk, state='declared').update(
+            state='open', winning_number=None
+        )
+        if not claimed:
+            raise SessionNotDeclared
+
+        settlement = (
+            Settlement.objects.filter(session_id=game_session.pk, undone_at__isnull=True)
+            .order_by('-pk').first()
+        )
+        if settlement is not None:
+            credits, commission_ids = settlement.credits, settlement.commission_ids
+        else:
+            credits, commission_ids = _journal_from_bets(game_session)
+
+        for field, amounts in credits.items():
+            credit_wallets(field, {int(uid): -Decimal(amount) for uid, amount in amounts.items()})
+        for i in range(0, len(commission_ids), LOOKUP_BATCH_SIZE):
+            ReferralCommission.objects.filter(id__in=commission_ids[i:i + LOOKUP_BATCH_SIZE]).delete()
+        reset_count = Bet.objects.filter(session=game_session, status__in=['won', 'lost']).update(
+            status='pending', is_win=False, payout=Decimal('0.00'), updated_at=timezone.now()
+        )
+
+        if settlement is not None:
+            Settlement.objects.filter(pk=settlement.pk).update(undone_at=timezone.now())
+        record_session_rollups(game_session)
+        invalidate_game(game_session.game_name)
+        publish('result_undone', {
+            'game': game_session.game_name,
+            'session_no': game_session.session_no,
+            'open_at': game_session.open_at,
+        })
+
+    return {
+        'reset': reset_count,
+        'users': len({uid for amounts in credits.values() for uid in amounts}),
+        'commissions': len(commission_ids),
+    }
@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils.crypto import get_random_string
-from .models import User
+from .caching import invalidate_all, invalidate_records
+from .game_timing import invalidate_timing_manager
+from .models import Game, User, Wallet
+from .rollups import local_day, refresh_platform_day
 
 def generate_referral_code():
     return get_random_string(length=8).upper()
@@ -11,3 +16,37 @@ def set_referral_code(sender, instance, created, **kwargs):
     if created and not instance.referral_code:
         instance.referral_code = generate_referral_code()
         instance.save()
+
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, **kwargs):
+    if created:
+        refresh_platform_day(local_day(instance.date_joined))
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def reset_game_schedule(sender, **kwargs):
+    invalidate_timing_manager()
+    invalidate_all()
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+def reset_cached_wallet(sender, instance, **kwargs):
+    invalidate_records('wallet', [instance.user_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_cached_profile(sender, instance, **kwargs):
+    invalidate_records('profile', [instance.pk])
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
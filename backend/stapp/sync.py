@@ -0,0 +1,139 @@
+"""
+Delta sync of a user's bets, transactions, deposits and withdrawals.
+
+The client keeps the opaque cursor it was last given and sends it back as
+?since=; the response carries only the rows whose updated_at moved past it,
+oldest change first, plus the wallet totals and the next cursor. Every table
+is an index range scan on (user, updated_at, id), so a sync costs the same
+however long the user's history is.
+
+Delivery is at-least-once: a writer can stamp updated_at a little before it
+commits, so the cursor never moves past now - SETTLE_SECONDS and rows changed
+within that window come again on the next sync. Clients upsert rows by id.
+Rows deleted by the admin reset/restore tools are not reported; those
+users start over with a sync without a cursor.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from . import read_model
+from .models import Bet, DepositRequest, Transaction, WithdrawRequest
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+
+# Rows per table in one response; has_more tells the client to sync again
+PAGE_SIZE = 500
+# How far behind now the cursor stays, to catch writes committed late
+SETTLE_SECONDS = 30
+
+ORDERING = ['updated_at', 'id']
+
+
+def _bet(row):
+    return {
+        'id': row['id'],
+        'game': row['game_name'],
+        'bet_type': row['bet_type'],
+        'number': row['number'],
+        'amount': str(row['amount']),
+        'status': row['status'],
+        'payout': str(row['payout']),
+        'session_start': row['session_start'],
+        'session_end': row['session_end'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+
+
+def _transaction(row):
+    return {
+        'id': row['id'],
+        'type': row['transaction_type'],
+        'amount': str(row['amount']),
+        'status': row['status'],
+        'note': row['note'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+
+
+def _deposit(row):
+    return {
+        'id': row['id'],
+        'amount': str(row['amount']),
+        'utr_number': row['utr_number'],
+        'payment_method': row['payment_method'],
+        'status': row['status'],
+        'created_at': row['created_at'],
+        'approved_at': row['approved_at'],
+        'updated_at': row['updated_at'],
+    }
+
+
+def _withdrawal(row):
+    status = 'approved' if row['is_approved'] else 'rejected' if row['is_rejected'] else 'pending'
+    return {
+        'id': row['id'],
+        'amount': str(row['amount']),
+        'status': status,
+        'created_at': row['created_at'],
+        'approved_at': row['approved_at'],
+        'updated_at': row['updated_at'],
+    }
+
+
+# (response key, model, values() fields, row serializer); the cursor keeps one position per table in this order
+TABLES = (
+    ('bets', Bet, ('id', 'game_name', 'bet_type', 'number', 'amount', 'status', 'payout',
+                   'session_start', 'session_end', 'created_at', 'updated_at'), _bet),
+    ('transactions', Transaction, ('id', 'transaction_type', 'amount', 'status', 'note',
+                                   'created_at', 'updated_at'), _transaction),
+    ('deposits', DepositRequest, ('id', 'amount', 'utr_number', 'payment_method', 'status',
+                                  'created_at', 'approved_at', 'updated_at'), _deposit),
+    ('withdrawals', WithdrawRequest, ('id', 'amount', 'is_approved', 'is_rejected',
+                                      'created_at', 'approved_at', 'updated_at'), _withdrawal),
+)
+
+
+def _positions(since):
+    if not since:
+        return [None] * len(TABLES)
+    positions = decode_cursor(since)
+    if len(positions) != len(TABLES) or not all(p is None or (isinstance(p, list) and len(p) == 2) for p in positions):
+        raise InvalidCursor('not a sync cursor')
+    return positions
+
+
+def sync(user_id, since=None):
+    """
+    The changes to a user's rows after the `since` cursor (None: everything)
+    as {bets, transactions, deposits, withdrawals, wallet, cursor, has_more}.
+    One query per table; the wallet comes from the cached read model.
+    Raises InvalidCursor.
+    """
+    positions = _positions(since)
+    horizon = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    result = {}
+    next_positions = []
+    has_more = False
+    for (key, model, fields, serialize), position in zip(TABLES, positions):
+        rows, next_cursor = keyset_page(
+            model.objects.filter(user_id=user_id).values(*fields),
+            ORDERING,
+            encode_cursor(position) if position else None,
+            PAGE_SIZE,
+        )
+        result[key] = [serialize(row) for row in rows]
+        if next_cursor:
+            has_more = True
+            position = decode_cursor(next_cursor)
+        elif rows:
+            last = rows[-1]
+            # (horizon, 0) sorts before every row stamped after the horizon
+            position = [horizon, 0] if last['updated_at'] > horizon else [last['updated_at'], last['id']]
+        next_positions.append(position)
+
+    result['wallet'], _ = read_model.wallet(user_id)
+    result['cursor'] = encode_cursor(next_positions)
+    result['has_more'] = has_more
+    return result
@@ -1,3 +1,648 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import random
+import re
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from .bet_slip import SlipError, expand_slip
+from .events import CacheFanout
+from .exposure import exposure_book, rebuild_exposure
+from . import game_timing
+from .game_timing import GAME_TIMINGS, GameTimingManager
+from .ledger import InsufficientBalance, debit_wallet
+from .models import (
+    Bet, DailyStats, DepositRequest, Game, GameSession, MonthlyBettor, ReferralCommission, Settlement, User, Wallet,
+    WithdrawRequest,
+)
+from .settlement import NUMBER_PAYOUT, pending_bets, settle_session, undo_session
+from .hashers import TunedPBKDF2PasswordHasher
+from .rollups import rebuild_daily_stats
+from .tokens import ClaimsJWTAuthentication, ClaimsRefreshToken
+from .views import admin_reset_game_stats, current_bets_queryset, session_bets
+
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def ist(*args):
+    return IST.localize(datetime.datetime(*args))
+
+
+def forget_session_ids(test):
+    """Drop GameSession ids cached by earlier tests; their rows were rolled back."""
+    game_timing._session_ids.clear()
+    test.addCleanup(game_timing._session_ids.clear)
+
+
+def make_user(name, mobile, **wallet):
+    user = User.objects.create(username=name, mobile=mobile)
+    Wallet.objects.create(user=user, **wallet)
+    return user
+
+
+def run_parallel(task, calls, workers=16):
+    """Results of task() called `calls` times from `workers` threads, each on its own connection."""
+    def worker(count):
+        try:
+            return [task() for _ in range(count)]
+        finally:
+            connections.close_all()
+
+    shares = [calls // workers + (i < calls % workers) for i in range(workers)]
+    with ThreadPoolExecutor(workers) as pool:
+        return [result for results in pool.map(worker, shares) for result in results]
+
+
+class ConcurrentDebitTests(TransactionTestCase):
+    """Parallel debits of one wallet: no lost update, no overdraft."""
+
+    def setUp(self):
+        forget_session_ids(self)
+        self.user = make_user('racer', '9000000001', balance=Decimal('600'), winnings=Decimal('300'),
+                              bonus=Decimal('100'))
+
+    def wallet_total(self):
+        wallet = Wallet.objects.get(user=self.user)
+        self.assertTrue(wallet.balance >= 0 and wallet.winnings >= 0 and wallet.bonus >= 0)
+        return wallet.balance + wallet.winnings + wallet.bonus
+
+    def test_parallel_debits_never_overdraw(self):
+        def debit():
+            try:
+                with transaction.atomic():
+                    wallet = debit_wallet(self.user, Decimal('10'))
+            except InsufficientBalance:
+                return None
+            self.assertGreaterEqual(wallet.balance + wallet.winnings + wallet.bonus, 0)
+            return Decimal('10')
+
+        debits = [amount for amount in run_parallel(debit, 200) if amount is not None]
+
+        self.assertEqual(len(debits), 100)
+        self.assertEqual(self.wallet_total(), Decimal('1000') - sum(debits))
+
+    def test_parallel_bets_debit_exactly_what_was_staked(self):
+        # TransactionTestCase flushes the games seeded by the migrations
+        Game.objects.update_or_create(name='GALI', defaults={
+            'open_time': datetime.time(4), 'close_time': datetime.time(22, 30), 'result_time': datetime.time(23, 59),
+        })
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def bet():
+            response = client.post('/api/place-bet/', {'game_name': 'GALI', 'number': 7, 'amount': 30},
+                                   format='json')
+            return response.status_code
+
+        with mock.patch('django.utils.timezone.now', return_value=ist(2026, 10, 18, 12, 20)):
+            statuses = run_parallel(bet, 60)
+
+        placed = Bet.objects.filter(user=self.user)
+        staked = sum(bet.amount for bet in placed)
+        self.assertEqual(statuses.count(200), placed.count())
+        self.assertEqual(placed.count(), 33)  # 1000 // 30
+        self.assertEqual(self.wallet_total(), Decimal('1000') - staked)
+
+
+class DefaultScheduleTests(SimpleTestCase):
+    """The default result times must fit the session windows they were taken from."""
+
+    def test_result_falls_between_close_and_next_open(self):
+        calendar = GameTimingManager().calendar
+        day = datetime.date(2026, 10, 18)
+        for game_name, timings in GAME_TIMINGS.items():
+            sessions = calendar.sessions_on(game_name, day)
+            following = sessions[1:] + calendar.sessions_on(game_name, day + datetime.timedelta(days=1))[:1]
+            for session, next_session in zip(sessions, following):
+                with self.subTest(game=game_name, session=session.session_no):
+                    self.assertLess(session.close, session.result)
+                    self.assertLessEqual(session.result, next_session.open)
+
+    def test_diamond_king_results_are_the_session_table(self):
+        sessions = GameTimingManager().calendar.sessions_on('DIAMOND KING', datetime.date(2026, 10, 18))
+        self.assertEqual(
+            [s.result.strftime('%H:%M') for s in sessions],
+            [s['result'] for s in GAME_TIMINGS['DIAMOND KING']],
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'reads SQLite EXPLAIN QUERY PLAN output')
+class BetQueryPlanTests(TestCase):
+    """The session-window bet queries must search stapp_bet through an index, never scan it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(5)
+        users = User.objects.bulk_create([User(username=f'p{i}', mobile=f'8{i:09d}', referral_code=f'P{i}')
+                                          for i in range(200)])
+        start = ist(2026, 8, 1, 4)
+        sessions = GameSession.objects.bulk_create([
+            GameSession(game_name=game, date=(start + datetime.timedelta(days=day)).date(), session_no=1,
+                        open_at=start + datetime.timedelta(days=day, hours=offset),
+                        close_at=start + datetime.timedelta(days=day, hours=offset + 18),
+                        state='declared' if day < 59 else 'open')
+            for day in range(60) for offset, game in enumerate(('GALI', 'FARIDABAD', 'DISAWER'))
+        ])
+        Bet.objects.bulk_create([
+            Bet(user=rng.choice(users), game_name=session.game_name, bet_type='number', number=rng.randrange(100),
+                amount=10, session=session, status='pending' if session.state == 'open' else 'lost')
+            for session in sessions for _ in range(100)
+        ], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.open_session = sessions[-1]
+        cls.user = users[0]
+
+    def assertSearchesBets(self, queryset, *indexes):
+        """`indexes` are index names or prefixes (Django hashes the FK index names)."""
+        plan = queryset.explain()
+        self.assertNotRegex(plan, r'SCAN stapp_bet\b', plan)
+        used = re.findall(r'SEARCH stapp_bet USING (?:COVERING )?INDEX (\w+)', plan)
+        self.assertTrue(any(name.startswith(indexes) for name in used), plan)
+
+    def test_declare_result_reads_pending_bets_by_session(self):
+        bets = pending_bets(self.open_session)
+        self.assertSearchesBets(bets, 'bet_session_status_idx')
+        self.assertSearchesBets(bets.values('user_id').annotate(total=Sum('amount')), 'bet_session_status_idx')
+
+    def test_admin_bet_records_reads_one_session(self):
+        session = self.open_session
+        self.assertSearchesBets(session_bets(session.game_name, session.open_at),
+                                'bet_session_status_idx', 'stapp_bet_session_id_')
+
+    def test_current_session_bets_read_the_users_bets(self):
+        manager = GameTimingManager()
+        queryset = current_bets_queryset(self.user.id, manager, ist(2026, 9, 29, 12, 20))
+        self.assertSearchesBets(queryset, 'bet_user_created_idx')
+
+
+class AdminUsersStatsQueryTests(TestCase):
+    """admin_users_stats costs one query per page however many users, deposits and referrals there are."""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', mobile='6999999999', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_users(self, start, count):
+        for i in range(start, start + count):
+            user = make_user(f'u{i}', f'7{i:09d}', balance=Decimal('100'), winnings=Decimal('5'))
+            DepositRequest.objects.create(user=user, amount=Decimal('50'), utr_number=f'UTR{i}',
+                                          payment_method='upi', status='approved')
+            DepositRequest.objects.create(user=user, amount=Decimal('70'), utr_number=f'UTR{i}x',
+                                          payment_method='upi', status='pending')
+            WithdrawRequest.objects.create(user=user, amount=Decimal('20'), is_approved=True)
+            ReferralCommission.objects.create(referrer=user, referred_user=self.admin, commission=Decimal('3'),
+                                              commission_type='signup_bonus')
+
+    def test_one_query_per_page(self):
+        added = 0
+        for count in (3, 40):
+            self.add_users(added, count)
+            added += count
+            with self.subTest(users=added), self.assertNumQueries(1):
+                response = self.client.get('/api/admin/users-stats/', {'page_size': 200})
+            self.assertEqual(response.status_code, 200)
+            rows = [row for row in response.data['results'] if row['username'] != 'admin']
+            self.assertEqual(len(rows), added)
+            row = rows[-1]
+            self.assertEqual((row['balance'], row['total_deposit'], row['total_withdraw']),
+                             ('100.00', '50.00', '20.00'))
+            self.assertEqual((row['total_referrals'], row['referral_earnings'], row['total_earning']),
+                             (1, '3.00', '8.00'))
+
+    def test_sorted_and_searched_pages_are_one_query_each(self):
+        self.add_users(0, 30)
+        with self.assertNumQueries(1):
+            first = self.client.get('/api/admin/users-stats/', {'sort': '-total_deposit', 'page_size': 10})
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/admin/users-stats/', {'sort': '-total_deposit', 'page_size': 10,
+                                                                   'cursor': first.data['next_cursor']})
+        ids = [row['id'] for row in first.data['results'] + second.data['results']]
+        self.assertEqual(len(set(ids)), 20)
+        with self.assertNumQueries(1):
+            found = self.client.get('/api/admin/users-stats/', {'search': 'u1'})
+        self.assertEqual({row['username'] for row in found.data['results']},
+                         {'u1'} | {f'u{i}' for i in range(10, 20)})
+
+
+class AdminGamesStatsQueryTests(TestCase):
+    """admin_games_stats costs a fixed three queries however many games and bets, none when cached."""
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create(username='admin', mobile='6999999999', is_staff=True)
+        self.player = make_user('player', '6999999998')
+        self.referrer = make_user('referrer', '6999999997')
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def add_game(self, name, bets):
+        Game.objects.create(name=name, open_time=datetime.time(9), close_time=datetime.time(17))
+        for i in range(bets):
+            bet = Bet.objects.create(user=self.player, game_name=name, bet_type='number', number=i % 100,
+                                     amount=Decimal('10'), status='won' if i == 0 else 'lost', is_win=i == 0,
+                                     payout=Decimal('900') if i == 0 else Decimal('0'))
+            ReferralCommission.objects.create(referrer=self.referrer, referred_user=self.player, bet=bet,
+                                              commission=Decimal('1'), commission_type='bet_commission')
+
+    def stats(self, **params):
+        response = self.client.get('/api/admin/games-stats/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['name']: row for row in response.data}
+
+    def test_fixed_query_count(self):
+        for count, bets in ((1, 5), (6, 40)):
+            for i in range(count):
+                self.add_game(f'STATS {count}-{i}', bets)
+            with self.subTest(games=Game.objects.count()), self.assertNumQueries(3):
+                rows = self.stats(refresh=1)
+            row = rows[f'STATS {count}-0']
+            self.assertEqual((row['totalBets'], row['totalAmount']), (bets, Decimal(10 * bets)))
+            self.assertEqual(row['totalEarnings'], Decimal(10 * bets - 900 - bets))
+
+    def test_cached_response_runs_no_query(self):
+        self.add_game('STATS CACHED', 3)
+        first = self.stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.stats(), first)
+
+
+class ResetGameStatsTests(TestCase):
+    """Resetting a game's stats leaves no rollup or journal behind that still counts its bets."""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', mobile='6999999999', is_staff=True)
+        self.only_gali = make_user('gali-only', '6999999998')
+        self.both = make_user('both', '6999999997')
+        self.gali = Game.objects.get(name__iexact='gali')
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for game_name, users in (('GALI', (self.only_gali, self.both)), ('DISAWER', (self.both,))):
+            session = GameSession.objects.create(game_name=game_name, date=now.date(), open_at=now,
+                                                 close_at=now, result_at=now)
+            for user in users:
+                Bet.objects.create(user=user, game_name=game_name, bet_type='number', number=7,
+                                   amount=Decimal('10'), session=session)
+            settle_session(session, '07')
+
+    def reset(self):
+        request = APIRequestFactory().post(f'/api/admin/games/{self.gali.id}/reset/')
+        force_authenticate(request, self.admin)
+        return admin_reset_game_stats(request, self.gali.id)
+
+    def test_reset_drops_the_games_rollups_and_journals(self):
+        self.assertEqual(MonthlyBettor.objects.count(), 2)
+        self.assertEqual(self.reset().status_code, 200)
+        self.assertFalse(Bet.objects.filter(game_name='GALI').exists())
+        self.assertFalse(DailyStats.objects.filter(game_name='GALI').exists())
+        self.assertTrue(DailyStats.objects.filter(game_name='DISAWER').exists())
+        self.assertEqual(list(Settlement.objects.values_list('session__game_name', flat=True)), ['DISAWER'])
+        self.assertEqual(list(MonthlyBettor.objects.values_list('user', flat=True)), [self.both.id])
+
+
+class UndoSessionTests(TestCase):
+    """Undoing a declare puts wallets, commissions and bets back exactly as they were."""
+
+    def setUp(self):
+        self.referrer = make_user('undo-referrer', '6999999989', bonus=Decimal('5'))
+        self.winner = make_user('undo-winner', '6999999988', balance=Decimal('100'), winnings=Decimal('20'))
+        self.loser = make_user('undo-loser', '6999999987', balance=Decimal('100'))
+        User.objects.filter(pk__in=[self.winner.pk, self.loser.pk]).update(referred_by=self.referrer.referral_code)
+
+    def declare(self, bets_each=1):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        session = GameSession.objects.create(game_name='GALI', date=now.date(), open_at=now, close_at=now,
+                                             result_at=now)
+        for user, number in ((self.winner, 7), (self.loser, 8)):
+            Bet.objects.bulk_create([
+                Bet(user=user, game_name='GALI', bet_type='number', number=number, amount=Decimal('10'),
+                    session=session)
+                for _ in range(bets_each)
+            ])
+        settle_session(session, '07')
+        return session
+
+    def wallets(self):
+        return {
+            wallet.user_id: (wallet.balance, wallet.winnings, wallet.bonus)
+            for wallet in Wallet.objects.filter(user__in=[self.referrer, self.winner, self.loser])
+        }
+
+    def assert_undone(self, journaled):
+        before = self.wallets()
+        session = self.declare()
+        self.assertEqual(ReferralCommission.objects.count(), 2)
+        # The winner spends all of the winnings before the result is undone
+        Wallet.objects.filter(user=self.winner).update(winnings=Decimal('0'))
+        if not journaled:
+            Settlement.objects.all().delete()
+
+        undo_session(session)
+
+        balance, winnings, bonus = before[self.winner.pk]
+        before[self.winner.pk] = (balance, winnings - 20 - 10 * NUMBER_PAYOUT, bonus)
+        self.assertEqual(self.wallets(), before)
+        self.assertEqual(Wallet.objects.get(user=self.winner).winnings, Decimal('-900'))
+        self.assertFalse(ReferralCommission.objects.exists())
+        self.assertEqual(
+            set(Bet.objects.values_list('status', 'is_win', 'payout')), {('pending', False, Decimal('0'))}
+        )
+        session.refresh_from_db()
+        self.assertEqual((session.state, session.winning_number), ('open', None))
+
+    def test_undo_reverses_the_journal(self):
+        self.assert_undone(journaled=True)
+        self.assertTrue(Settlement.objects.get().undone_at)
+
+    def test_undo_without_a_journal_reverses_the_same(self):
+        self.assert_undone(journaled=False)
+
+    def test_query_count_does_not_grow_with_bets(self):
+        for journaled in (True, False):
+            counts = []
+            for bets_each in (1, 50):
+                session = self.declare(bets_each)
+                if not journaled:
+                    Settlement.objects.filter(session=session).delete()
+                with CaptureQueriesContext(connection) as queries:
+                    undo_session(session)
+                counts.append(len(queries))
+            with self.subTest(journaled=journaled):
+                self.assertEqual(counts[0], counts[1])
+
+
+class ExpandSlipTests(SimpleTestCase):
+    def numbers(self, leg):
+        return [(bet_type, number) for bet_type, number, _ in expand_slip([dict(leg, amount=10)])]
+
+    def test_jodi_pattern_pairs_the_digits(self):
+        self.assertEqual([n for _, n in self.numbers({'pattern': 'jodi', 'digits': [7, 3, 5]})],
+                         [33, 35, 37, 53, 55, 57, 73, 75, 77])
+        self.assertEqual([n for _, n in self.numbers({'pattern': 'jodi', 'digits': [3, 5], 'doubles': False})],
+                         [35, 53])
+
+    def test_range_pattern_covers_both_ends(self):
+        self.assertEqual(self.numbers({'pattern': 'range', 'bet_type': 'andar', 'from': 2, 'to': 5}),
+                         [('andar', 2), ('andar', 3), ('andar', 4), ('andar', 5)])
+
+    def test_invalid_legs(self):
+        for leg in ({'numbers': '123'}, {'numbers': 12}, {'bet_type': 'bahar', 'numbers': [10]},
+                    {'pattern': 'range', 'from': 9, 'to': 1}, {'pattern': 'jodi', 'digits': [10]},
+                    {'pattern': 'range', 'from': 90, 'to': 100}):
+            with self.subTest(**leg), self.assertRaises(SlipError):
+                self.numbers(leg)
+
+
+class BetSlipTests(TestCase):
+    def setUp(self):
+        forget_session_ids(self)
+        self.user = make_user('slipper', '6999999986', balance=Decimal('5000'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.now = mock.patch('django.utils.timezone.now', return_value=ist(2026, 10, 18, 12, 20))
+        self.now.start()
+        self.addCleanup(self.now.stop)
+
+    def place(self, *legs):
+        return self.client.post('/api/place-bet-slip/', {'game_name': 'GALI', 'legs': list(legs)}, format='json')
+
+    def test_query_count_does_not_grow_with_legs(self):
+        self.assertEqual(self.place({'number': 1, 'amount': 10}).status_code, 200)
+        counts = []
+        for numbers in ([2], list(range(50))):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.place({'numbers': numbers, 'amount': 10})
+            self.assertEqual(response.status_code, 200, response.data)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Bet.objects.count(), 52)
+
+    def test_insufficient_balance_places_nothing(self):
+        self.assertEqual(self.place({'number': 1, 'amount': 10}).status_code, 200)
+        session_id = Bet.objects.get().session_id
+        book = exposure_book(session_id)
+
+        response = self.place({'numbers': [2, 3], 'amount': 2000},
+                              {'bet_type': 'andar', 'numbers': [4], 'amount': 2000})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Bet.objects.count(), 1)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('4990'))
+        self.assertEqual(exposure_book(session_id), book)
+
+    def test_exposure_book_matches_a_rebuild(self):
+        legs = [
+            {'pattern': 'jodi', 'digits': [1, 2, 3], 'amount': 20},
+            {'pattern': 'range', 'bet_type': 'andar', 'from': 0, 'to': 4, 'amount': 15},
+            {'bet_type': 'bahar', 'numbers': [2, 2, 9], 'amount': 10},
+            {'number': 12, 'amount': 50},
+        ]
+        for leg in legs:
+            self.assertEqual(self.place(leg).status_code, 200)
+        self.assertEqual(self.place(*legs).status_code, 200)
+        session_id = Bet.objects.values_list('session_id', flat=True).distinct().get()
+        book = exposure_book(session_id)
+        self.assertTrue(any(book))
+        self.assertEqual(book, [Decimal(liability) for liability in rebuild_exposure(session_id)])
+
+
+class CommissionDayTests(TestCase):
+    """A bet's referral commission counts on the day the bet was placed, not the day it was settled."""
+
+    def test_commission_is_dated_by_its_bet(self):
+        referrer = make_user('day-referrer', '6999999985')
+        player = make_user('day-player', '6999999984', balance=Decimal('100'))
+        User.objects.filter(pk=player.pk).update(referred_by=referrer.referral_code)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        session = GameSession.objects.create(game_name='GALI', date=now.date(), open_at=now, close_at=now,
+                                             result_at=now)
+        bet = Bet.objects.create(user=player, game_name='GALI', bet_type='number', number=8, amount=Decimal('10'),
+                                 session=session)
+        Bet.objects.filter(pk=bet.pk).update(created_at=now - datetime.timedelta(days=3))
+        settle_session(session, '07')
+
+        def rollup():
+            return list(DailyStats.objects.filter(game_name='GALI').values_list('day', 'stake', 'commission'))
+
+        bet_day = timezone.localdate(now - datetime.timedelta(days=3))
+        self.assertEqual(rollup(), [(bet_day, Decimal('10'), Decimal('1'))])
+        rebuild_daily_stats()
+        self.assertEqual(rollup(), [(bet_day, Decimal('10'), Decimal('1'))])
+
+
+class CacheFanoutTests(SimpleTestCase):
+    """Listeners must not lose an event whose sequence number they saw before the event itself."""
+
+    def setUp(self):
+        self.fanout = CacheFanout()
+        self.fanout.POLL_SECONDS = 0.01
+        self.fanout.GAP_SECONDS = 0.2
+        cache.set(CacheFanout.SEQ_KEY, 0, timeout=None)
+        self.addCleanup(cache.delete, CacheFanout.SEQ_KEY)
+
+    def listen(self, scenario, delivered):
+        """Run a listener into `delivered` while `scenario` runs; the names of the events it delivered."""
+        async def run():
+            listener = asyncio.create_task(self.fanout.listen(delivered.append))
+            await asyncio.sleep(0.05)
+            await scenario()
+            await asyncio.sleep(0.05)
+            listener.cancel()
+
+        asyncio.run(run())
+        return [event.name for event in delivered]
+
+    def test_event_written_after_its_sequence_is_delivered(self):
+        async def scenario():
+            seq = cache.incr(CacheFanout.SEQ_KEY)
+            # Several polls see the new sequence number before the event is there
+            await asyncio.sleep(0.05)
+            cache.set(self.fanout._event_key(seq), {'name': 'result', 'data': {}})
+            self.fanout.publish('result_undone', {})
+
+        self.assertEqual(self.listen(scenario, []), ['result', 'result_undone'])
+
+    def test_event_never_written_is_skipped_after_a_wait(self):
+        delivered = []
+
+        async def scenario():
+            cache.incr(CacheFanout.SEQ_KEY)
+            self.fanout.publish('result', {})
+            await asyncio.sleep(0.1)
+            self.assertEqual(delivered, [])
+            await asyncio.sleep(0.2)
+
+        self.assertEqual(self.listen(scenario, delivered), ['result'])
+
+
+class LogoutTests(TestCase):
+    """Logging out ends the device's own session only."""
+
+    def setUp(self):
+        self.user = make_user('phone', '6999999996')
+        self.devices = [ClaimsRefreshToken.for_user(self.user) for _ in range(2)]
+
+    def client_for(self, refresh):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        return client
+
+    def test_logout_revokes_only_the_presented_tokens(self):
+        gone, kept = self.devices
+        gone_client, kept_client = self.client_for(gone), self.client_for(kept)
+        response = gone_client.post('/api/logout/', {'refresh': str(gone)}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertEqual(gone_client.get('/api/profile/').status_code, 401)
+        self.assertEqual(APIClient().post('/api/token/refresh/', {'refresh': str(gone)}).status_code, 401)
+        self.assertEqual(kept_client.get('/api/profile/').status_code, 200)
+        self.assertEqual(APIClient().post('/api/token/refresh/', {'refresh': str(kept)}).status_code, 200)
+
+    def test_logout_needs_the_users_own_refresh_token(self):
+        client = self.client_for(self.devices[0])
+        self.assertEqual(client.post('/api/logout/', {}, format='json').status_code, 400)
+        other = make_user('other', '6999999995')
+        response = client.post('/api/logout/', {'refresh': str(ClaimsRefreshToken.for_user(other))}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ClaimsUserTests(TestCase):
+    def test_fields_beyond_the_claims_load_in_one_query(self):
+        user = make_user('claims', '6999999994')
+        access = ClaimsRefreshToken.for_user(user).access_token
+        with self.assertNumQueries(0):
+            claims_user = ClaimsJWTAuthentication().get_user(access)
+            self.assertEqual((claims_user.id, claims_user.is_active, claims_user.is_staff), (user.id, True, False))
+        with self.assertNumQueries(1):
+            self.assertEqual((claims_user.username, claims_user.mobile, claims_user.referral_code),
+                             ('claims', '6999999994', user.referral_code))
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    """login_user authenticates through UsernameOrMobileBackend."""
+
+    def setUp(self):
+        self.user = make_user('login', '6999999993')
+        self.user.set_password('right-password')
+        self.user.save()
+
+    def login(self, password):
+        return self.client.post('/api/login/', {'mobile': '6999999993', 'password': password},
+                                content_type='application/json')
+
+    def test_login(self):
+        response = self.login('right-password')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['id'], self.user.id)
+        self.assertEqual(self.login('wrong-password').status_code, 401)
+
+    def test_blocked_user_is_told_only_after_the_right_password(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login('wrong-password').status_code, 401)
+        response = self.login('right-password')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.json()['blocked'])
+        self.assertEqual(self.client.post('/api/token/', {'mobile': '6999999993', 'password': 'right-password'})
+                         .status_code, 401)
+
+    def test_hash_cost_follows_the_setting(self):
+        hasher = TunedPBKDF2PasswordHasher()
+        self.assertTrue(hasher.must_update(self.user.password.replace('$1000$', '$2000$')))
+        with override_settings():
+            del settings.PASSWORD_PBKDF2_ITERATIONS
+            self.assertEqual(hasher.iterations, PBKDF2PasswordHasher.iterations)
+
+
+class BetAfterDeclareTests(TestCase):
+    """A session declared while its game is still open takes no more bets."""
+
+    def setUp(self):
+        forget_session_ids(self)
+        self.user = make_user('late', '6999999992', balance=Decimal('500'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.now = mock.patch('django.utils.timezone.now', return_value=ist(2026, 10, 18, 12, 20))
+        self.now.start()
+        self.addCleanup(self.now.stop)
+
+    def test_bet_after_declare_is_rejected_and_not_debited(self):
+        response = self.client.post('/api/place-bet/', {'game_name': 'GALI', 'number': 7, 'amount': 50},
+                                    format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        session = GameSession.objects.get(bets__id=response.data['bet_id'])
+        settle_session(session, '07')
+
+        response = self.client.post('/api/place-bet/', {'game_name': 'GALI', 'number': 7, 'amount': 50},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        slip = self.client.post('/api/place-bet-slip/', {
+            'game_name': 'GALI', 'legs': [{'bet_type': 'number', 'numbers': [1, 2], 'amount': 10}],
+        }, format='json')
+        self.assertEqual(slip.status_code, 400)
+
+        self.assertEqual(list(Bet.objects.filter(user=self.user).values_list('status', flat=True)), ['won'])
+        wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual((wallet.balance, wallet.winnings), (Decimal('450'), Decimal('4500')))
+
+    def test_invalid_bets_are_refused_up_front(self):
+        for bet in ({'bet_type': 'jackpot', 'number': 7}, {'bet_type': 'number'}, {'number': 'x7'},
+                    {'number': 100}, {'bet_type': 'andar', 'number': 10}, {'number': 7, 'amount': 5}):
+            with self.subTest(**bet):
+                response = self.client.post('/api/place-bet/', dict({'game_name': 'GALI', 'amount': 50}, **bet),
+                                            format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Bet.objects.exists())
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('500'))
@@ -0,0 +1,145 @@
+"""
+JWTs that carry what the permission checks need, so authenticating a request
+doesn't load the User row.
+
+Tokens are minted with the user's id, is_staff, is_superuser, is_active and
+token_version. Bumping User.token_version (admin block; a password change
+should too) revokes every token issued before; the revocation is announced through a cache
+blocklist whose entries only need to outlive the access tokens they reject.
+Refreshing always re-checks the database, since refresh tokens outlive the
+blocklist entries.
+
+Logging out ends one device only: its refresh token goes on simplejwt's
+database blacklist (checked on refresh) and its access token on the cache
+blocklist by jti until it expires.
+
+With the default local-memory cache a revocation only reaches the process
+that made it (others keep accepting the old access token until it expires);
+use a shared cache backend with several workers.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+VERSION_CLAIM = 'tv'
+# User fields copied onto the token as claims
+USER_CLAIMS = ('is_staff', 'is_superuser', 'is_active')
+
+
+def _blocklist_key(user_id):
+    return f'stapp:jwt:revoked:{user_id}'
+
+
+def _jti_blocklist_key(jti):
+    return f'stapp:jwt:revoked-jti:{jti}'
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[VERSION_CLAIM] = user.token_version
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses refresh tokens of blocked users or from before a revocation, and re-reads the claims."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).only(
+            'id', 'token_version', *USER_CLAIMS
+        ).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if refresh.payload.get(VERSION_CLAIM, user.token_version) != user.token_version:
+            raise InvalidToken('Token has been revoked')
+        access = refresh.access_token
+        access[VERSION_CLAIM] = user.token_version
+        for claim in USER_CLAIMS:
+            access[claim] = getattr(user, claim)
+        return {'access': str(access)}
+
+
+def revoke_tokens(user_id):
+    """
+    Invalidate every token issued to a user so far, on every device (admin
+    block; a password change should call it too). Returns the new token version; tokens minted afterwards
+    carry it.
+    """
+    User.objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+    version, is_active = User.objects.filter(pk=user_id).values_list('token_version', 'is_active').get()
+    cache.set(_blocklist_key(user_id), (version, is_active), api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    return version
+
+
+def revoke_session(refresh, access=None):
+    """
+    Log one device out: blacklist its refresh token and block its access token
+    (request.auth) for the rest of its lifetime. Other devices stay logged in.
+    """
+    refresh.blacklist()
+    if access is not None:
+        remaining = access['exp'] - int(time.time())
+        if remaining > 0:
+            cache.set(_jti_blocklist_key(access[api_settings.JTI_CLAIM]), True, remaining)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that builds request.user from the token's claims.
+
+    request.user has id, token_version and the USER_CLAIMS fields loaded. The
+    first read of any other field (username, mobile, ...) loads all the others
+    in one query (see User.refresh_from_db). Tokens minted before the claims
+    existed fall back to loading the row.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        is_active = validated_token.get('is_active', True)
+        user_key, jti_key = _blocklist_key(user_id), _jti_blocklist_key(validated_token.get(api_settings.JTI_CLAIM))
+        blocked = cache.get_many([user_key, jti_key])
+        if jti_key in blocked:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        revoked = blocked.get(user_key)
+        if revoked is not None and validated_token[VERSION_CLAIM] < revoked[0]:
+            if revoked[1]:
+                raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+            is_active = False
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        loaded = {
+            'id': user_id,
+            'token_version': validated_token[VERSION_CLAIM],
+            'is_staff': validated_token.get('is_staff', False),
+            'is_superuser': validated_token.get('is_superuser', False),
+            'is_active': is_active,
+        }
+        # from_db takes the values in model field order
+        fields = [f.attname for f in User._meta.concrete_fields if f.attname in loaded]
+        user = User.from_db(DEFAULT_DB_ALIAS, fields, [loaded[name] for name in fields])
+        user.loaded_from_claims = True
+        return user
@@ -0,0 +1,208 @@
+import heapq
+from abc import ABC, abstractmethod
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import DepositRequest, Transaction, WithdrawRequest
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+# Rows fetched per round trip when streaming a full export
+EXPORT_CHUNK_SIZE = 2000
+
+USER_FIELDS = ('user__username', 'user__mobile')
+
+
+class FeedFilters:
+    """Validated ?type=, ?status=, ?date_from=, ?date_to= (YYYY-MM-DD) of the admin feed."""
+
+    def __init__(self, params):
+        self.type = params.get('type', '').strip().lower() or None
+        self.status = params.get('status', '').strip().lower() or None
+        self.since = self._day_start(params.get('date_from'))
+        until = self._day_start(params.get('date_to'))
+        self.until = until + timedelta(days=1) if until else None
+
+    @staticmethod
+    def _day_start(value):
+        if not value:
+            return None
+        try:
+            day = datetime.strptime(value.strip(), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f"Invalid date '{value}', use YYYY-MM-DD")
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def dates(self, queryset):
+        if self.since:
+            queryset = queryset.filter(created_at__gte=self.since)
+        if self.until:
+            queryset = queryset.filter(created_at__lt=self.until)
+        return queryset
+
+
+class FeedSource(ABC):
+    """One table in the feed. `rank` breaks created_at ties between tables."""
+    rank = 0
+    transaction_type = None
+
+    @abstractmethod
+    def queryset(self, filters):
+        """The table's rows matching `filters`, as values() dicts with id, created_at and USER_FIELDS."""
+
+    @abstractmethod
+    def row(self, values):
+        """One values() dict as a feed row."""
+
+    def wanted(self, filters):
+        return filters.type is None or self.transaction_type is None or filters.type == self.transaction_type
+
+    def after(self, queryset, created_at, rank, pk):
+        """Rows that come after (created_at, rank, pk) in the feed's descending order."""
+        if self.rank < rank:
+            return queryset.filter(created_at__lte=created_at)
+        if self.rank > rank:
+            return queryset.filter(created_at__lt=created_at)
+        return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+    def ordered(self, queryset):
+        return queryset.order_by('-created_at', '-pk')
+
+    def user(self, values):
+        return {'username': values['user__username'], 'mobile': values['user__mobile']}
+
+
+class TransactionSource(FeedSource):
+    rank = 0
+
+    def queryset(self, filters):
+        queryset = filters.dates(Transaction.objects.all())
+        if filters.type:
+            queryset = queryset.filter(transaction_type=filters.type)
+        if filters.status:
+            queryset = queryset.filter(status=filters.status)
+        return queryset.values(
+            'id', 'created_at', 'transaction_type', 'amount', 'status', 'note', *USER_FIELDS
+        )
+
+    def row(self, values):
+        return {
+            'id': values['id'],
+            'user': self.user(values),
+            'transaction_type': values['transaction_type'],
+            'amount': str(values['amount']),
+            'status': values['status'],
+            'created_at': values['created_at'].isoformat(),
+            'note': values['note'] or '',
+        }
+
+
+class DepositSource(FeedSource):
+    rank = 1
+    transaction_type = 'deposit'
+
+    def queryset(self, filters):
+        queryset = filters.dates(DepositRequest.objects.all())
+        if filters.status:
+            queryset = queryset.filter(status=filters.status)
+        return queryset.values('id', 'created_at', 'amount', 'status', 'utr_number', *USER_FIELDS)
+
+    def row(self, values):
+        return {
+            'id': f"dep_{values['id']}",
+            'user': self.user(values),
+            'transaction_type': 'deposit',
+            'amount': str(values['amount']),
+            'status': values['status'],
+            'created_at': values['created_at'].isoformat(),
+            'note': f"UTR: {values['utr_number']}",
+        }
+
+
+class WithdrawSource(FeedSource):
+    rank = 2
+    transaction_type = 'withdraw'
+    STATUS_FILTERS = {
+        'approved': Q(is_approved=True),
+        'rejected': Q(is_approved=False, is_rejected=True),
+        'pending': Q(is_approved=False, is_rejected=False),
+    }
+
+    def queryset(self, filters):
+        queryset = filters.dates(WithdrawRequest.objects.all())
+        if filters.status:
+            queryset = queryset.filter(self.STATUS_FILTERS.get(filters.status, Q(pk__in=[])))
+        return queryset.values('id', 'created_at', 'amount', 'is_approved', 'is_rejected', *USER_FIELDS)
+
+    def row(self, values):
+        status = 'approved' if values['is_approved'] else 'rejected' if values['is_rejected'] else 'pending'
+        return {
+            'id': f"with_{values['id']}",
+            'user': self.user(values),
+            'transaction_type': 'withdraw',
+            'amount': str(values['amount']),
+            'status': status,
+            'created_at': values['created_at'].isoformat(),
+            'note': '',
+        }
+
+
+SOURCES = (TransactionSource(), DepositSource(), WithdrawSource())
+
+
+def _tagged(source, rows):
+    for values in rows:
+        yield (values['created_at'], source.rank, values['id']), source, values
+
+
+def _merge(streams):
+    # Each stream is already ordered newest first, so a k-way merge gives the global order
+    return heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+
+
+def _position(cursor):
+    values = decode_cursor(cursor)
+    if len(values) != 3 or not all(isinstance(v, int) for v in values[1:]):
+        raise InvalidCursor('cursor does not match feed ordering')
+    created_at = parse_datetime(values[0]) if isinstance(values[0], str) else None
+    if created_at is None:
+        raise InvalidCursor('bad cursor timestamp')
+    return created_at, values[1], values[2]
+
+
+def feed_page(filters, cursor=None, page_size=50):
+    """
+    One page of the merged feed, newest first, and the cursor of the next page.
+    Each table is asked for at most page_size + 1 rows after the cursor, so a
+    page costs three LIMITed queries however long the history is.
+    """
+    position = _position(cursor) if cursor else None
+    streams = []
+    for source in SOURCES:
+        if not source.wanted(filters):
+            continue
+        queryset = source.queryset(filters)
+        if position:
+            queryset = source.after(queryset, *position)
+        streams.append(_tagged(source, source.ordered(queryset)[:page_size + 1]))
+
+    rows, last_key = [], None
+    for key, source, values in _merge(streams):
+        if len(rows) == page_size:
+            return rows, encode_cursor(last_key)
+        rows.append(source.row(values))
+        last_key = key
+    return rows, None
+
+
+def feed_export(filters):
+    """Every matching row, newest first, streamed from the database in chunks."""
+    streams = [
+        _tagged(source, source.ordered(source.queryset(filters)).iterator(chunk_size=EXPORT_CHUNK_SIZE))
+        for source in SOURCES
+        if source.wanted(filters)
+    ]
+    for _, source, values in _merge(streams):
+        yield source.row(values)
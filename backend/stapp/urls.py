@@ -16,9 +16,12 @@ urlpatterns = [
     path('api/withdraw/', withdraw_request, name='withdraw-request'),
     path('api/transactions/', transaction_history, name='transaction-history'),
     path('api/place-bet/', place_bet, name='place_bet'),
+    path('api/place-bet-slip/', place_bet_slip, name='place_bet_slip'),
     path('api/current-session/',view_bets_current_session, name='view_bets_current_session'),
     path('api/view-bets-history/',view_bets_history, name='view_bets_history'),
     path('api/my-bets/', user_bet_history, name='user-bet-history'),
+    path('api/sync/', sync_changes, name='sync-changes'),
+    path('api/bootstrap/', bootstrap, name='bootstrap'),
     # path('get-profile/', get_user_profile, name='get_profile'),
 
     # Admin endpoints
@@ -34,6 +37,8 @@ urlpatterns = [
     path('api/admin/deposit-requests/', admin_list_deposit_requests, name='admin_list_deposit_requests'),
     path('api/admin/deposit-action/', admin_deposit_action, name='admin_deposit_action'),
     path('api/admin/declare-result/', declare_result, name='declare_result'),
+    path('api/admin/exposure/', admin_session_exposure, name='admin_session_exposure'),
+    path('api/admin/what-if/', admin_payout_what_if, name='admin_payout_what_if'),
     path('api/admin/referral-summary/', admin_referral_summary, name="admin_referral_summary"),
     path('api/admin/users-stats/', admin_users_stats, name='admin_users_stats'),
 
@@ -42,6 +47,7 @@ urlpatterns = [
     path('api/user/referrals/', referral_earnings, name="referral_earnings"),
     path('api/user/my-referrals/', my_referrals, name='my_referrals'),
     path('api/game-status/', game_status, name='game-status'),
+    path('api/events/', game_events, name='game_events'),
 
     path('api/admin/user/<int:user_id>/details/', admin_user_details, name='admin_user_details'),
     path('api/admin/user/<int:user_id>/deposits/', admin_user_deposits, name='admin_user_deposits'),
@@ -49,6 +55,7 @@ urlpatterns = [
     path('api/admin/user/<int:user_id>/bets/', admin_user_bets, name='admin_user_bets'),
     path("api/admin/dashboard-stats/", admin_dashboard_stats, name="admin_dashboard_stats"),
     path('api/admin/games-stats/', admin_games_stats, name='admin_games_stats'),
+    path('api/admin/cache-stats/', admin_cache_stats, name='admin_cache_stats'),
     path('api/admin/user/<int:user_id>/block/', admin_block_user, name='admin-block-user'),
     path('api/admin/user/<int:user_id>/reset/', admin_reset_user, name='admin-reset-user'),
     path('api/edit_profile/',edit_user_profile, name='edit_user_profile'),
@@ -1,6 +1,6 @@
 from django.shortcuts import render
 from django.contrib.auth import authenticate
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
@@ -8,12 +8,22 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .tokens import ClaimsRefreshToken, revoke_session, revoke_tokens
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db import transaction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
 
 from .models import *
 import json
+import logging
 import random
 import string
 from decimal import Decimal
@@ -26,11 +36,29 @@ from datetime import timedelta
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from .permissions import IsActiveUser
+from .exposure import (
+    add_stake, aggregate_stakes, drop_exposure, empty_stakes, exposure_book, liability_vector,
+    min_liability_numbers, record_bet_exposure, record_stakes_exposure,
+)
+from .bet_slip import SlipError, expand_slip, validate_bet
+from .ledger import MONEY_FIELD, InsufficientBalance, debit_wallet
+from .pagination import InvalidCursor, keyset_page
+from .transaction_feed import FeedFilters, feed_export, feed_page
+from .rollups import (
+    bet_months, local_day, refresh_monthly_bettors, refresh_platform_day, refresh_rollup_keys, user_rollup_keys,
+)
+from .game_timing import find_game_session, get_game_session, get_game_session_id, get_timing_manager
+from .settlement import (
+    SessionAlreadyDeclared, SessionClosed, SessionNotDeclared, lock_open_session, settle_session, undo_session,
+)
+from . import caching, events, read_model, sync
 from rest_framework.permissions import IsAdminUser
 from django.shortcuts import get_object_or_404
 
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
+logger = logging.getLogger(__name__)
+
 def generate_referral_code(username, mobile):
     """Generate a unique referral code based on username and mobile"""
     # Take first 3 chars of username and last 4 digits of mobile
@@ -85,7 +113,7 @@ def register_user(request):
             Wallet.objects.create(user=user)
 
             # Generate JWT tokens for immediate login
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             access_token = refresh.access_token
 
             return JsonResponse({
@@ -110,7 +138,6 @@ def register_user(request):
 
 
 # ...existing code...
-from django.contrib.auth.hashers import check_password
 
 @csrf_exempt
 def login_user(request):
@@ -123,9 +150,9 @@ def login_user(request):
             if not mobile or not password:
                 return JsonResponse({'error': 'Mobile and password are required'}, status=400)
 
-            try:
-                user = User.objects.get(mobile=mobile)
-            except User.DoesNotExist:
+            # UsernameOrMobileBackend: one user query, rehashes the password if the hasher policy changed
+            user = authenticate(request, mobile=mobile, password=password)
+            if user is None:
                 return JsonResponse({'error': 'Invalid mobile number or password'}, status=401)
 
             if not user.is_active:
@@ -134,11 +161,8 @@ def login_user(request):
                     'blocked': True
                 }, status=403)
 
-            if not check_password(password, user.password):
-                return JsonResponse({'error': 'Invalid mobile number or password'}, status=401)
-
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             access_token = refresh.access_token
 
             return JsonResponse({
@@ -166,28 +190,19 @@ def login_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsActiveUser])
 def get_user_profile(request):
+    """The user's profile, from the cached read model (see stapp.read_model); 304 on If-None-Match."""
     try:
-        user = request.user
+        payload, etag = read_model.profile(request.user.id)
         # Generate referral code if it doesn't exist
-        if not user.referral_code:
+        if not payload['referral_code']:
+            user = User.objects.get(pk=request.user.id)
             user.referral_code = generate_referral_code(user.username, user.mobile)
-            user.save()
-
-
+            user.save(update_fields=['referral_code'])
+            payload, etag = dict(payload, referral_code=user.referral_code), None
 
-        return Response({
-            'id': user.id,
-            'username': user.username,
-            'mobile': user.mobile,
-            'email': user.email,
-            'referral_code': user.referral_code,
-
-            'date_joined': user.date_joined,
-            'status': 'active' if user.is_active else 'blocked' 
-        })
+        return conditional_response(request, payload, etag)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
-from .serializers import WalletSerializer
 
 
 def get_user_wallet(user):
@@ -197,49 +212,47 @@ def get_user_wallet(user):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsActiveUser])
 def get_wallet_balance(request):
+    """
+    Wallet totals from the cached read model: no query while the wallet is
+    unchanged, and a 304 when If-None-Match names the current ETag.
+    """
     try:
-        wallet, _ = Wallet.objects.get_or_create(user=request.user)
-        serializer = WalletSerializer(wallet)
-        return Response(serializer.data)
+        payload, etag = read_model.wallet(request.user.id)
+        return conditional_response(request, payload, etag)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+
+SESSION_CLOSED_ERROR = 'Result already declared for this session. Please wait for the next session.'
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsActiveUser])
 def place_bet(request):
     try:
-        from .game_timing import GameTimingManager
-
         data = request.data
         game_name = data.get('game_name')
-        number = data.get('number')
-        amount = Decimal(str(data.get('amount', 0)))
-        bet_type = data.get('bet_type', 'number')
-        number = data.get('number')
-        india_tz = pytz.timezone('Asia/Kolkata')
-        now = timezone.now().astimezone(india_tz)
-
-        # --- Secure min/max bet logic ---
-        if amount < 10:
-            return Response({'error': 'Minimum bet amount is ₹10.'}, status=400)
-        if amount > 10000:
-            return Response({'error': 'Maximum bet amount is ₹10,000.'}, status=400)
+        # Bet type, number range and min/max stake, as for a bet slip leg
+        try:
+            bet_type, number, amount = validate_bet(data)
+        except SlipError as e:
+            return Response({'error': str(e)}, status=400)
 
         if game_name:
             game_name = game_name.upper()
 
-        print(f"[DEBUG] Incoming bet: game={game_name}, number={number}, amount={amount}, bet_type={bet_type}, user={request.user}")
+        print(f"[DEBUG] Incoming bet: game={game_name}, number={number}, amount={amount}, bet_type={bet_type}, user={request.user.id}")
 
-        timing_manager = GameTimingManager()
-        is_locked = timing_manager.is_game_locked(game_name)
-        next_open = timing_manager.get_next_open_time(game_name)
+        now = timezone.localtime()
+        timing_manager = get_timing_manager()
+        is_locked = timing_manager.is_game_locked(game_name, now)
+        next_open = timing_manager.get_next_open_time(game_name, now)
         print(f"[DEBUG] is_game_locked={is_locked}, next_open_time={next_open}")
 
-        open_dt, close_dt, _ = get_game_time_window(game_name)  # ✅ Fix
-        now = timezone.localtime()
-        print(f"[DEBUG] {game_name} session: {open_dt} to {close_dt}, NOW: {now}")
+        session = timing_manager.get_current_session(game_name, now)
+        print(f"[DEBUG] {game_name} session: {session}, NOW: {now}")
 
-        if open_dt is None or close_dt is None:
+        if session is None:
             print(f"[DEBUG] Invalid game name or timings not set for {game_name}")
             return Response({'error': 'Invalid game name or timings not set.'}, status=400)
 
@@ -250,60 +263,38 @@ def place_bet(request):
                 'next_open_time': next_open
             }, status=400)
 
-        # Check if user has sufficient balance (balance + bonus + winnings)
+        session_id = get_game_session_id(game_name, session)
+
+        # Deduct amount from wallet (prefer balance, then winnings, then bonus)
+        # and create the bet in the same transaction
         try:
-            wallet = Wallet.objects.get(user=request.user)
+            with transaction.atomic():
+                lock_open_session(session_id)
+                wallet = debit_wallet(request.user, amount)
+                bet = Bet.objects.create(
+                    user=request.user,
+                    game_name=game_name,
+                    number=number,
+                    amount=amount,
+                    bet_type=bet_type,
+                    session_start=session.open,
+                    session_end=session.close,
+                    session_id=session_id,
+                )
+                record_bet_exposure(session_id, bet_type, number, amount)
+                caching.invalidate_user(request.user.id)
         except Wallet.DoesNotExist:
             print("[DEBUG] Wallet not found for user.")
             return Response({'error': 'Wallet not found'}, status=404)
-
-        total_balance = wallet.balance + wallet.bonus + wallet.winnings
-        print(f"[DEBUG] User balance: {wallet.balance}, bonus: {wallet.bonus}, winnings: {wallet.winnings}, total: {total_balance}")
-
-        if total_balance < amount:
-            print(f"[DEBUG] Bet rejected: Insufficient balance ({total_balance} < {amount})")
+        except InsufficientBalance:
+            print(f"[DEBUG] Bet rejected: Insufficient balance for {amount}")
             return Response({'error': 'Insufficient balance'}, status=400)
+        except SessionClosed:
+            return Response({'error': SESSION_CLOSED_ERROR}, status=400)
 
-        # Deduct amount from wallet (prefer balance, then winnings, then bonus)
-        left = amount
-        if wallet.balance >= left:
-            wallet.balance -= left
-            left = Decimal('0.00')
-        else:
-            left -= wallet.balance
-            wallet.balance = Decimal('0.00')
-
-        if left > 0:
-            if wallet.winnings >= left:
-                wallet.winnings -= left
-                left = Decimal('0.00')
-            else:
-                left -= wallet.winnings
-                wallet.winnings = Decimal('0.00')
-
-        if left > 0:
-            if wallet.bonus >= left:
-                wallet.bonus -= left
-                left = Decimal('0.00')
-            else:
-                print(f"[DEBUG] Bet rejected: Insufficient balance after all deductions.")
-                return Response({'error': 'Insufficient balance.'}, status=400)
-
-        wallet.save()
-
-        # Create bet record
-        bet = Bet.objects.create(
-            user=request.user,
-            game_name=game_name,
-            number=number,
-            amount=amount,
-            bet_type=bet_type,
-            session_start=open_dt,
-            session_end=close_dt,
-        )
         print(f"[DEBUG] Bet created: id={bet.id}")
 
-        print(f"[DEBUG] Bet placed successfully for user {request.user}")
+        print(f"[DEBUG] Bet placed successfully for user {request.user.id}")
         return Response({
             'message': 'Bet placed successfully',
             'bet_id': bet.id,
@@ -315,6 +306,79 @@ def place_bet(request):
         print("[DEBUG] Exception in place_bet:", traceback.format_exc())
         return Response({'error': str(e)}, status=500)
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsActiveUser])
+def place_bet_slip(request):
+    """
+    Place many bets on one game in one go (see stapp.bet_slip for the leg formats).
+    POST data: { "game_name": "GALI", "legs": [...] }
+
+    The slip is validated and the schedule checked once, the wallet is debited
+    the slip total with one UPDATE, the bets are inserted with one bulk INSERT
+    and the exposure book updated with one UPDATE, so a 50-leg slip costs the
+    same handful of queries as a single bet. All or nothing.
+    """
+    try:
+        game_name = (request.data.get('game_name') or '').upper()
+        try:
+            legs = expand_slip(request.data.get('legs'))
+        except SlipError as e:
+            return Response({'error': str(e)}, status=400)
+
+        now = timezone.localtime()
+        timing_manager = get_timing_manager()
+        session = timing_manager.get_current_session(game_name, now)
+        if session is None:
+            return Response({'error': 'Invalid game name or timings not set.'}, status=400)
+        if timing_manager.is_game_locked(game_name, now):
+            return Response({
+                'error': f'{game_name.title()} is currently locked. Please wait for next opening time.',
+                'next_open_time': timing_manager.get_next_open_time(game_name, now)
+            }, status=400)
+
+        session_id = get_game_session_id(game_name, session)
+        total = sum(amount for _, _, amount in legs)
+        stakes = empty_stakes()
+        for bet_type, number, amount in legs:
+            add_stake(stakes, bet_type, number, amount)
+
+        try:
+            with transaction.atomic():
+                lock_open_session(session_id)
+                wallet = debit_wallet(request.user, total)
+                bets = Bet.objects.bulk_create([
+                    Bet(
+                        user=request.user,
+                        game_name=game_name,
+                        number=number,
+                        amount=amount,
+                        bet_type=bet_type,
+                        session_start=session.open,
+                        session_end=session.close,
+                        session_id=session_id,
+                    )
+                    for bet_type, number, amount in legs
+                ])
+                record_stakes_exposure(session_id, stakes)
+                caching.invalidate_user(request.user.id)
+        except Wallet.DoesNotExist:
+            return Response({'error': 'Wallet not found'}, status=404)
+        except InsufficientBalance:
+            return Response({'error': 'Insufficient balance'}, status=400)
+        except SessionClosed:
+            return Response({'error': SESSION_CLOSED_ERROR}, status=400)
+
+        return Response({
+            'message': f'{len(bets)} bets placed successfully',
+            'bet_ids': [bet.id for bet in bets],
+            'total_amount': str(total),
+            'remaining_balance': str(wallet.balance + wallet.bonus + wallet.winnings)
+        })
+    except Exception:
+        logger.exception('Placing a bet slip failed')
+        return Response({'error': 'Could not place the bet slip. Please try again.'}, status=500)
+
 # ...existing code...
 
 @api_view(['POST'])
@@ -324,12 +388,13 @@ def declare_result(request):
         data = request.data
         game_name = data.get('game_name', '').strip().upper()
         winning_number_raw = str(data.get('winning_number', '')).strip()
-        open_dt, close_dt, result_dt = get_game_time_window(game_name)
         now = timezone.localtime()
+        session = get_timing_manager().get_current_session(game_name, now)
 
         # Secure: Check session window
-        if not open_dt or not close_dt:
+        if session is None:
             return Response({'error': 'No active session found for this game.'}, status=400)
+        open_dt, close_dt, result_dt = session.open, session.close, session.result
 
         # Diamond King: Only allow result in result window
         if game_name == "DIAMOND KING":
@@ -342,68 +407,11 @@ def declare_result(request):
             return Response({'error': 'Valid winning number (00-100) required'}, status=400)
         winning_number = str(winning_number_raw).zfill(2)
 
-        DeclaredResult.objects.create(
-            game_name=game_name,
-            winning_number=winning_number
-        )
-
-        # Get current session bets only
-        bets = Bet.objects.filter(
-            game_name__iexact=game_name,
-            status='pending',
-            created_at__gte=open_dt,
-            created_at__lte=close_dt
-        )
-
-        andar_digit = int(winning_number[0])
-        bahar_digit = int(winning_number[-1])
-
-        commission_games = ['FARIDABAD', 'GALI', 'DISAWER', 'GHAZIABAD']
-
-        for bet in bets:
-            payout = Decimal('0.00')
-            is_win = False
-
-            if bet.bet_type == 'number' and str(bet.number).zfill(2) == winning_number:
-                payout = bet.amount * 90
-                is_win = True
-            elif bet.bet_type == 'andar' and int(bet.number) == andar_digit:
-                payout = bet.amount * 9
-                is_win = True
-            elif bet.bet_type == 'bahar' and int(bet.number) == bahar_digit:
-                payout = bet.amount * 9
-                is_win = True
-
-            wallet = get_user_wallet(bet.user)
-            if is_win:
-                wallet.winnings += payout
-                bet.status = 'won'
-            else:
-                bet.status = 'lost'
-
-            # --- Commission Logic: 10% of bet amount for commission_games, always for "number" bet ---
-            if game_name in commission_games and bet.bet_type == 'number':
-                if bet.user.referred_by:
-                    try:
-                        referrer = User.objects.get(referral_code=bet.user.referred_by)
-                        commission_amount = bet.amount * Decimal('0.10')
-                        referrer_wallet = Wallet.objects.get(user=referrer)
-                        referrer_wallet.bonus += commission_amount
-                        referrer_wallet.save()
-                        ReferralCommission.objects.create(
-                            referrer=referrer,
-                            referred_user=bet.user,
-                            commission=commission_amount,
-                            commission_type='bet_commission',
-                            bet=bet
-                        )
-                    except User.DoesNotExist:
-                        pass
-
-            wallet.save()
-            bet.is_win = is_win
-            bet.payout = payout
-            bet.save()
+        # Settle current session bets only
+        try:
+            settle_session(get_game_session(game_name, session), winning_number)
+        except SessionAlreadyDeclared:
+            return Response({'error': 'Result already declared for this session.'}, status=400)
 
         return Response({'message': f'Results declared for {game_name} - Winning number: {winning_number}'})
 
@@ -412,6 +420,102 @@ def declare_result(request):
         print(traceback.format_exc())
         return Response({'error': str(e)}, status=500)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def admin_session_exposure(request):
+    """
+    Live risk view: payout owed for every possible result 00-99 in a session.
+    ?game=<name> for the current session, or ?session_id=<id>.
+    """
+    session_id = request.GET.get('session_id')
+    if session_id:
+        if not session_id.isdigit():
+            return Response({'error': 'Invalid session_id'}, status=400)
+        game_session = GameSession.objects.filter(pk=session_id).first()
+    else:
+        game_name = normalize_game_name(request.GET.get('game'))
+        session = get_timing_manager().get_current_session(game_name, timezone.localtime())
+        if session is None:
+            return Response({'error': 'No active session found for this game.'}, status=400)
+        game_session = find_game_session(game_name, session)
+        if game_session is None:
+            return Response({'error': 'No bets placed in this session yet.'}, status=404)
+    if game_session is None:
+        return Response({'error': 'Session not found'}, status=404)
+
+    liabilities = exposure_book(game_session.pk)
+    total_stake = Bet.objects.filter(session=game_session).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    return Response({
+        'session_id': game_session.pk,
+        'game_name': game_session.game_name,
+        'session_no': game_session.session_no,
+        'open_at': game_session.open_at,
+        'close_at': game_session.close_at,
+        'state': game_session.state,
+        'total_stake': str(total_stake),
+        'max_liability': str(max(liabilities)),
+        'safest_numbers': min_liability_numbers(liabilities),
+        'book': [
+            {
+                'number': str(n).zfill(2),
+                'liability': str(amount),
+                'house_net': str(total_stake - amount),
+            }
+            for n, amount in enumerate(liabilities)
+        ],
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def admin_payout_what_if(request):
+    """
+    Payout for every result 00-99 if the current session's pending bets plus
+    some hypothetical ones were settled now. Body:
+    {"game": "...", "bets": [{"bet_type", "number", "amount"}], "winning_number": optional}
+    """
+    data = request.data
+    game_name = normalize_game_name(data.get('game'))
+    session = get_timing_manager().get_current_session(game_name, timezone.localtime())
+    if session is None:
+        return Response({'error': 'No active session found for this game.'}, status=400)
+    game_session = find_game_session(game_name, session)
+    if game_session is not None:
+        pending = Bet.objects.filter(session=game_session, status='pending')
+        stakes = aggregate_stakes(pending)
+        total_stake = pending.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    else:
+        stakes = empty_stakes()
+        total_stake = Decimal('0.00')
+
+    try:
+        for bet in data.get('bets') or []:
+            amount = Decimal(str(bet.get('amount', 0)))
+            add_stake(stakes, bet.get('bet_type', 'number'), bet.get('number'), amount)
+            total_stake += amount
+    except (TypeError, ValueError, ArithmeticError, AttributeError):
+        return Response({'error': 'Each bet needs bet_type, number and amount'}, status=400)
+
+    liabilities = liability_vector(stakes)
+    response = {
+        'game_name': game_name,
+        'session_no': session.session_no,
+        'total_stake': str(total_stake),
+        'max_liability': str(max(liabilities)),
+        'safest_numbers': min_liability_numbers(liabilities),
+        'payouts': {str(n).zfill(2): str(amount) for n, amount in enumerate(liabilities)},
+    }
+    winning_number = str(data.get('winning_number', '')).strip()
+    if winning_number:
+        if not (winning_number.isdigit() and 0 <= int(winning_number) <= 99):
+            return Response({'error': 'Valid winning number (00-99) required'}, status=400)
+        payout = liabilities[int(winning_number)]
+        response['winning_number'] = winning_number.zfill(2)
+        response['payout'] = str(payout)
+        response['house_net'] = str(total_stake - payout)
+    return Response(response)
+
 # ...existing code...
 
 
@@ -480,35 +584,33 @@ def user_profile(request):
 def withdraw_request(request):
     try:
         amount = Decimal(str(request.data.get('amount', 0)))
-        wallet = Wallet.objects.get(user=request.user)
 
         if amount < 100:
             return Response({'error': 'Minimum withdrawal amount is ₹100.'}, status=400)
         if amount > 30000:
             return Response({'error': 'Maximum withdrawal amount is ₹30,000.'}, status=400)
 
-        # Only winnings can be withdrawn
-        if wallet.winnings < amount:
-            return Response({'error': 'Insufficient winnings balance.'}, status=400)
-
-        # Deduct from winnings immediately
-        wallet.winnings -= amount
-        wallet.save()
+        try:
+            with transaction.atomic():
+                # Only winnings can be withdrawn, deduct them immediately
+                debit_wallet(request.user, amount, fields=('winnings',))
 
-        # Create withdraw request
-        withdraw_req = WithdrawRequest.objects.create(
-            user=request.user,
-            amount=amount
-        )
+                # Create withdraw request
+                withdraw_req = WithdrawRequest.objects.create(
+                    user=request.user,
+                    amount=amount
+                )
 
-        # Create pending transaction for withdraw
-        Transaction.objects.create(
-            user=request.user,
-            transaction_type='withdraw',
-            amount=amount,
-            status='pending',
-            note='Withdraw request submitted'
-        )
+                # Create pending transaction for withdraw
+                Transaction.objects.create(
+                    user=request.user,
+                    transaction_type='withdraw',
+                    amount=amount,
+                    status='pending',
+                    note='Withdraw request submitted'
+                )
+        except InsufficientBalance:
+            return Response({'error': 'Insufficient winnings balance.'}, status=400)
 
         return Response({'message': 'Withdraw request submitted successfully'})
     except Exception as e:
@@ -521,113 +623,41 @@ import pytz
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsActiveUser])
 def transaction_history(request):
+    """
+    The user's transactions, newest first, filtered by ?type=, ?status=,
+    ?date_from= / ?date_to= (YYYY-MM-DD) and paged by ?cursor= / ?page_size=.
+    """
     try:
         ist = pytz.timezone('Asia/Kolkata')
-        transactions = Transaction.objects.filter(user=request.user).order_by('-created_at')
-        data = []
-        for txn in transactions:
-            created_at_ist = txn.created_at.astimezone(ist)
-            data.append({
-                'id': txn.id,
-                'type': txn.transaction_type,
-                'amount': str(txn.amount),
-                'status': txn.status,  # pending, approved, rejected
-                'created_at': created_at_ist.strftime('%d-%m-%Y %I:%M %p')  # Indian date & time
-            })
-        return Response(data)
+        try:
+            filters = FeedFilters(request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        transactions = filters.dates(Transaction.objects.filter(user=request.user))
+        if filters.type:
+            transactions = transactions.filter(transaction_type=filters.type)
+        if filters.status:
+            transactions = transactions.filter(status=filters.status)
+
+        return history_page(
+            request,
+            transactions.values('id', 'transaction_type', 'amount', 'status', 'created_at'),
+            lambda txn: {
+                'id': txn['id'],
+                'type': txn['transaction_type'],
+                'amount': str(txn['amount']),
+                'status': txn['status'],  # pending, approved, rejected
+                'created_at': txn['created_at'].astimezone(ist).strftime('%d-%m-%Y %I:%M %p')  # Indian date & time
+            },
+        )
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 from datetime import datetime, timedelta
 from django.utils import timezone
 
-def generate_diamond_king_sessions():
-    """
-    Diamond King session times:
-    - Session 1: 06:00 - 07:50 (Result: 08:00)
-    - Session 2: 08:10 - 09:50 (Result: 10:00)
-    - Session 3: 10:10 - 11:50 (Result: 12:00)
-    - Session 4: 12:10 - 13:50 (Result: 14:00)
-    - Session 5: 14:10 - 15:50 (Result: 16:00)
-    - Session 6: 16:10 - 17:50 (Result: 18:00)
-    - Session 7: 18:10 - 19:50 (Result: 20:00)
-    - Session 8: 20:10 - 21:50 (Result: 22:00)
-    - Session 9: 22:10 - 23:50 (Result: 23:59)
-    """
-    sessions = []
-    # Session times as per your frontend
-    session_times = [
-        ("06:00", "07:50", "08:00"),
-        ("08:10", "09:50", "10:00"),
-        ("10:10", "11:50", "12:00"),
-        ("12:10", "13:50", "14:00"),
-        ("14:10", "15:50", "16:00"),
-        ("16:10", "17:50", "18:00"),
-        ("18:10", "19:50", "20:00"),
-        ("20:10", "21:50", "22:00"),
-        ("22:10", "23:50", "23:59"),
-    ]
-    for idx, (open_time, close_time, result_time) in enumerate(session_times):
-        sessions.append({
-            "session_no": idx + 1,
-            "open": open_time,
-            "close": close_time,
-            "result": result_time,
-            "open_time": open_time,      # <-- Add these keys for compatibility
-            "close_time": close_time,
-            "result_time": result_time,
-        })
-    return sessions
-
-# GAME_TIMINGS me koi change nahi, bas function call yahi se ho
-GAME_TIMINGS = {
-    "JAIPUR KING": {"open": "21:00", "close": "16:50"},
-    "FARIDABAD": {"open": "22:00", "close": "17:40"},
-    "GHAZIABAD": {"open": "23:00", "close": "19:50"},
-    "GALI": {"open": "04:00", "close": "22:30"},
-    "DISAWER": {"open": "07:00", "close": "02:30"},
-    "DIAMOND KING": generate_diamond_king_sessions()
-}
-
-from datetime import datetime, timedelta
-from django.utils import timezone
-
-import pytz
-
 def get_game_time_window(game_name):
-    ist = pytz.timezone('Asia/Kolkata')
-    now = timezone.now().astimezone(ist)
-    timings = GAME_TIMINGS.get(game_name.upper())
-    if not timings:
-        return None, None, None
-
-    if isinstance(timings, list):
-        today = now.date()
-        for session in timings:
-            open_time = datetime.strptime(session["open"], "%H:%M").time()
-            close_time = datetime.strptime(session["close"], "%H:%M").time()
-            result_time = datetime.strptime(session["result"], "%H:%M").time()
-            open_dt = ist.localize(datetime.combine(today, open_time))
-            close_dt = ist.localize(datetime.combine(today, close_time))
-            result_dt = ist.localize(datetime.combine(today, result_time))
-            if close_time < open_time:
-                close_dt += timedelta(days=1)
-                result_dt += timedelta(days=1)
-            if open_dt <= now <= result_dt:
-                return open_dt, close_dt, result_dt
-        return None, None, None
-
-    today = now.date()
-    open_time = datetime.strptime(timings["open"], "%H:%M").time()
-    close_time = datetime.strptime(timings["close"], "%H:%M").time()
-    open_dt = ist.localize(datetime.combine(today, open_time))
-    close_dt = ist.localize(datetime.combine(today, close_time))
-    if close_time <= open_time:
-        if now.time() >= open_time:
-            close_dt += timedelta(days=1)
-        else:
-            open_dt -= timedelta(days=1)
-    return open_dt, close_dt, None
+    return get_timing_manager().get_session_window(game_name, timezone.now())
 
 
 
@@ -636,29 +666,14 @@ def get_game_time_window(game_name):
 def calculate_diamond_king_payouts(bets):
     """
     Returns: payout_map (number: total_payout), total_bet, all_possible_numbers
-    """
-    payout_map = {}
-    total_bet = 0
-    all_numbers = set(str(i).zfill(2) for i in range(0, 101))  # 00 to 100
-
-    for bet in bets:
-        num = str(bet.number).zfill(2)
-        payout = 0
-        if bet.bet_type == 'number':
-            payout = bet.amount * 90
-        elif bet.bet_type == 'andar':
-            payout = bet.amount * 9
-        elif bet.bet_type == 'bahar':
-            payout = bet.amount * 9
-        payout_map[num] = payout_map.get(num, 0) + payout
-        total_bet += bet.amount
-
-    # Ensure all numbers are present in payout_map (for zero bet numbers)
-    for num in all_numbers:
-        if num not in payout_map:
-            payout_map[num] = 0
 
-    return payout_map, total_bet, all_numbers
+    `bets` is a Bet queryset; stakes are summed in the database and the payout
+    of every winning number 00-99 comes from liability_vector().
+    """
+    liabilities = liability_vector(aggregate_stakes(bets))
+    payout_map = {str(n).zfill(2): amount for n, amount in enumerate(liabilities)}
+    total_bet = bets.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    return payout_map, total_bet, set(payout_map)
 
 
 @api_view(['GET'])
@@ -666,52 +681,35 @@ def calculate_diamond_king_payouts(bets):
 def view_bets_current_session(request):
     try:
         now = timezone.localtime()
-        data = []
-        for game_name in GAME_TIMINGS:
-            if GAME_TIMINGS[game_name] is None:
-                continue
-            open_dt, close_dt, result_dt = get_game_time_window(game_name)
-            # Session ka end time (Diamond King me result_dt, baaki me close_dt)
-            session_end = result_dt if result_dt else close_dt
-            # Only show bets if current time is in session window
-            if open_dt and session_end and open_dt <= now <= session_end:
-                bets = Bet.objects.filter(
-                    user=request.user,
-                    game_name__iexact=game_name,
-                    created_at__gte=open_dt,
-                    created_at__lte=session_end
-                )
-                for bet in bets:
-                    data.append({
-                        'id': bet.id,
-                        'game': bet.game_name,
-                        'number': bet.number,
-                        'amount': str(bet.amount),
-                        'bet_type': bet.bet_type,
-                        'status': bet.status if hasattr(bet, 'status') else 'pending',
-                        'created_at': bet.created_at.isoformat(),
-                        'session_start': bet.session_start,
-                        'session_end': bet.session_end,
-                    })
-        return Response(data)
+        timing_manager = get_timing_manager()
+        return Response(current_session_bets(request.user.id, timing_manager, now))
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
-from datetime import timedelta
-from django.utils import timezone
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated, IsActiveUser])
-def view_bets_history(request):
-    try:
-        # Only last 7 days
-        seven_days_ago = timezone.now() - timedelta(days=6)
-        bets = Bet.objects.filter(
-            user=request.user,
-            created_at__date__gte=seven_days_ago.date()
-        ).order_by('-created_at')
+def current_bets_queryset(user_id, timing_manager, now):
+    """The user's bets in every game's running session, oldest first (bet_user_created_idx)."""
+    current_sessions = Q(pk__in=[])
+    for game_name in timing_manager.games:
+        session = timing_manager.get_current_session(game_name, now)
+        if session is None:
+            continue
+        # Session ka end time (Diamond King me result, baaki me close)
+        session_end = session.result or session.close
+        # Only show bets if current time is in session window
+        if session.open <= now <= session_end:
+            current_sessions |= Q(session__game_name=game_name, session__open_at=session.open)
+    return Bet.objects.filter(current_sessions, user_id=user_id).order_by('created_at')
+
 
+def current_session_bets(user_id, timing_manager, now):
+    """
+    The user's bets in every game's running session, oldest first. Rebuilt only
+    after this user bets, a result is declared/undone or a session boundary passes.
+    """
+    def current_bets():
         data = []
+        bets = current_bets_queryset(user_id, timing_manager, now)
         for bet in bets:
             data.append({
                 'id': bet.id,
@@ -719,14 +717,168 @@ def view_bets_history(request):
                 'number': bet.number,
                 'amount': str(bet.amount),
                 'bet_type': bet.bet_type,
-                'status': 'won' if bet.is_win else 'lost',
-                'winning_number': getattr(bet, 'winning_number', None),
-                'timestamp': bet.session_end if hasattr(bet, 'session_end') and bet.session_end else bet.created_at,
-                'session_start': bet.session_start if hasattr(bet, 'session_start') else None,
-                'session_end': bet.session_end if hasattr(bet, 'session_end') else None,
-                'created_at': bet.created_at,
+                'status': bet.status if hasattr(bet, 'status') else 'pending',
+                'created_at': bet.created_at.isoformat(),
+                'session_start': bet.session_start,
+                'session_end': bet.session_end,
             })
-        return Response(data)
+        return data
+
+    return caching.user_session_view('current_bets', user_id, timing_manager, now, current_bets)
+
+
+def latest_results(timing_manager):
+    """The most recent declared session of every game that has one."""
+    def compute():
+        latest = (
+            GameSession.objects.filter(state='declared', game_name=OuterRef('game_name'))
+            .order_by('-open_at').values('pk')[:1]
+        )
+        return [
+            {
+                'game': row['game_name'],
+                'session_no': row['session_no'],
+                'winning_number': row['winning_number'],
+                'open_at': row['open_at'],
+                'declared_at': row['declared_at'],
+            }
+            for row in GameSession.objects.filter(state='declared', pk=Subquery(latest))
+            .order_by('game_name')
+            .values('game_name', 'session_no', 'winning_number', 'open_at', 'declared_at')
+        ]
+
+    return caching.games_view('latest_results', timing_manager.games, compute)
+
+
+def conditional_response(request, payload, etag=None):
+    """
+    Response(payload) carrying an ETag (by default of the payload itself), or
+    an empty 304 when the client's If-None-Match already names it.
+    """
+    etag = etag or caching.etag(payload)
+    response = get_conditional_response(request, etag=etag) or Response(payload)
+    response['ETag'] = etag
+    # Clients may keep the payload but must revalidate it every time
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsActiveUser])
+def bootstrap(request):
+    """
+    Everything the app shows on launch in one response: profile, wallet
+    totals, every game's status with the instant it next changes
+    (next_change_at; count down against server_time or the Date header), the
+    bets in the running sessions and the latest declared results.
+
+    No query when every part is cached (each is a versioned cache entry), a
+    handful when nothing is. The ETag leaves out server_time, so a client
+    sending If-None-Match gets a 304 until something it shows changes.
+    """
+    try:
+        now = timezone.localtime()
+        timing_manager = get_timing_manager()
+        ist = pytz.timezone('Asia/Kolkata')
+
+        profile, _ = read_model.profile(request.user.id)
+        wallet, _ = read_model.wallet(request.user.id)
+
+        games = []
+        for status in caching.all_games_status(timing_manager, now):
+            boundary = timing_manager.calendar.next_boundary(status['game'], now)
+            games.append(dict(
+                status,
+                next_change_at=datetime.fromtimestamp(boundary, ist) if boundary is not None else None,
+            ))
+
+        payload = {
+            'profile': profile,
+            'wallet': wallet,
+            'games': games,
+            'current_bets': current_session_bets(request.user.id, timing_manager, now),
+            'results': latest_results(timing_manager),
+        }
+        return conditional_response(request, dict(payload, server_time=now), caching.etag(payload))
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+from datetime import timedelta
+from django.utils import timezone
+
+HISTORY_ORDERING = ['-created_at', '-id']
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+def history_page(request, rows, serialize):
+    """
+    One keyset page of a user history queryset (newest first) as
+    {results, next_cursor}. Every page is a LIMITed index range scan, so it
+    costs the same however long the user's history is.
+    """
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 50)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'Invalid page_size'}, status=400)
+    try:
+        page, next_cursor = keyset_page(rows, HISTORY_ORDERING, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=400)
+    return Response({'results': [serialize(row) for row in page], 'next_cursor': next_cursor})
+
+
+def bet_history_queryset(request):
+    """The user's bets narrowed by ?game=, ?status=, ?date_from=, ?date_to= (a 400 Response if invalid)."""
+    try:
+        filters = FeedFilters(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    bets = filters.dates(Bet.objects.filter(user=request.user))
+    game = request.GET.get('game', '').strip().upper()
+    if game:
+        bets = bets.filter(game_name=game)
+    if filters.status:
+        bets = bets.filter(status=filters.status)
+    return bets
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsActiveUser])
+def view_bets_history(request):
+    """
+    The user's bets of the last 7 days (unless ?date_from= says otherwise),
+    newest first, with the session's winning number. Same filters and paging
+    as user_bet_history.
+    """
+    try:
+        bets = bet_history_queryset(request)
+        if isinstance(bets, Response):
+            return bets
+        if not request.GET.get('date_from'):
+            # Only last 7 days
+            seven_days_ago = timezone.localdate() - timedelta(days=6)
+            bets = bets.filter(created_at__gte=timezone.make_aware(datetime.combine(seven_days_ago, datetime.min.time())))
+
+        return history_page(
+            request,
+            bets.values(
+                'id', 'game_name', 'number', 'amount', 'bet_type', 'status', 'created_at',
+                'session_start', 'session_end', 'session__winning_number',
+            ),
+            lambda bet: {
+                'id': bet['id'],
+                'game': bet['game_name'],
+                'number': bet['number'],
+                'amount': str(bet['amount']),
+                'bet_type': bet['bet_type'],
+                'status': bet['status'],
+                'winning_number': bet['session__winning_number'],
+                'timestamp': bet['session_end'] or bet['created_at'],
+                'session_start': bet['session_start'],
+                'session_end': bet['session_end'],
+                'created_at': bet['created_at'],
+            },
+        )
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -736,23 +888,51 @@ def view_bets_history(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsActiveUser])
 def user_bet_history(request):
+    """
+    All of the user's bets, newest first, filtered by ?game=, ?status=
+    (pending/won/lost) and ?date_from= / ?date_to= (YYYY-MM-DD), paged by
+    ?cursor= / ?page_size=.
+    """
     try:
-        bets = Bet.objects.filter(user=request.user).order_by('-created_at')
-        data = []
-        for bet in bets:
-            data.append({
-                'id': bet.id,
-                'game': bet.game,
-                'number': bet.number,
-                'amount': str(bet.amount),
-                'status': 'won' if bet.is_win else 'lost',
-                'payout': str(bet.payout) if bet.payout else '0',
-                'created_at': bet.created_at
-            })
-        return Response(data)
+        bets = bet_history_queryset(request)
+        if isinstance(bets, Response):
+            return bets
+
+        return history_page(
+            request,
+            bets.values('id', 'game_name', 'number', 'amount', 'bet_type', 'status', 'payout', 'created_at'),
+            lambda bet: {
+                'id': bet['id'],
+                'game': bet['game_name'],
+                'number': bet['number'],
+                'amount': str(bet['amount']),
+                'bet_type': bet['bet_type'],
+                'status': bet['status'],
+                'payout': str(bet['payout']) if bet['payout'] else '0',
+                'created_at': bet['created_at']
+            },
+        )
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsActiveUser])
+def sync_changes(request):
+    """
+    The user's bets, transactions, deposits and withdrawals changed since
+    ?since=<cursor>, with the wallet totals and the cursor for the next call.
+    Without ?since= everything is sent, sync.PAGE_SIZE rows per table at a time;
+    call again with the new cursor while has_more is true.
+    """
+    try:
+        return Response(sync.sync(request.user.id, request.GET.get('since')))
+    except InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=400)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -762,6 +942,14 @@ from datetime import datetime, timedelta
 
 # ...existing code...
 
+def session_bets(game_name, open_at):
+    """Bets of one GameSession with their users, oldest first (bet_session_status_idx)."""
+    return Bet.objects.filter(
+        session__game_name=game_name,
+        session__open_at=open_at
+    ).select_related('user').order_by('created_at')
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def admin_bet_records(request):
@@ -772,7 +960,8 @@ def admin_bet_records(request):
     ist = pytz.timezone('Asia/Kolkata')
     now = timezone.now().astimezone(ist)
     game_upper = game.upper()
-    timings = GAME_TIMINGS.get(game_upper)
+    timing_manager = get_timing_manager()
+    timings = timing_manager.timings.get(game_upper)
     sessions_data = []
 
     if not timings:
@@ -797,51 +986,21 @@ def admin_bet_records(request):
     # Diamond King: Multiple sessions
     if isinstance(timings, list):
         today = now.date()
-        current_idx = None
-        for idx, session in enumerate(timings):
-            open_time = datetime.strptime(session["open"], "%H:%M").time()
-            close_time = datetime.strptime(session["close"], "%H:%M").time()
-            open_dt = ist.localize(datetime.combine(today, open_time))
-            close_dt = ist.localize(datetime.combine(today, close_time))
-            if close_time < open_time:
-                close_dt += timedelta(days=1)
-            if open_dt <= now <= close_dt:
-                current_idx = idx
-                break
-        if current_idx is None:
-            for idx, session in reversed(list(enumerate(timings))):
-                open_time = datetime.strptime(session["open"], "%H:%M").time()
-                open_dt = ist.localize(datetime.combine(today, open_time))
-                if open_dt <= now:
-                    current_idx = idx
-                    break
-            if current_idx is None:
-                current_idx = 0
+        today_sessions = timing_manager.calendar.sessions_on(game_upper, today)
+        current_idx = timing_manager.calendar.latest_session_index(game_upper, now)
 
         # Current session
         session = timings[current_idx]
-        open_time = datetime.strptime(session["open"], "%H:%M").time()
-        close_time = datetime.strptime(session["close"], "%H:%M").time()
-        result_time = datetime.strptime(session["result"], "%H:%M").time()
-        open_dt = ist.localize(datetime.combine(today, open_time))
-        close_dt = ist.localize(datetime.combine(today, close_time))
-        result_dt = ist.localize(datetime.combine(today, result_time))
-        if close_time < open_time:
-            close_dt += timedelta(days=1)
-            result_dt += timedelta(days=1)
-
-        bets = Bet.objects.filter(
-            game_name__iexact=game_upper,
-            created_at__gte=open_dt,
-            created_at__lte=close_dt
-        ).order_by('created_at')
+        current = today_sessions[current_idx]
+
+        bets = session_bets(game_upper, current.open)
 
         bet_list = [bet_to_dict(bet) for bet in bets]
 
         sessions_data.append({
             "type": "current",
             "session_no": current_idx + 1,
-            "date": open_dt.strftime('%Y-%m-%d'),
+            "date": current.open.strftime('%Y-%m-%d'),
             "open_time": session["open"],
             "close_time": session["close"],
             "result_time": session["result"],
@@ -851,28 +1010,16 @@ def admin_bet_records(request):
         # Previous session
         prev_idx = (current_idx - 1) % len(timings)
         prev_session = timings[prev_idx]
-        prev_open_time = datetime.strptime(prev_session["open"], "%H:%M").time()
-        prev_close_time = datetime.strptime(prev_session["close"], "%H:%M").time()
-        prev_result_time = datetime.strptime(prev_session["result"], "%H:%M").time()
-        prev_open_dt = ist.localize(datetime.combine(today, prev_open_time))
-        prev_close_dt = ist.localize(datetime.combine(today, prev_close_time))
-        prev_result_dt = ist.localize(datetime.combine(today, prev_result_time))
-        if prev_close_time < prev_open_time:
-            prev_close_dt += timedelta(days=1)
-            prev_result_dt += timedelta(days=1)
-
-        prev_bets = Bet.objects.filter(
-            game_name__iexact=game_upper,
-            created_at__gte=prev_open_dt,
-            created_at__lte=prev_close_dt
-        ).order_by('created_at')
+        previous = today_sessions[prev_idx]
+
+        prev_bets = session_bets(game_upper, previous.open)
 
         prev_bet_list = [bet_to_dict(bet) for bet in prev_bets]
 
         sessions_data.append({
             "type": "previous",
             "session_no": prev_idx + 1,
-            "date": prev_open_dt.strftime('%Y-%m-%d'),
+            "date": previous.open.strftime('%Y-%m-%d'),
             "open_time": prev_session["open"],
             "close_time": prev_session["close"],
             "result_time": prev_session["result"],
@@ -884,46 +1031,30 @@ def admin_bet_records(request):
     # Other games: Single session per day
     else:
         today = now.date()
-        open_time = datetime.strptime(timings["open"], "%H:%M").time()
-        close_time = datetime.strptime(timings["close"], "%H:%M").time()
-        open_dt = ist.localize(datetime.combine(today, open_time))
-        close_dt = ist.localize(datetime.combine(today, close_time))
-        if close_time < open_time:
-            close_dt += timedelta(days=1)
-
-        bets = Bet.objects.filter(
-            game_name__iexact=game_upper,
-            created_at__gte=open_dt,
-            created_at__lte=close_dt
-        ).order_by('created_at')
+        current = timing_manager.calendar.sessions_on(game_upper, today)[0]
+
+        bets = session_bets(game_upper, current.open)
 
         bet_list = [bet_to_dict(bet) for bet in bets]
 
         sessions_data.append({
             "type": "current",
-            "date": open_dt.strftime('%Y-%m-%d'),
+            "date": current.open.strftime('%Y-%m-%d'),
             "open_time": timings["open"],
             "close_time": timings["close"],
             "bets": bet_list
         })
 
         yesterday = today - timedelta(days=1)
-        prev_open_dt = ist.localize(datetime.combine(yesterday, open_time))
-        prev_close_dt = ist.localize(datetime.combine(yesterday, close_time))
-        if close_time < open_time:
-            prev_close_dt += timedelta(days=1)
+        previous = timing_manager.calendar.sessions_on(game_upper, yesterday)[0]
 
-        prev_bets = Bet.objects.filter(
-            game_name__iexact=game_upper,
-            created_at__gte=prev_open_dt,
-            created_at__lte=prev_close_dt
-        ).order_by('created_at')
+        prev_bets = session_bets(game_upper, previous.open)
 
         prev_bet_list = [bet_to_dict(bet) for bet in prev_bets]
 
         sessions_data.append({
             "type": "previous",
-            "date": prev_open_dt.strftime('%Y-%m-%d'),
+            "date": previous.open.strftime('%Y-%m-%d'),
             "open_time": timings["open"],
             "close_time": timings["close"],
             "bets": prev_bet_list
@@ -994,6 +1125,8 @@ def admin_withdraw_action(request):
             )
 
         withdraw_request.save()
+        if action == 'approve':
+            refresh_platform_day(local_day(withdraw_request.created_at))
         return Response({'message': f'Withdrawal request {action}d successfully'})
 
     except WithdrawRequest.DoesNotExist:
@@ -1003,68 +1136,43 @@ def admin_withdraw_action(request):
 
 
 
+TRANSACTION_FEED_MAX_PAGE_SIZE = 500
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def admin_transactions(request):
+    """
+    Transactions, deposit requests and withdraw requests merged newest first.
+    Filters: ?type=, ?status=, ?date_from=, ?date_to= (YYYY-MM-DD).
+    Paged with ?page_size= and ?cursor= (next_cursor of the previous page);
+    ?export=ndjson streams every matching row instead, one JSON object per line.
+    """
     try:
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=403)
 
-        transactions = []
-
-        # Get all Transaction records
-        transaction_records = Transaction.objects.all().order_by('-created_at')
-        for txn in transaction_records:
-            transactions.append({
-                'id': txn.id,
-                'user': {
-                    'username': txn.user.username,
-                    'mobile': txn.user.mobile
-                },
-                'transaction_type': txn.transaction_type,
-                'amount': str(txn.amount),
-                'status': txn.status,
-                'created_at': txn.created_at.isoformat(),
-                'note': txn.note or ''
-            })
-
-        # Get all DepositRequest records
-        deposit_requests = DepositRequest.objects.all().order_by('-created_at')
-        for deposit in deposit_requests:
-            transactions.append({
-                'id': f'dep_{deposit.id}',
-                'user': {
-                    'username': deposit.user.username,
-                    'mobile': deposit.user.mobile
-                },
-                'transaction_type': 'deposit',
-                'amount': str(deposit.amount),
-                'status': deposit.status,
-                'created_at': deposit.created_at.isoformat(),
-                'note': f'UTR: {deposit.utr_number}'
-            })
+        try:
+            filters = FeedFilters(request.GET)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
 
-        # Get all WithdrawRequest records
-        withdraw_requests = WithdrawRequest.objects.all().order_by('-created_at')
-        for withdraw in withdraw_requests:
-            status = 'approved' if withdraw.is_approved else 'rejected' if withdraw.is_rejected else 'pending'
-            transactions.append({
-                'id': f'with_{withdraw.id}',
-                'user': {
-                    'username': withdraw.user.username,
-                    'mobile': withdraw.user.mobile
-                },
-                'transaction_type': 'withdraw',
-                'amount': str(withdraw.amount),
-                'status': status,
-                'created_at': withdraw.created_at.isoformat(),
-                'note': ''
-            })
+        if request.GET.get('export') == 'ndjson':
+            lines = (json.dumps(row) + '\n' for row in feed_export(filters))
+            response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+            response['Content-Disposition'] = 'attachment; filename="transactions.ndjson"'
+            return response
 
-        # Sort all transactions by created_at in descending order
-        transactions.sort(key=lambda x: x['created_at'], reverse=True)
+        try:
+            page_size = min(max(int(request.GET.get('page_size', 50)), 1), TRANSACTION_FEED_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'Invalid page_size'}, status=400)
+        try:
+            transactions, next_cursor = feed_page(filters, request.GET.get('cursor'), page_size)
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=400)
 
-        return Response(transactions)
+        return Response({'results': transactions, 'next_cursor': next_cursor})
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -1173,6 +1281,7 @@ def admin_deposit_action(request):
             deposit.approved_at = timezone.now()
             deposit.approved_by = request.user
             deposit.save()
+            refresh_platform_day(local_day(deposit.created_at))
 
             # Add funds to wallet
             wallet = Wallet.objects.get(user=deposit.user)
@@ -1211,7 +1320,8 @@ def admin_deposit_action(request):
                 status='pending'
             ).update(
                 status='approved',
-                note=f'Deposit approved - UTR: {deposit.utr_number}'
+                note=f'Deposit approved - UTR: {deposit.utr_number}',
+                updated_at=timezone.now()
             )
 
             return Response({
@@ -1234,7 +1344,8 @@ def admin_deposit_action(request):
                 status='pending'
             ).update(
                 status='rejected',
-                note=f'Deposit rejected: {admin_note}'
+                note=f'Deposit rejected: {admin_note}',
+                updated_at=timezone.now()
             )
 
             return Response({
@@ -1272,94 +1383,145 @@ def admin_referral_summary(request):
 
 
 
-@api_view(['GET'])
-def game_status(request):
+async def game_status(request):
+    # Native async view: polled by every client, so under ASGI it skips DRF and
+    # only leaves the event loop for the (usually cached) schedule lookups
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
     try:
-        from .game_timing import GameTimingManager
+        timing_manager = await sync_to_async(get_timing_manager)()
+        games_status = await sync_to_async(caching.all_games_status)(timing_manager)
 
-        timing_manager = GameTimingManager()
-        games_status = timing_manager.get_all_games_status()
-
-        return Response({
+        return JsonResponse({
             'games': games_status,
             'current_time': timing_manager.get_current_time().strftime('%I:%M %p'),
             'timezone': 'IST'
         })
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
+        return JsonResponse({'error': str(e)}, status=500)
+
+async def game_events(request):
+    """
+    Server-sent events: a 'status' snapshot of every game, then 'lock' / 'open'
+    as sessions close and open and 'result' / 'result_undone' as results are
+    declared. Needs an ASGI server (backend.asgi); a WSGI worker would hold
+    the connection in a thread.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'The event stream needs an ASGI server'}, status=503)
+    response = StreamingHttpResponse(events.stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# ?sort= values for admin_users_stats ("-" prefix for descending)
+USER_STATS_SORTS = {
+    'id': 'pk',
+    'date_joined': 'date_joined',
+    'username': 'username',
+    'balance': 'balance',
+    'winnings': 'winnings',
+    'total_deposit': 'total_deposit',
+    'total_withdraw': 'total_withdraw',
+    'referral_earnings': 'referral_earnings',
+}
+USER_STATS_MAX_PAGE_SIZE = 200
+
+
+def _user_sum(model, field, **filters):
+    """Correlated SUM(field) of a user's rows in `model`, 0 when there are none."""
+    total = (
+        model.objects.filter(user=OuterRef('pk'), **filters)
+        .order_by().values('user').annotate(total=Sum(field)).values('total')
+    )
+    return Coalesce(Subquery(total), Value(Decimal('0.00')), output_field=MONEY_FIELD)
+
+
+def users_stats_queryset(today):
+    """Every per-user figure of the admin users table as annotations on one query."""
+    wallet = Wallet.objects.filter(user=OuterRef('pk')).order_by('pk')
+    referrals = ReferralCommission.objects.filter(referrer=OuterRef('pk')).order_by().values('referrer')
+    zero = Value(Decimal('0.00'))
+    return User.objects.annotate(
+        balance=Coalesce(Subquery(wallet.values('balance')[:1]), zero, output_field=MONEY_FIELD),
+        bonus=Coalesce(Subquery(wallet.values('bonus')[:1]), zero, output_field=MONEY_FIELD),
+        winnings=Coalesce(Subquery(wallet.values('winnings')[:1]), zero, output_field=MONEY_FIELD),
+        total_deposit=_user_sum(DepositRequest, 'amount', status='approved'),
+        total_withdraw=_user_sum(WithdrawRequest, 'amount', is_approved=True),
+        today_deposit=_user_sum(DepositRequest, 'amount', status='approved', created_at__date=today),
+        today_withdraw=_user_sum(WithdrawRequest, 'amount', is_approved=True, created_at__date=today),
+        total_referrals=Coalesce(
+            Subquery(referrals.annotate(n=Count('referred_user', distinct=True)).values('n')),
+            Value(0),
+        ),
+        referral_earnings=Coalesce(
+            Subquery(referrals.annotate(total=Sum('commission')).values('total')),
+            zero, output_field=MONEY_FIELD,
+        ),
+    )
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def admin_users_stats(request):
+    """
+    Admin users table, one query per page whatever the number of users.
+    ?search= (username/mobile/email), ?sort= (see USER_STATS_SORTS, "-" for
+    descending), ?page_size= and ?cursor= (next_cursor of the previous page).
+    """
     try:
         if not request.user.is_staff:
             return Response({'error': 'Admin access required'}, status=403)
 
-        users = User.objects.all()
-        users_data = []
+        sort = request.GET.get('sort', 'id')
+        sort_field = USER_STATS_SORTS.get(sort.lstrip('-'))
+        if sort_field is None:
+            return Response({'error': f"Invalid sort. Use one of: {', '.join(USER_STATS_SORTS)}"}, status=400)
+        direction = '-' if sort.startswith('-') else ''
+        ordering = [direction + sort_field] if sort_field == 'pk' else [direction + sort_field, direction + 'pk']
+        try:
+            page_size = min(max(int(request.GET.get('page_size', 50)), 1), USER_STATS_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'Invalid page_size'}, status=400)
+
+        users = users_stats_queryset(timezone.now().date())
+        search = request.GET.get('search', '').strip()
+        if search:
+            users = users.filter(
+                Q(username__icontains=search) | Q(mobile__icontains=search) | Q(email__icontains=search)
+            )
 
-        for user in users:
-            try:
-                wallet = Wallet.objects.get(user=user)
-            except Wallet.DoesNotExist:
-                wallet = Wallet.objects.create(user=user)
+        try:
+            page, next_cursor = keyset_page(users, ordering, request.GET.get('cursor'), page_size)
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=400)
 
-            # Calculate total deposits
-            total_deposits = DepositRequest.objects.filter(
-                user=user, status='approved'
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate total withdrawals
-            total_withdrawals = WithdrawRequest.objects.filter(
-                user=user, is_approved=True
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate today's deposits
-            today = timezone.now().date()
-            today_deposits = DepositRequest.objects.filter(
-                user=user, status='approved',
-                created_at__date=today
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate today's withdrawals
-            today_withdrawals = WithdrawRequest.objects.filter(
-                user=user, is_approved=True,
-                created_at__date=today
-            ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-            # Calculate total referrals - count unique referred users
-            total_referrals = ReferralCommission.objects.filter(
-                referrer=user
-            ).values('referred_user').distinct().count()
-
-            # Calculate referral earnings
-            referral_earnings = ReferralCommission.objects.filter(
-                referrer=user
-            ).aggregate(total=Sum('commission'))['total'] or Decimal('0.00')
-
-            # Calculate total earnings (winnings + referral earnings)
-            total_earnings = wallet.winnings + referral_earnings
-
-            users_data.append({
+        users_data = [
+            {
                 'id': user.id,
                 'username': user.username,
                 'mobile': user.mobile,
                 'email': user.email or 'N/A',
-                'balance': str(wallet.balance),
-                'bonus': str(wallet.bonus),
-                'winnings': str(wallet.winnings),
-                'total_deposit': str(total_deposits),
-                'total_withdraw': str(total_withdrawals),
-                'total_earning': str(total_earnings),
-                'today_deposit': str(today_deposits),
-                'today_withdraw': str(today_withdrawals),
-                'total_referrals': total_referrals,
-                'referral_earnings': str(referral_earnings),
+                'balance': read_model.money(user.balance),
+                'bonus': read_model.money(user.bonus),
+                'winnings': read_model.money(user.winnings),
+                'total_deposit': read_model.money(user.total_deposit),
+                'total_withdraw': read_model.money(user.total_withdraw),
+                # Total earnings = winnings + referral earnings
+                'total_earning': read_model.money(user.winnings + user.referral_earnings),
+                'today_deposit': read_model.money(user.today_deposit),
+                'today_withdraw': read_model.money(user.today_withdraw),
+                'total_referrals': user.total_referrals,
+                'referral_earnings': read_model.money(user.referral_earnings),
                 'status': 'active' if user.is_active else 'blocked',
                 'date_joined': user.date_joined
-            })
-
-        return Response(users_data)
+            }
+            for user in page
+        ]
+        return Response({'results': users_data, 'next_cursor': next_cursor})
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -1376,6 +1538,7 @@ def undo_result(request):
     - Set all bets in the session back to pending
     - Remove winnings from users
     - Remove referral commission for those bets (and minus from referrer wallet)
+    All of it is replayed from the settlement journal in one transaction.
     """
     try:
         if not request.user.is_staff:
@@ -1385,43 +1548,21 @@ def undo_result(request):
         if not game_name:
             return Response({'error': 'Game name required'}, status=400)
 
-        game_name = game_name.strip().lower()
+        game_name = normalize_game_name(game_name)
 
-        # Get current session time window
-        open_dt, close_dt, _ = get_game_time_window(game_name)
-        if not open_dt or not close_dt:
+        # Get current session
+        session = get_timing_manager().get_current_session(game_name, timezone.now())
+        if session is None:
             return Response({'error': 'Invalid game name or timings not set'}, status=400)
+        game_session = find_game_session(game_name, session)
+        if game_session is None:
+            return Response({'error': 'No declared result to undo for the current session'}, status=400)
 
-        # Filter only current session bets for this game
-        bets = Bet.objects.filter(
-            game_name__iexact=game_name, 
-            status__in=['won', 'lost'],
-            created_at__gte=open_dt,
-            created_at__lte=close_dt
-        )
-        print(f"[UNDO] Found {bets.count()} bets to undo for {game_name} (session: {open_dt} to {close_dt})")
-
-        for bet in bets:
-            # Remove commission from referrer wallet and delete commission record for this bet
-            commissions = ReferralCommission.objects.filter(bet=bet)
-            for comm in commissions:
-                referrer_wallet = Wallet.objects.get(user=comm.referrer)
-                referrer_wallet.bonus -= comm.commission
-                referrer_wallet.save()
-            commissions.delete()
-
-            # Remove winnings if any
-            wallet = Wallet.objects.get(user=bet.user)
-            if bet.payout and wallet.winnings >= bet.payout:
-                wallet.winnings -= bet.payout
-            elif bet.payout:
-                wallet.winnings = Decimal('0.00')
-            wallet.save()
-
-            bet.status = 'pending'
-            bet.is_win = False
-            bet.payout = Decimal('0.00')
-            bet.save()
+        try:
+            undone = undo_session(game_session)
+        except SessionNotDeclared:
+            return Response({'error': 'No declared result to undo for the current session'}, status=400)
+        print(f"[UNDO] {game_name} (session: {session.open} to {session.close}): {undone}")
 
         return Response({'message': f'Current session results and commissions for {game_name} have been securely undone'})
 
@@ -1444,7 +1585,7 @@ def my_referrals(request):
         import random, string
         code = user.username[:3].upper() + ''.join(random.choices(string.digits, k=4))
         user.referral_code = code
-        user.save()
+        user.save(update_fields=['referral_code'])
 
     # Count unique referred users (signup_bonus)
     total_referrals = ReferralCommission.objects.filter(
@@ -1492,15 +1633,43 @@ from .models import User, DepositRequest, WithdrawRequest, Bet, ReferralCommissi
 def admin_dashboard_stats(request):
     """
     Returns all analytics/statistics for the admin dashboard, including chart data.
+    Money figures come from the DailyStats rollup (see stapp.rollups), so the
+    cost doesn't grow with the number of bets or users.
     """
-    # Total Revenue (all bets)
-    total_revenue = Bet.objects.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    # Total Winnings Paid
-    total_winnings = Bet.objects.filter(is_win=True).aggregate(total=Sum('payout'))['total'] or Decimal('0.00')
-    # Total Referral Commission
-    total_commission = ReferralCommission.objects.filter(commission_type='bet_commission').aggregate(total=Sum('commission'))['total'] or Decimal('0.00')
-    # Net Revenue
-    net_revenue = total_revenue - (total_winnings + total_commission)
+    from datetime import timedelta
+    from django.utils.timezone import now
+
+    today = timezone.localdate()
+    months = [(now() - timedelta(days=30*m)).date().replace(day=1) for m in range(2, -1, -1)]
+    window_start = min(months[0], today - timedelta(days=28))
+
+    money = ('stake', 'payout', 'commission', 'deposits', 'withdrawals')
+    lifetime = DailyStats.objects.aggregate(**{f: Sum(f) for f in money})
+    lifetime = {f: lifetime[f] or Decimal('0.00') for f in money}
+    # One row per day since the oldest chart bucket, all games summed
+    days = {
+        row['day']: row
+        for row in DailyStats.objects.filter(day__gte=window_start).values('day').annotate(
+            **{f: Sum(f) for f in money}, new_users=Sum('new_users')
+        ).order_by()
+    }
+    empty_day = dict({f: Decimal('0.00') for f in money}, new_users=0)
+
+    def period(start, end):
+        totals = dict(empty_day)
+        for day, row in days.items():
+            if start <= day <= end:
+                for field in totals:
+                    totals[field] += row[field] or 0
+        return totals
+
+    def earning(totals):
+        return totals['stake'] - (totals['payout'] + totals['commission'])
+
+    # Total Revenue (settled bets)
+    total_revenue = lifetime['stake']
+    # Net Revenue = bets - (winnings paid + referral commission)
+    net_revenue = earning(lifetime)
 
     # Total Users
     total_users = User.objects.count()
@@ -1509,77 +1678,36 @@ def admin_dashboard_stats(request):
     pending_withdrawals = WithdrawRequest.objects.filter(is_approved=False, is_rejected=False).count()
 
     # Today's stats
-    today = timezone.now().date()
-    today_bets = Bet.objects.filter(created_at__date=today)
-    today_total_bets = today_bets.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    today_total_payouts = today_bets.filter(is_win=True).aggregate(total=Sum('payout'))['total'] or Decimal('0.00')
-    today_total_commission = ReferralCommission.objects.filter(
-        commission_type='bet_commission', created_at__date=today
-    ).aggregate(total=Sum('commission'))['total'] or Decimal('0.00')
-    today_earnings = today_total_bets - (today_total_payouts + today_total_commission)
-    today_deposits = DepositRequest.objects.filter(status='approved', created_at__date=today).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    today_withdrawals = WithdrawRequest.objects.filter(is_approved=True, created_at__date=today).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-    # Total Deposits/Withdrawals
-    total_deposits = DepositRequest.objects.filter(status='approved').aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    total_withdrawals = WithdrawRequest.objects.filter(is_approved=True).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-    # New Users Today
-    new_users_today = User.objects.filter(date_joined__date=today).count()
-    # deposit_balance_left = total_deposit - total_bet
-    available_deposit_balance = Wallet.objects.aggregate(total=Sum('balance'))['total'] or 0
-
-    users = User.objects.all()
-    total_wallet_balance = Decimal('0.00')
-
-    for user in users:
-        wallet = Wallet.objects.filter(user=user).first()
-        if not wallet:
-            continue
-
-        # 1% commission (bet_commission)
-        commission_earned = ReferralCommission.objects.filter(
-            referrer=user, commission_type='bet_commission'
-        ).aggregate(total=Sum('commission'))['total'] or Decimal('0.00')
-        # Direct bonus (signup_bonus)
-        direct_bonus = ReferralCommission.objects.filter(
-            referrer=user, commission_type='signup_bonus'
-        ).aggregate(total=Sum('commission'))['total'] or Decimal('0.00')
-
-        # User total balance
-        user_total = (
-            Decimal(wallet.balance)
-            + Decimal(wallet.bonus)
-
-            + Decimal(wallet.winnings)
-            + Decimal(commission_earned)
-
-        )
-        total_wallet_balance += user_total
+    today_totals = period(today, today)
+    today_earnings = earning(today_totals)
+    new_users_today = today_totals['new_users']
 
+    # deposit_balance_left = total_deposit - total_bet
+    wallets = Wallet.objects.aggregate(
+        deposit_balance=Sum('balance'), total=Sum(F('balance') + F('bonus') + F('winnings'))
+    )
+    available_deposit_balance = wallets['deposit_balance'] or 0
+    # Every wallet (balance + bonus + winnings) plus the bet commission earned by referrers
+    total_wallet_balance = (wallets['total'] or Decimal('0.00')) + lifetime['commission']
 
     # Recent Transactions (last 3, sorted by created_at)
-    recent_deposits = DepositRequest.objects.filter(status='approved').order_by('-created_at')[:3]
-    recent_withdrawals = WithdrawRequest.objects.filter(is_approved=True).order_by('-created_at')[:3]
-    recent_transactions = []
-    for dep in recent_deposits:
-        recent_transactions.append({
-            "user": dep.user.username,
-            "amount": f"₹{dep.amount}",
-            "type": "Deposit",
-            "time": dep.created_at.strftime("%d-%m-%Y %I:%M %p"),
-        })
-    for wd in recent_withdrawals:
-        recent_transactions.append({
-            "user": wd.user.username,
-            "amount": f"₹{wd.amount}",
-            "type": "Withdrawal",
-            "time": wd.created_at.strftime("%d-%m-%Y %I:%M %p"),
-        })
-    # Sort by time descending (latest first)
-    recent_transactions = sorted(recent_transactions, key=lambda x: x["time"], reverse=True)[:3]
+    recent_deposits = DepositRequest.objects.filter(status='approved').select_related('user').order_by('-created_at')[:3]
+    recent_withdrawals = WithdrawRequest.objects.filter(is_approved=True).select_related('user').order_by('-created_at')[:3]
+    recent = [(dep.created_at, dep, "Deposit") for dep in recent_deposits]
+    recent += [(wd.created_at, wd, "Withdrawal") for wd in recent_withdrawals]
+    recent_transactions = [
+        {
+            "user": obj.user.username,
+            "amount": f"₹{obj.amount}",
+            "type": kind,
+            "time": created_at.strftime("%d-%m-%Y %I:%M %p"),
+        }
+        # Latest first
+        for created_at, obj, kind in sorted(recent, key=lambda x: x[0], reverse=True)[:3]
+    ]
 
     # Recent Winners (last 3 winning bets)
-    winners = Bet.objects.filter(is_win=True).order_by('-created_at')[:3]
+    winners = Bet.objects.filter(status='won').select_related('user').order_by('-created_at')[:3]
     recent_winners = []
     for win in winners:
         recent_winners.append({
@@ -1591,21 +1719,12 @@ def admin_dashboard_stats(request):
 
     # ----------- CHART LOGIC -----------
     # Earnings Chart (Last 7 Days)
-    from datetime import timedelta
     earnings_chart_labels = []
     earnings_chart_data = []
     for i in range(6, -1, -1):
         day = today - timedelta(days=i)
-        label = day.strftime("%a")  # Mon, Tue, etc.
-        earnings_chart_labels.append(label)
-        bets = Bet.objects.filter(created_at__date=day)
-        total_bets = bets.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        total_payouts = bets.filter(is_win=True).aggregate(total=Sum('payout'))['total'] or Decimal('0.00')
-        total_commission = ReferralCommission.objects.filter(
-            commission_type='bet_commission', created_at__date=day
-        ).aggregate(total=Sum('commission'))['total'] or Decimal('0.000')
-        earning = total_bets - (total_payouts + total_commission)
-        earnings_chart_data.append(float(earning))
+        earnings_chart_labels.append(day.strftime("%a"))  # Mon, Tue, etc.
+        earnings_chart_data.append(float(earning(period(day, day))))
 
     # Earnings Chart (Last 4 Weeks)
     earnings_chart_month_labels = []
@@ -1613,37 +1732,23 @@ def admin_dashboard_stats(request):
     for w in range(4, 0, -1):
         week_start = today - timedelta(days=7*w)
         week_end = week_start + timedelta(days=6)
-        label = f"Week {5-w}"
-        earnings_chart_month_labels.append(label)
-        bets = Bet.objects.filter(created_at__date__gte=week_start, created_at__date__lte=week_end)
-        total_bets = bets.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        total_payouts = bets.filter(is_win=True).aggregate(total=Sum('payout'))['total'] or Decimal('0.00')
-        total_commission = ReferralCommission.objects.filter(
-            commission_type='bet_commission',
-            created_at__date__gte=week_start,
-            created_at__date__lte=week_end
-        ).aggregate(total=Sum('commission'))['total'] or Decimal('0.00')
-        earning = total_bets - (total_payouts + total_commission)
-        earnings_chart_month_data.append(float(earning))
+        earnings_chart_month_labels.append(f"Week {5-w}")
+        earnings_chart_month_data.append(float(earning(period(week_start, week_end))))
 
     # User Activity Chart (Last 3 Months)
-    from django.utils.timezone import now
+    # Active users: users who had at least 1 bet settled in the month
+    active_by_month = dict(
+        MonthlyBettor.objects.filter(month__gte=months[0]).values('month')
+        .annotate(n=Count('id')).values_list('month', 'n')
+    )
     user_activity_labels = []
     user_activity_active = []
     user_activity_new = []
-    for m in range(2, -1, -1):
-        month = (now() - timedelta(days=30*m)).date().replace(day=1)
-        label = month.strftime("%B")
-        user_activity_labels.append(label)
-        # Active users: users who placed at least 1 bet in this month
+    for month in months:
         month_end = (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
-        active_users = User.objects.filter(
-            bet__created_at__date__gte=month,
-            bet__created_at__date__lte=month_end
-        ).distinct().count()
-        new_users = User.objects.filter(date_joined__date__gte=month, date_joined__date__lte=month_end).count()
-        user_activity_active.append(active_users)
-        user_activity_new.append(new_users)
+        user_activity_labels.append(month.strftime("%B"))
+        user_activity_active.append(active_by_month.get(month, 0))
+        user_activity_new.append(period(month, month_end)['new_users'])
 
     return Response({
         "total_revenue": str(total_revenue),
@@ -1652,10 +1757,10 @@ def admin_dashboard_stats(request):
         "pending_deposits": pending_deposits,
         "pending_withdrawals": pending_withdrawals,
         "today_earnings": str(today_earnings),
-        "today_deposits": str(today_deposits),
-        "today_withdrawals": str(today_withdrawals),
-        "total_deposits": str(total_deposits),
-        "total_withdrawals": str(total_withdrawals),
+        "today_deposits": str(today_totals['deposits']),
+        "today_withdrawals": str(today_totals['withdrawals']),
+        "total_deposits": str(lifetime['deposits']),
+        "total_withdrawals": str(lifetime['withdrawals']),
         "new_users_today": new_users_today,
         'available_deposit_balance': str(available_deposit_balance),
         "total_wallet_balance": str(total_wallet_balance),
@@ -1784,6 +1889,8 @@ def admin_block_user(request, user_id):
         return Response({"error": "Invalid status"}, status=400)
     user.is_active = status_val == "active"
     user.save()
+    # Tokens carry is_active; make the ones already issued stop working
+    revoke_tokens(user.id)
     return Response({"success": True, "status": status_val})
 
 
@@ -1828,12 +1935,17 @@ def admin_reset_user(request, user_id):
     UserDataBackup.objects.create(user=user, data=backup_data)
 
     # Now delete all user-related data
+    bet_sessions = set(Bet.objects.filter(user=user).values_list('session_id', flat=True))
+    rollup_keys = user_rollup_keys(user)
     Bet.objects.filter(user=user).delete()
+    drop_exposure(bet_sessions)
+    caching.invalidate_user(user.id)
     DepositRequest.objects.filter(user=user).delete()
     WithdrawRequest.objects.filter(user=user).delete()
     ReferralCommission.objects.filter(referrer=user).delete()
     ReferralCommission.objects.filter(referred_user=user).delete()
     Transaction.objects.filter(user=user).delete()
+    refresh_rollup_keys(rollup_keys)
 
     # Reset wallet
     try:
@@ -1895,12 +2007,25 @@ from datetime import datetime
 def admin_reset_game_stats(request, game_id):
     """
     Reset all stats for a game (delete all bets for this game).
+    The game's rollups and settlement journals go with them; the monthly
+    bettor counts of the months those bets were in are recomputed.
     """
     try:
         game = Game.objects.get(id=game_id)
     except Game.DoesNotExist:
         return Response({"error": "Game not found"}, status=404)
-    Bet.objects.filter(game=game).delete()
+    game_name = normalize_game_name(game.name)
+    bets = Bet.objects.filter(game_name=game_name)
+    with transaction.atomic():
+        months = bet_months(bets)
+        # Journals of deleted bets can't be undone any more
+        Settlement.objects.filter(session__game_name=game_name).delete()
+        bets.delete()
+        drop_exposure(GameSession.objects.filter(game_name=game_name).values('pk'))
+        DailyStats.objects.filter(game_name=game_name).delete()
+        refresh_monthly_bettors(months)
+    cache.delete(GAMES_STATS_CACHE_KEY)
+    caching.invalidate_game(game_name)
     return Response({"success": True, "msg": "Game stats reset"})
 
 
@@ -1917,17 +2042,17 @@ def edit_user_profile(request):
     username = data.get('username')
     email = data.get('email')
 
-    updated = False
+    updated = []
 
     if username:
         user.username = username
-        updated = True
+        updated.append('username')
     if email:
         user.email = email
-        updated = True
+        updated.append('email')
 
     if updated:
-        user.save()
+        user.save(update_fields=updated)
         return Response({
             "success": True,
             "username": user.username,
@@ -1961,6 +2086,8 @@ def admin_undo_reset_user(request, user_id):
 
     try:
         with transaction.atomic():
+            old_game_days, old_platform_days = user_rollup_keys(user)
+
             # Restore wallet
             Wallet.objects.filter(user=user).delete()
             wallet_data = data.get("wallet")
@@ -1990,11 +2117,14 @@ def admin_undo_reset_user(request, user_id):
                     withdraw_id_map[old_id] = obj.id
 
             # Restore bets
+            bet_sessions = set(Bet.objects.filter(user=user).values_list('session_id', flat=True))
             Bet.objects.filter(user=user).delete()
             for bet in data.get("bets", []):
                 bet.pop('id', None)
                 bet['user_id'] = user.id
-                Bet.objects.create(**bet)
+                bet_sessions.add(Bet.objects.create(**bet).session_id)
+            drop_exposure(bet_sessions)
+            caching.invalidate_user(user.id)
 
             # Restore referral commissions
             ReferralCommission.objects.filter(referrer=user).delete()
@@ -2022,6 +2152,9 @@ def admin_undo_reset_user(request, user_id):
                     txn['related_withdrawal_id'] = withdraw_id_map.get(old_wd_id)
                 Transaction.objects.create(**txn)
 
+            game_days, platform_days = user_rollup_keys(user)
+            refresh_rollup_keys((game_days | old_game_days, platform_days | old_platform_days))
+
             # Restore user bonus/commission fields if present in backup
             wallet_backup = data.get("wallet", {})
             if "direct_bonus" in wallet_backup:
@@ -2100,51 +2233,82 @@ def admin_update_wallet(request, user_id):
     return Response({"success": True, "msg": "Wallet updated successfully."})
 
 
-@api_view(['GET'])
-@permission_classes([IsAdminUser])
-def admin_games_stats(request):
-    games = Game.objects.all()
-    today = datetime.now().date()
-    month_start = today.replace(day=1)
-    data = []
-    for game in games:
-        total_bets = Bet.objects.filter(game_name=game.name).count()
-        total_amount = Bet.objects.filter(game_name=game.name).aggregate(total=Sum('amount'))['total'] or 0
-        total_win_paid = Bet.objects.filter(game_name=game.name, is_win=True).aggregate(total=Sum('payout'))['total'] or 0
-        total_commission = ReferralCommission.objects.filter(
-            bet__game_name=game.name,
-            commission_type='bet_commission'
-        ).aggregate(total=Sum('commission'))['total'] or 0
-        total_earnings = total_amount - total_win_paid - total_commission
-
-        month_bets = Bet.objects.filter(game_name=game.name, created_at__date__gte=month_start)
-        monthly_amount = month_bets.aggregate(total=Sum('amount'))['total'] or 0
-        monthly_win_paid = month_bets.filter(is_win=True).aggregate(total=Sum('payout'))['total'] or 0
-        monthly_commission = ReferralCommission.objects.filter(
-            bet__game_name=game.name,
-            commission_type='bet_commission',
-            created_at__date__gte=month_start
-        ).aggregate(total=Sum('commission'))['total'] or 0
-        monthly_earnings = monthly_amount - monthly_win_paid - monthly_commission
-        monthly_bets = month_bets.count()
-        monthly_bets_amount = monthly_amount
+GAMES_STATS_CACHE_KEY = 'admin_games_stats'
+GAMES_STATS_CACHE_SECONDS = 30
+
 
+def games_stats_rows():
+    """
+    Lifetime and month-to-date figures for every game: one grouped query over
+    Bet and one over ReferralCommission, month-to-date via conditional
+    aggregation on a half-open [month start, ...) datetime range.
+    """
+    month_start = timezone.make_aware(datetime.combine(timezone.localdate().replace(day=1), datetime.min.time()))
+    this_month = Q(created_at__gte=month_start)
+    bets = {
+        row['game_name']: row
+        for row in Bet.objects.order_by().values('game_name').annotate(
+            total_bets=Count('id'),
+            total_amount=Sum('amount'),
+            total_win_paid=Sum('payout', filter=Q(is_win=True)),
+            monthly_bets=Count('id', filter=this_month),
+            monthly_amount=Sum('amount', filter=this_month),
+            monthly_win_paid=Sum('payout', filter=Q(is_win=True) & this_month),
+        )
+    }
+    commissions = {
+        row['bet__game_name']: row
+        for row in ReferralCommission.objects.filter(commission_type='bet_commission', bet__isnull=False)
+        .order_by().values('bet__game_name').annotate(
+            total=Sum('commission'),
+            monthly=Sum('commission', filter=this_month),
+        )
+    }
+
+    data = []
+    for game in Game.objects.order_by('id'):
+        game_name = normalize_game_name(game.name)
+        bet = bets.get(game_name, {})
+        commission = commissions.get(game_name, {})
+        total_amount = bet.get('total_amount') or 0
+        monthly_amount = bet.get('monthly_amount') or 0
         data.append({
             "id": game.id,
             "name": game.name,
             "openTime": game.open_time.strftime("%I:%M %p") if game.open_time else "",
             "closeTime": game.close_time.strftime("%I:%M %p") if game.close_time else "",
             "status": "Active" if game.is_active else "Inactive",
-            "totalBets": total_bets,
+            "totalBets": bet.get('total_bets', 0),
             "totalAmount": total_amount,
-            "totalEarnings": total_earnings,
-            "monthlyEarnings": monthly_earnings,
-            "monthlyBets": monthly_bets,
-            "monthlyBetsAmount": monthly_bets_amount,
+            "totalEarnings": total_amount - (bet.get('total_win_paid') or 0) - (commission.get('total') or 0),
+            "monthlyEarnings": monthly_amount - (bet.get('monthly_win_paid') or 0) - (commission.get('monthly') or 0),
+            "monthlyBets": bet.get('monthly_bets', 0),
+            "monthlyBetsAmount": monthly_amount,
             "commissionApplicable": game.name.lower() in ['faridabad', 'gali', 'disawer', 'ghaziabad'],
         })
+    return data
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_games_stats(request):
+    """Per-game stats, cached for GAMES_STATS_CACHE_SECONDS (?refresh=1 to bypass)."""
+    data = None if request.GET.get('refresh') else cache.get(GAMES_STATS_CACHE_KEY)
+    if data is None:
+        data = games_stats_rows()
+        cache.set(GAMES_STATS_CACHE_KEY, data, GAMES_STATS_CACHE_SECONDS)
     return Response(data)
 
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_cache_stats(request):
+    """Hit/miss counters of the game status caches in this process (?reset=1 to zero them)."""
+    stats = caching.cache_stats()
+    if request.GET.get('reset'):
+        caching.reset_cache_stats()
+    return Response({'backend': settings.CACHES['default']['BACKEND'], 'namespaces': stats})
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
@@ -2189,15 +2353,19 @@ def admin_edit_user(request, user_id):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_user(request):
+    """
+    Log this device out. POST data: { "refresh": "<refresh token>" }
+    Its refresh token is blacklisted and the access token of this request
+    blocked; the user's other devices stay logged in.
+    """
     try:
-        # Blacklist the refresh token
-        refresh_token = request.data.get('refresh_token')
-        if refresh_token:
-            try:
-                token = RefreshToken(refresh_token)
-                token.blacklist()
-            except Exception as e:
-                print(f"Error blacklisting token: {e}")
+        try:
+            refresh = ClaimsRefreshToken(request.data.get('refresh') or '')
+        except TokenError:
+            return Response({'error': 'A valid refresh token is required'}, status=400)
+        if str(refresh.payload.get(jwt_settings.USER_ID_CLAIM)) != str(request.user.id):
+            return Response({'error': 'Refresh token belongs to another user'}, status=400)
+        revoke_session(refresh, request.auth)
 
         return Response({
             'message': 'Logout successful'
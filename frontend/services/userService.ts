@@ -243,20 +243,31 @@ class UserService {
 
   async logout(): Promise<ApiResponse<{ success: boolean }>> {
     try {
-      // Clear all auth data
-      this.clearAuthData();
-      
-      // Optional: Call backend logout endpoint
+      // Revoke this device's tokens first; the call needs the access token
       try {
-        await this.makeRequest<{ success: boolean }>(
-          "/api/logout/",
-          "POST",
-        );
+        const refreshToken =
+          typeof window !== "undefined" && window.localStorage
+            ? localStorage.getItem("refresh_token")
+            : null;
+        if (refreshToken) {
+          await this.makeRequest<{ success: boolean }>(
+            "/api/logout/",
+            "POST",
+            { refresh: refreshToken },
+            false,
+          );
+        }
       } catch (error) {
         // Continue with logout even if backend call fails
         console.warn("Backend logout failed:", error);
       }
-      
+
+      // Clear all auth data
+      this.clearAuthData();
+      if (typeof window !== "undefined" && window.localStorage) {
+        localStorage.removeItem("refresh_token");
+      }
+
       return { success: true, data: { success: true } };
     } catch (error) {
       console.error("Error during logout:", error);